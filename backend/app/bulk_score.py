@@ -0,0 +1,190 @@
+"""
+Offline bulk scoring.
+
+Scores a JSON, NDJSON or CSV company export across a pool of worker processes,
+using the same scoring rules as the API, and writes the results in bulk to an
+NDJSON/CSV file and/or to the events table.
+
+    python -m app.bulk_score companies.ndjson --output scores.ndjson --workers 8
+    python -m app.bulk_score companies.csv --to-db --model conservative
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.database import SessionLocal, engine
+from app.models import event_model
+from app.models.schemas import CompanyInput, ScoringModel, ScoringOutput
+from app.services import event_service, ingestion_service, scoring_service
+
+DEFAULT_CHUNK_SIZE = 5000
+OUTPUT_FIELDS = [
+    "company_id",
+    "company_name",
+    "fit_score",
+    "intent_score",
+    "total_score",
+    "confidence",
+    "action",
+    "reasoning",
+]
+
+
+def detect_input_format(path: str) -> Optional[str]:
+    if path.lower().endswith(".csv"):
+        return "csv"
+    return ingestion_service.detect_file_format(path)
+
+
+def score_chunk(
+    records: List[Dict[str, Any]], model: str
+) -> Tuple[List[Tuple[ScoringOutput, CompanyInput]], int]:
+    """Worker entry point: validates and scores one shard. Returns the results and the failure count."""
+    scoring_model = ScoringModel(model)
+    results = []
+    failed = 0
+    for record in records:
+        try:
+            company = CompanyInput(**record)
+        except Exception:
+            failed += 1
+            continue
+        results.append((scoring_service.calculate_scores(company, scoring_model), company))
+    return results, failed
+
+
+class ResultWriter:
+    """Writes scored companies to an NDJSON or CSV file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.is_csv = path.lower().endswith(".csv")
+        self._file = open(path, "w", encoding="utf-8", newline="" if self.is_csv else None)
+        self._csv = None
+        if self.is_csv:
+            self._csv = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, results: List[Tuple[ScoringOutput, CompanyInput]]) -> None:
+        rows = []
+        for score, company in results:
+            row = score.dict()
+            row["company_name"] = company.company_name
+            rows.append(row)
+
+        if self.is_csv:
+            for row in rows:
+                row["reasoning"] = json.dumps(row["reasoning"])
+            self._csv.writerows(rows)
+        else:
+            self._file.writelines(json.dumps(row) + "\n" for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def run(
+    input_path: str,
+    model: ScoringModel = ScoringModel.BALANCED,
+    output_path: Optional[str] = None,
+    to_db: bool = False,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    input_format: Optional[str] = None,
+) -> dict:
+    """Scores every company in input_path and returns a run summary."""
+    input_format = input_format or detect_input_format(input_path)
+    if input_format is None:
+        raise ValueError("Unsupported input file. Use .json, .ndjson, .jsonl or .csv.")
+    if not output_path and not to_db:
+        raise ValueError("Nothing to do: pass an output file and/or write to the database.")
+
+    workers = workers or os.cpu_count() or 1
+    writer = ResultWriter(output_path) if output_path else None
+    db = None
+    if to_db:
+        event_model.Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+
+    scored = 0
+    failed = 0
+    started_at = time.perf_counter()
+
+    def collect(future):
+        nonlocal scored, failed
+        results, chunk_failed = future.result()
+        if writer:
+            writer.write(results)
+        if db is not None:
+            event_service.log_score_calculated_events(db, results, model.value)
+        scored += len(results)
+        failed += chunk_failed
+        elapsed = time.perf_counter() - started_at
+        print(
+            f"--- BULK SCORE: {scored} scored, {failed} failed, "
+            f"{scored / elapsed if elapsed else 0:.0f} rows/s ---",
+            file=sys.stderr,
+        )
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for chunk in ingestion_service.iter_company_chunks(input_path, input_format, chunk_size):
+                pending.append(executor.submit(score_chunk, chunk, model.value))
+                # Keep a bounded number of shards in flight so memory stays flat.
+                if len(pending) >= workers * 2:
+                    collect(pending.popleft())
+            while pending:
+                collect(pending.popleft())
+    finally:
+        if writer:
+            writer.close()
+        if db is not None:
+            db.close()
+
+    elapsed = time.perf_counter() - started_at
+    return {
+        "scored": scored,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(scored / elapsed, 1) if elapsed else 0.0,
+        "workers": workers,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Score a company export offline across all CPU cores.")
+    parser.add_argument("input", help="JSON array, NDJSON/JSONL or CSV file of companies.")
+    parser.add_argument("--output", help="Write results to this .ndjson/.jsonl or .csv file.")
+    parser.add_argument("--to-db", action="store_true", help="Write score_calculated events to DATABASE_URL.")
+    parser.add_argument("--model", choices=[m.value for m in ScoringModel], default=ScoringModel.BALANCED.value)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Companies per shard.")
+    parser.add_argument("--format", choices=["json", "ndjson", "csv"], default=None, help="Override input format detection.")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run(
+            args.input,
+            model=ScoringModel(args.model),
+            output_path=args.output,
+            to_db=args.to_db,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            input_format=args.format,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,8 @@
-﻿import os
-from sqlalchemy import create_engine
+﻿import logging
+import os
+from typing import List
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Get the database URL from environment variables
@@ -16,6 +19,37 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create a Base class for declarative models
 Base = declarative_base()
 
+def add_missing_columns(bind, metadata) -> List[str]:
+    """
+    create_all() only creates missing tables, so a database created by an
+    older version lacks the columns added to its tables since. This adds them
+    (they must be nullable or have a server default), then creates any
+    missing index. Returns the added columns as "table.column".
+    """
+    inspector = inspect(bind)
+    added = []
+    with bind.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(
+                        f"Cannot add NOT NULL column {table.name}.{column.name} to an existing database; "
+                        "migrate it by hand or recreate the database."
+                    )
+                column_type = column.type.compile(dialect=bind.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+    if added:
+        logging.info(f"DATABASE: Added missing columns: {', '.join(added)}.")
+    return added
+
 # Dependency to get a DB session for each request
 def get_db():
     db = SessionLocal()
@@ -9,11 +9,11 @@ from fastapi import (
     File,
 )
 from sqlalchemy.orm import Session
-from apscheduler.schedulers.background import BackgroundScheduler
 from contextlib import asynccontextmanager
 from typing import List
 from datetime import date, timedelta
-import json
+import asyncio
+import os
 
 from app.models.schemas import (
     CompanyInput,
@@ -27,15 +27,27 @@ from app.models.schemas import (
     KpiCardData,
     FunnelTrendItem,
     ScoredLeadData,
+    BatchJobStatus,
 )
 from app.services import (
     scoring_service,
     event_service,
     email_generation_service,
     email_sending_service,
+    email_dedup_service,
     analytics_service,
+    score_cache,
+    ingestion_service,
+    batch_job_service,
+    generation_providers,
+    dead_letter_service,
+    generation_queue_service,
+    generation_worker,
+    email_sender_worker,
+    email_transport,
+    send_scheduler,
 )
-from app.database import engine, get_db, SessionLocal
+from app.database import add_missing_columns, engine, get_db, SessionLocal
 from app.models import event_model
 
 logging.basicConfig(
@@ -45,18 +57,61 @@ logging.basicConfig(
 )
 
 event_model.Base.metadata.create_all(bind=engine)
+add_missing_columns(engine, event_model.Base.metadata)
+email_dedup_service.backfill_dedup_keys(engine)
 
-scheduler = BackgroundScheduler()
+resumed_batch_jobs = set()
+
+
+def resume_batch_jobs():
+    """Restarts batch jobs that were queued or interrupted by a previous shutdown.
+    Each job continues from its last per-chunk checkpoint. Jobs another live
+    process is running are skipped, and process_batch_scoring claims each job,
+    so two processes starting together never run the same one."""
+    db = SessionLocal()
+    try:
+        job_ids = [job.id for job in batch_job_service.get_resumable_jobs(db)]
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        print(f"Resuming batch job {job_id}...")
+        task = asyncio.create_task(scoring_service.process_batch_scoring(job_id))
+        resumed_batch_jobs.add(task)
+        task.add_done_callback(resumed_batch_jobs.discard)
+
+
+async def stop_resumed_batch_jobs():
+    """Cancels resumed jobs; each one releases its claim and resumes on the next start."""
+    tasks = list(resumed_batch_jobs)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    scheduler.add_job(run_email_worker_cycle, "interval", minutes=1)
-    scheduler.start()
-    print("Scheduler started...")
+    email_transport.get_transport().start()
+    email_sender_worker.email_sender_pool.start()
+    print("Email sender workers started...")
+    event_service.event_write_queue.start()
+    email_generation_service.generated_email_queue.start()
+    await generation_providers.start_provider()
+    generation_worker.generation_worker_pool.start()
+    resume_batch_jobs()
     yield
-    print("Scheduler shutting down...")
-    scheduler.shutdown()
+    print("Stopping resumed batch jobs...")
+    await stop_resumed_batch_jobs()
+    print("Stopping generation workers...")
+    await generation_worker.generation_worker_pool.stop()
+    print("Closing generation provider clients...")
+    await generation_providers.close_provider()
+    print("Stopping email sender workers...")
+    email_sender_worker.email_sender_pool.stop()
+    email_transport.close_transport()
+    print("Draining write queues...")
+    email_generation_service.generated_email_queue.stop()
+    event_service.event_write_queue.stop()
 
 
 app = FastAPI(title="Brim Growth Challenge API", lifespan=lifespan)
@@ -70,24 +125,29 @@ def read_root():
 @app.post("/api/score-company", response_model=ScoringOutput, tags=["Scoring"])
 def score_company(
     company_input: CompanyInput,
-    background_tasks: BackgroundTasks,
     model: ScoringModel = ScoringModel.BALANCED,
     db: Session = Depends(get_db),
 ):
-    """Receives company data, returns score and logs the event."""
+    """Receives company data, returns score and logs the event.
+    Email generation is queued in the generation_jobs table, prioritized by
+    total_score, and picked up by the generation worker pool.
+    Unchanged payloads already scored with the same model are served from the
+    score cache without logging another event or generating another email."""
+    cache_key = score_cache.make_cache_key(company_input, model)
+    cached_result = score_cache.score_cache.get(cache_key)
+    if cached_result is not None:
+        return cached_result
+
     try:
         score_result = scoring_service.calculate_scores(company_input, model)
         event_service.log_score_calculated_event(
             db, score_result, model.value, company_input
         )
 
-        background_tasks.add_task(
-            email_generation_service.generate_and_save_email_content,
-            SessionLocal,
-            company_input,
-            score_result,
-        )
+        generation_queue_service.enqueue_generation(db, company_input, score_result)
+        generation_worker.generation_worker_pool.notify()
 
+        score_cache.score_cache.set(cache_key, score_result)
         return score_result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -97,44 +157,96 @@ def score_company(
 async def batch_score_leads(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    db: Session = Depends(get_db),
 ):
     """
-    Accepts a JSON file with a list of companies, and scores them
-    asynchronously in the background.
+    Accepts a JSON file with a list of companies (or an NDJSON file with one
+    company per line), spools it to disk and scores it in the background in
+    fixed-size chunks. Returns a job ID for the status endpoint.
     """
-    if not file.filename.endswith(".json"):
+    file_format = ingestion_service.detect_file_format(file.filename)
+    if file_format is None:
         raise HTTPException(
-            status_code=400, detail="Invalid file type. Please upload a JSON file."
+            status_code=400,
+            detail="Invalid file type. Please upload a JSON or NDJSON file.",
         )
 
-    contents = await file.read()
+    upload_path = await ingestion_service.spool_upload(file)
     try:
-        companies_data = json.loads(contents)
-        if not isinstance(companies_data, list):
-            raise ValueError("JSON must be a list of company objects.")
+        ingestion_service.validate_upload(upload_path, file_format)
     except ValueError as e:
+        os.remove(upload_path)
         raise HTTPException(status_code=400, detail=f"Invalid JSON format: {e}")
 
-    background_tasks.add_task(scoring_service.process_batch_scoring, companies_data)
+    job = batch_job_service.create_batch_job(
+        db, filename=file.filename, file_path=upload_path, file_format=file_format
+    )
+    background_tasks.add_task(scoring_service.process_batch_scoring, job.id)
 
     return {
-        "message": f"Accepted. Started scoring for {len(companies_data)} companies in the background."
+        "message": f"Accepted. Started scoring companies from {file.filename} in the background.",
+        "job_id": job.id,
     }
 
 
-@app.on_event("shutdown")
-def shutdown_event():
-    scheduler.shutdown()
+@app.get(
+    "/api/leads/batch-score/{job_id}",
+    response_model=BatchJobStatus,
+    tags=["Leads"],
+)
+def get_batch_score_status(job_id: str, db: Session = Depends(get_db)):
+    """Reports progress and throughput of a batch scoring job."""
+    job = batch_job_service.get_batch_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found.")
+    return batch_job_service.to_status(job)
+
+
+@app.get("/api/generation/dead-letters", tags=["Email Generation"])
+def get_dead_letters(db: Session = Depends(get_db)):
+    """Reports how many leads are waiting in the generation dead-letter table."""
+    return {"pending": dead_letter_service.count_dead_letters(db)}
 
 
-def run_email_worker_cycle():
-    """Creates a DB session, runs the email sending worker, and ensures the session is closed.
-    This is the function that the scheduler will call periodically."""
-    db = SessionLocal()
-    try:
-        email_sending_service.send_prioritized_emails(db)
-    finally:
-        db.close()
+@app.post("/api/generation/dead-letters/replay", status_code=202, tags=["Email Generation"])
+def replay_dead_letters(
+    background_tasks: BackgroundTasks,
+    limit: int = Query(default=email_generation_service.GENERATION_REPLAY_LIMIT, ge=1),
+    db: Session = Depends(get_db),
+):
+    """Regenerates, in the background and in bulk, the emails of up to `limit` dead-lettered leads."""
+    pending = dead_letter_service.count_dead_letters(db)
+    background_tasks.add_task(
+        email_generation_service.replay_dead_letters, SessionLocal, limit
+    )
+    return {
+        "message": f"Accepted. Replaying up to {limit} failed generations in the background.",
+        "pending": pending,
+    }
+
+
+@app.get("/api/metrics", tags=["Metrics"])
+def get_metrics(db: Session = Depends(get_db)):
+    """Reports in-process cache and queue statistics."""
+    return {
+        "score_cache": score_cache.score_cache.stats(),
+        "gemini_concurrency": email_generation_service.gemini_concurrency_limiter.stats(),
+        "generation_circuit_breaker": email_generation_service.generation_circuit_breaker.stats(),
+        "generation_tokens": email_generation_service.generation_token_usage.stats(),
+        "generation_provider": {
+            "name": generation_providers.get_provider().name,
+            **generation_providers.get_provider().stats(),
+        },
+        "event_write_queue": event_service.event_write_queue.stats(),
+        "generated_email_queue": email_generation_service.generated_email_queue.stats(),
+        "generation_workers": generation_worker.generation_worker_pool.stats(),
+        "generation_queue": generation_queue_service.queue_depth(db),
+        "send_queue": email_sending_service.queue_stats(db),
+        "send_schedule": send_scheduler.send_schedule.stats(),
+        "email_senders": email_sender_worker.email_sender_pool.stats(),
+        "email_transport": email_transport.get_transport().stats(),
+        "domain_throttle": email_sending_service.domain_throttle.stats(),
+    }
 
 
 @app.post("/api/activation/log-event", status_code=201, tags=["Activation"])
@@ -1,4 +1,4 @@
-﻿from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, Text, func, JSON
+﻿from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, Text, func, JSON, Index
 from app.database import Base
 
 class Event(Base):
@@ -15,17 +15,101 @@ class Event(Base):
 
 class OutboundEmail(Base):
     __tablename__ = "outbound_emails"
+    __table_args__ = (
+        Index("ix_outbound_emails_claim", "is_sent", "score", "id"),
+        Index("ix_outbound_emails_domain", "recipient_domain"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(String, index=True, nullable=False)
     score = Column(Integer, index=True)
+    recipient = Column(String, nullable=True)
+    recipient_domain = Column(String, nullable=True)
 
     email_subject = Column(Text)
     email_body = Column(Text)
     variant_name = Column(String, default="problem_focused")
+    # company_id, or company_id:variant_name when EMAIL_DEDUP_PER_VARIANT is on.
+    dedup_key = Column(String, unique=True, index=True, nullable=True)
 
     is_sent = Column(Boolean, default=False)
     send_attempts = Column(Integer, default=0)
+    # Sender worker currently holding the email, and until when. An expired
+    # lease makes the email claimable again.
+    claimed_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_send_error = Column(Text, nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    last_attempt_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    last_attempt_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    status = Column(String, index=True, nullable=False, default="queued")
+
+    filename = Column(String)
+    file_path = Column(String, nullable=False)
+    file_format = Column(String, nullable=False, default="json")
+
+    # Checkpoint: number of records consumed from the file by completed chunks.
+    records_read = Column(Integer, default=0)
+    processed_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    processing_seconds = Column(Float, default=0.0)
+    error = Column(Text, nullable=True)
+    # Process running the job, refreshed by every checkpoint. A job whose
+    # heartbeat is older than BATCH_JOB_LEASE_SECONDS can be taken over.
+    claimed_by = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class GeneratedEmailCache(Base):
+    __tablename__ = "generated_email_cache"
+
+    # SHA-256 of the email variant plus a normalized fingerprint of the company context.
+    cache_key = Column(String, primary_key=True)
+    variant_name = Column(String, nullable=False)
+    email_subject = Column(Text)
+    email_body = Column(Text)
+
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class GenerationDeadLetter(Base):
+    __tablename__ = "generation_dead_letters"
+
+    # A lead whose email generation failed every retry, kept for a later replay.
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(String, index=True, nullable=False)
+    company_data = Column(JSON, nullable=False)
+    scoring = Column(JSON, nullable=False)
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Set while a replay holds the row (naive UTC); it is deleted once the replay is done.
+    leased_until = Column(DateTime, nullable=True)
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    # Workers claim the highest-scoring queued jobs first.
+    __table_args__ = (Index("ix_generation_jobs_claim", "status", "priority", "id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    # At most one pending generation per company; rescoring refreshes it.
+    company_id = Column(String, unique=True, index=True, nullable=False)
+    priority = Column(Integer, nullable=False)
+    company_data = Column(JSON, nullable=False)
+    scoring = Column(JSON, nullable=False)
+
+    status = Column(String, nullable=False, default="queued")
+    claim_token = Column(String, index=True, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,5 +1,6 @@
 ﻿from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
+from datetime import datetime
 from enum import Enum
 
 
@@ -21,6 +22,22 @@ class CompanyInput(BaseModel):
     tech_stack: Optional[List[str]] = []
     recent_job_posts: Optional[List[str]] = []
     news_mentions: Optional[List[str]] = []
+    # Where the outreach email goes; derived from the domain or name when missing.
+    contact_email: Optional[str] = None
+    domain: Optional[str] = None
+
+
+# The fields that describe the company. Confidence and the score and generation
+# cache keys use only these, so recipient data does not change a score.
+SCORING_FIELDS = (
+    "company_name",
+    "employee_count",
+    "industry",
+    "funding_stage",
+    "tech_stack",
+    "recent_job_posts",
+    "news_mentions",
+)
 
 
 class ScoringOutput(BaseModel):
@@ -81,3 +98,16 @@ class ScoredLeadData(BaseModel):
     status: str
     email_variant_sent: Optional[str] = None
     score: int
+
+
+class BatchJobStatus(BaseModel):
+    job_id: str
+    status: str
+    filename: Optional[str] = None
+    records_read: int
+    processed: int
+    failed: int
+    throughput_per_second: float
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
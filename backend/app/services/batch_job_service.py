@@ -0,0 +1,166 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from app.models.event_model import BatchJob
+
+RESUMABLE_STATUSES = ("queued", "running")
+# A running job whose last checkpoint is older than this is assumed orphaned.
+# Keep it above the time one chunk takes to score and generate.
+BATCH_JOB_LEASE_SECONDS = float(os.getenv("BATCH_JOB_LEASE_SECONDS", "600"))
+
+
+def worker_id() -> str:
+    """Identifies this process across replicas."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _claimable(now: datetime, lease_seconds: float):
+    return (
+        BatchJob.status.in_(RESUMABLE_STATUSES),
+        or_(
+            BatchJob.claimed_by.is_(None),
+            BatchJob.heartbeat_at.is_(None),
+            BatchJob.heartbeat_at < now - timedelta(seconds=lease_seconds),
+        ),
+    )
+
+
+def create_batch_job(db: Session, filename: str, file_path: str, file_format: str) -> BatchJob:
+    """Registers a spooled upload as a queued batch job."""
+    job = BatchJob(
+        id=uuid.uuid4().hex,
+        status="queued",
+        filename=filename,
+        file_path=file_path,
+        file_format=file_format,
+        records_read=0,
+        processed_count=0,
+        failed_count=0,
+        processing_seconds=0.0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_batch_job(db: Session, job_id: str) -> Optional[BatchJob]:
+    return db.query(BatchJob).filter(BatchJob.id == job_id).first()
+
+
+def get_resumable_jobs(db: Session, lease_seconds: float = BATCH_JOB_LEASE_SECONDS) -> List[BatchJob]:
+    """
+    Jobs that are queued, or were running in a process that released them or
+    stopped sending heartbeats, oldest first. Jobs live processes are running
+    are left out.
+    """
+    return (
+        db.query(BatchJob)
+        .filter(*_claimable(_utcnow(), lease_seconds))
+        .order_by(BatchJob.created_at)
+        .all()
+    )
+
+
+def claim_job(
+    db: Session, job_id: str, owner: str, lease_seconds: float = BATCH_JOB_LEASE_SECONDS
+) -> Optional[BatchJob]:
+    """
+    Atomically makes `owner` the runner of the job and marks it running.
+    Returns None when the job is finished or another live process holds it,
+    so the same job never runs twice at once.
+    """
+    now = _utcnow()
+    claimed = db.execute(
+        update(BatchJob)
+        .where(BatchJob.id == job_id, *_claimable(now, lease_seconds))
+        .values(status="running", claimed_by=owner, heartbeat_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return None
+    job = get_batch_job(db, job_id)
+    db.refresh(job)
+    return job
+
+
+def release_job(db: Session, job: BatchJob) -> None:
+    """Gives an interrupted job back, so the next process can resume it right away."""
+    db.execute(
+        update(BatchJob)
+        .where(BatchJob.id == job.id, BatchJob.claimed_by == job.claimed_by)
+        .values(claimed_by=None, heartbeat_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def mark_job_running(db: Session, job: BatchJob) -> None:
+    job.status = "running"
+    db.commit()
+
+
+def record_chunk_checkpoint(
+    db: Session,
+    job: BatchJob,
+    records_read: int,
+    processed: int,
+    failed: int,
+    elapsed_seconds: float,
+) -> bool:
+    """
+    Persists progress after a chunk, so a restarted job resumes after it, and
+    refreshes the job's heartbeat. Returns False, recording nothing, when
+    another process has taken the job over in the meantime.
+    """
+    updated = db.execute(
+        update(BatchJob)
+        .where(BatchJob.id == job.id, BatchJob.claimed_by == job.claimed_by)
+        .values(
+            records_read=BatchJob.records_read + records_read,
+            processed_count=BatchJob.processed_count + processed,
+            failed_count=BatchJob.failed_count + failed,
+            processing_seconds=BatchJob.processing_seconds + elapsed_seconds,
+            heartbeat_at=_utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    db.refresh(job)
+    return bool(updated)
+
+
+def finish_job(db: Session, job: BatchJob, status: str, error: Optional[str] = None) -> None:
+    job.status = status
+    job.error = error
+    job.finished_at = func.now()
+    db.commit()
+    db.refresh(job)
+
+
+def to_status(job: BatchJob) -> dict:
+    processing_seconds = job.processing_seconds or 0.0
+    throughput = job.processed_count / processing_seconds if processing_seconds else 0.0
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "records_read": job.records_read,
+        "processed": job.processed_count,
+        "failed": job.failed_count,
+        "throughput_per_second": round(throughput, 2),
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
@@ -0,0 +1,84 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from app.models.event_model import GenerationDeadLetter
+from app.models.schemas import CompanyInput, ScoringOutput
+
+# How long a replay holds its dead letters; after a crash they are replayed again.
+GENERATION_REPLAY_LEASE_SECONDS = float(os.getenv("GENERATION_REPLAY_LEASE_SECONDS", "900"))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def record_failed_generation(
+    db: Session, company_data: CompanyInput, scoring: ScoringOutput, error: str, attempts: int
+) -> GenerationDeadLetter:
+    """Stores a lead whose email generation exhausted its retries."""
+    dead_letter = GenerationDeadLetter(
+        company_id=scoring.company_id,
+        company_data=company_data.dict(),
+        scoring=scoring.dict(),
+        error=error,
+        attempts=attempts,
+    )
+    db.add(dead_letter)
+    db.commit()
+    return dead_letter
+
+
+def count_dead_letters(db: Session) -> int:
+    return db.query(GenerationDeadLetter).count()
+
+
+def lease_dead_letters(
+    db: Session, limit: int, lease_seconds: float = GENERATION_REPLAY_LEASE_SECONDS
+) -> Tuple[List[int], List[Tuple[CompanyInput, ScoringOutput]]]:
+    """
+    Leases up to `limit` of the oldest dead letters that no replay holds and
+    returns their ids and leads. The rows stay in the table until
+    delete_dead_letters() is called for them, so a replay that dies midway
+    loses nothing: its lease expires and the rows are replayed again.
+    """
+    now = _utcnow()
+    leased_until = now + timedelta(seconds=lease_seconds)
+    available = or_(GenerationDeadLetter.leased_until.is_(None), GenerationDeadLetter.leased_until < now)
+    oldest = (
+        db.query(GenerationDeadLetter.id)
+        .filter(available)
+        .order_by(GenerationDeadLetter.created_at, GenerationDeadLetter.id)
+        .limit(limit)
+    )
+    # Re-checking the lease in the UPDATE makes concurrent replays take disjoint rows.
+    db.execute(
+        update(GenerationDeadLetter)
+        .where(GenerationDeadLetter.id.in_(oldest.scalar_subquery()), available)
+        .values(leased_until=leased_until)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    dead_letters = (
+        db.query(GenerationDeadLetter)
+        .filter(GenerationDeadLetter.leased_until == leased_until)
+        .order_by(GenerationDeadLetter.created_at, GenerationDeadLetter.id)
+        .all()
+    )
+    return [dead_letter.id for dead_letter in dead_letters], [
+        (CompanyInput(**dead_letter.company_data), ScoringOutput(**dead_letter.scoring))
+        for dead_letter in dead_letters
+    ]
+
+
+def delete_dead_letters(db: Session, dead_letter_ids: List[int]) -> None:
+    """Removes replayed dead letters; a lead that failed again was recorded anew."""
+    if not dead_letter_ids:
+        return
+    db.query(GenerationDeadLetter).filter(GenerationDeadLetter.id.in_(dead_letter_ids)).delete(
+        synchronize_session=False
+    )
+    db.commit()
@@ -0,0 +1,95 @@
+import os
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.models.event_model import OutboundEmail
+
+# One outbound email per company by default; "true" allows one per variant.
+EMAIL_DEDUP_PER_VARIANT = os.getenv("EMAIL_DEDUP_PER_VARIANT", "false").lower() == "true"
+
+REFRESHED_FIELDS = ("score", "recipient", "recipient_domain", "email_subject", "email_body", "variant_name")
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE. Others save through save_or_refresh().
+UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def upsert_supported(dialect_name: Optional[str] = None) -> bool:
+    return (dialect_name or engine.dialect.name) in UPSERT_INSERTS
+
+
+def dedup_key(company_id: str, variant_name: Optional[str]) -> str:
+    if EMAIL_DEDUP_PER_VARIANT and variant_name:
+        return f"{company_id}:{variant_name}"
+    return company_id
+
+
+def find_existing_emails(db: Session, keys: Iterable[str]) -> Dict[str, OutboundEmail]:
+    """Looks up, in one indexed query, which dedup keys already have a queued or sent email."""
+    keys = list(set(keys))
+    if not keys:
+        return {}
+    return {
+        email.dedup_key: email
+        for email in db.query(OutboundEmail).filter(OutboundEmail.dedup_key.in_(keys))
+    }
+
+
+def refresh_score(db: Session, email: OutboundEmail, score: int) -> None:
+    """Moves an unsent email to the lead's latest score instead of generating a new one."""
+    if not email.is_sent and email.score != score:
+        email.score = score
+        db.commit()
+
+
+def upsert_statement(dialect_name: Optional[str] = None):
+    """
+    INSERT for outbound_emails that refreshes an existing unsent row with the
+    same dedup key and leaves already sent rows untouched. Built for the
+    application database's dialect unless `dialect_name` is given.
+    """
+    dialect_name = dialect_name or engine.dialect.name
+    if dialect_name not in UPSERT_INSERTS:
+        raise NotImplementedError(f"No upsert for the {dialect_name} dialect; use save_or_refresh().")
+    statement = UPSERT_INSERTS[dialect_name](OutboundEmail)
+    return statement.on_conflict_do_update(
+        index_elements=[OutboundEmail.dedup_key],
+        set_={field: statement.excluded[field] for field in REFRESHED_FIELDS},
+        where=OutboundEmail.is_sent == False,
+    )
+
+
+def save_or_refresh(db: Session, row: dict) -> Optional[OutboundEmail]:
+    """
+    ORM counterpart of upsert_statement(). Returns the new or refreshed email,
+    or None when the company was already emailed.
+    """
+    email = db.query(OutboundEmail).filter(OutboundEmail.dedup_key == row["dedup_key"]).first()
+    if email is None:
+        email = OutboundEmail(**row)
+        db.add(email)
+    elif email.is_sent:
+        return None
+    else:
+        for field in REFRESHED_FIELDS:
+            setattr(email, field, row[field])
+    return email
+
+
+def backfill_dedup_keys(bind) -> int:
+    """
+    Gives emails saved before dedup keys existed their company_id as key, so
+    those companies are not emailed again. Only the oldest row of a company
+    gets it, and never a key that is already taken. Returns the rows updated.
+    """
+    with bind.begin() as connection:
+        result = connection.execute(text(
+            "UPDATE outbound_emails SET dedup_key = company_id "
+            "WHERE dedup_key IS NULL "
+            "AND id IN (SELECT MIN(id) FROM outbound_emails WHERE dedup_key IS NULL GROUP BY company_id) "
+            "AND company_id NOT IN (SELECT dedup_key FROM outbound_emails WHERE dedup_key IS NOT NULL)"
+        ))
+    return result.rowcount
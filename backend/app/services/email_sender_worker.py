@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from typing import Callable, List
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.services import email_sending_service
+from app.services.send_scheduler import AdaptiveSendSchedule, send_schedule
+
+
+class EmailSenderPool:
+    """
+    Sender threads that drain outbound_emails through leased claims. After a
+    cycle, a worker sleeps for the adaptive schedule's interval or until
+    notify() is called, which the generation path does whenever it commits a
+    new email, so a hot lead is sent right away instead of at the next poll.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        workers: int = email_sending_service.EMAIL_SENDER_WORKERS,
+        schedule: AdaptiveSendSchedule = send_schedule,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.schedule = schedule
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self.wakeups = 0
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._work, args=(worker,), name=f"email-sender-{worker}", daemon=True)
+            for worker in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stops the workers after their current cycle. Unfinished leases simply expire."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self) -> None:
+        """Wakes idle workers. Safe to call from any thread."""
+        self.wakeups += 1
+        self._wakeup.set()
+
+    def run_once(self, worker: int = 0) -> int:
+        """
+        Sends one adaptive batch as `worker` and feeds the outcome back to the
+        schedule. Returns how many emails were sent.
+        """
+        started_at = time.perf_counter()
+        with self.session_factory() as db:
+            sent = email_sending_service.send_prioritized_emails(
+                db, limit=self.schedule.batch_size, worker_id=email_sending_service.sender_id(worker)
+            )
+            backlog = email_sending_service.claimable_count(db)
+        self.schedule.record_cycle(sent, time.perf_counter() - started_at, backlog)
+
+        if backlog:
+            stats = self.schedule.stats()
+            logging.info(
+                f"EMAIL WORKER: {stats['throughput_per_minute']} emails/min, backlog {backlog}, "
+                f"drain ETA {stats['drain_eta_seconds']}s, next batch {stats['batch_size']} in {stats['interval_seconds']}s."
+            )
+        return sent
+
+    def _work(self, worker: int) -> None:
+        while not self._stopping.is_set():
+            try:
+                self.run_once(worker)
+            except Exception as e:
+                logging.error(f"EMAIL WORKER: Cycle failed. Error: {e}", exc_info=True)
+            # The interval is only a fallback poll; notify() ends the wait early.
+            # An email committed during run_once leaves the event set, so it is not missed.
+            if self._wakeup.wait(self.schedule.interval_seconds):
+                self._wakeup.clear()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "wakeups": self.wakeups,
+        }
+
+
+email_sender_pool = EmailSenderPool()
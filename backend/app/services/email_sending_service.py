@@ -1,27 +1,302 @@
-﻿from sqlalchemy.orm import Session
+﻿import logging
+import os
+import re
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.models.event_model import OutboundEmail
-from . import event_service
+from app.models.schemas import CompanyInput
+from . import email_transport, event_service
+from .rate_limiting import DomainThrottle
+
+EMAIL_SEND_BATCH_SIZE = int(os.getenv("EMAIL_SEND_BATCH_SIZE", "5"))
+EMAIL_SEND_LEASE_SECONDS = float(os.getenv("EMAIL_SEND_LEASE_SECONDS", "60"))
+EMAIL_SENDER_WORKERS = int(os.getenv("EMAIL_SENDER_WORKERS", "2"))
+# Failed sends are retried after the delay until the email has this many attempts.
+EMAIL_SEND_MAX_ATTEMPTS = int(os.getenv("EMAIL_SEND_MAX_ATTEMPTS", "5"))
+EMAIL_SEND_RETRY_DELAY_SECONDS = float(os.getenv("EMAIL_SEND_RETRY_DELAY_SECONDS", "300"))
+# Address used when the company has no contact_email; {domain} is filled in.
+EMAIL_RECIPIENT_TEMPLATE = os.getenv("EMAIL_RECIPIENT_TEMPLATE", "hello@{domain}")
+# Per-recipient-domain send rate; 0 disables it. EMAIL_DOMAIN_LIMITS overrides
+# it per domain as "gmail.com=120:20,outlook.com=30" (rate per minute[:burst]).
+EMAIL_DOMAIN_RATE_PER_MINUTE = float(os.getenv("EMAIL_DOMAIN_RATE_PER_MINUTE", "30"))
+EMAIL_DOMAIN_BURST = float(os.getenv("EMAIL_DOMAIN_BURST", "5"))
+EMAIL_DOMAIN_LIMITS = os.getenv("EMAIL_DOMAIN_LIMITS", "")
+# Emails claimed per email sent, so throttled domains can be skipped for others.
+EMAIL_DOMAIN_OVERFETCH = int(os.getenv("EMAIL_DOMAIN_OVERFETCH", "2"))
+
+
+def parse_domain_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        domain, _, limit = item.partition("=")
+        rate, _, burst = limit.partition(":")
+        limits[domain.strip()] = (float(rate), float(burst) if burst else EMAIL_DOMAIN_BURST)
+    return limits
+
+
+# Shared by the sender threads of this process; each replica throttles on its own.
+domain_throttle = DomainThrottle(
+    EMAIL_DOMAIN_RATE_PER_MINUTE, EMAIL_DOMAIN_BURST, parse_domain_limits(EMAIL_DOMAIN_LIMITS)
+)
+
+
+def recipient_for(company_data: CompanyInput) -> Optional[str]:
+    """
+    The contact email, else EMAIL_RECIPIENT_TEMPLATE at the company's domain.
+    None when neither is usable: the email is stored but never sent.
+    """
+    # Values with whitespace (CR/LF in particular) would inject SMTP commands or headers.
+    contact_email = (company_data.contact_email or "").strip()
+    if contact_email and not re.search(r"\s", contact_email):
+        return contact_email
+    domain = (company_data.domain or "").strip()
+    if not domain or re.search(r"\s", domain):
+        return None
+    return EMAIL_RECIPIENT_TEMPLATE.format(domain=domain)
+
+
+def recipient_domain(recipient: Optional[str]) -> Optional[str]:
+    return recipient.rpartition("@")[2].lower() or None if recipient else None
+
+
+def sender_id(worker: int = 0) -> str:
+    """Identifies a sender worker across replicas: host, process and worker number."""
+    return f"{socket.gethostname()}:{os.getpid()}:{worker}"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _claimable(now: datetime):
+    return (
+        OutboundEmail.is_sent == False,
+        OutboundEmail.send_attempts < EMAIL_SEND_MAX_ATTEMPTS,
+        or_(OutboundEmail.lease_expires_at.is_(None), OutboundEmail.lease_expires_at < now),
+    )
+
+
+def claim_emails(
+    db: Session,
+    worker_id: str,
+    limit: int,
+    lease_seconds: float = EMAIL_SEND_LEASE_SECONDS,
+    exclude_domains: Iterable[str] = (),
+) -> List[OutboundEmail]:
+    """
+    Leases up to `limit` of the highest-score unsent emails to `worker_id` and
+    returns them. A single UPDATE does the claim, so concurrent workers (in
+    this process or another replica) never hold the same email. Emails whose
+    lease expired, because their worker died mid-send, are claimed again.
+    Emails to `exclude_domains` are left in the queue.
+    """
+    now = _utcnow()
+    lease_expires_at = now + timedelta(seconds=lease_seconds)
+    conditions = list(_claimable(now))
+    exclude_domains = list(exclude_domains)
+    if exclude_domains:
+        conditions.append(or_(
+            OutboundEmail.recipient_domain.is_(None),
+            OutboundEmail.recipient_domain.notin_(exclude_domains),
+        ))
+    next_emails = (
+        select(OutboundEmail.id)
+        .where(*conditions)
+        .order_by(OutboundEmail.score.desc(), OutboundEmail.id)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.id.in_(next_emails), *_claimable(now))
+        .values(claimed_by=worker_id, lease_expires_at=lease_expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return (
+        db.query(OutboundEmail)
+        .filter(
+            OutboundEmail.claimed_by == worker_id,
+            OutboundEmail.lease_expires_at == lease_expires_at,
+            OutboundEmail.is_sent == False,
+        )
+        .order_by(OutboundEmail.score.desc(), OutboundEmail.id)
+        .all()
+    )
+
+
+def _finish(
+    db: Session,
+    worker_id: str,
+    email_ids: List[int],
+    sent: bool,
+    error: Optional[str] = None,
+    retry: bool = True,
+) -> int:
+    if not email_ids:
+        return 0
+    now = _utcnow()
+    result = db.execute(
+        update(OutboundEmail)
+        .where(
+            OutboundEmail.id.in_(email_ids),
+            OutboundEmail.claimed_by == worker_id,
+            OutboundEmail.is_sent == False,
+        )
+        .values(
+            is_sent=sent,
+            claimed_by=None,
+            # A failed email stays unclaimable until the retry delay has passed.
+            lease_expires_at=None if sent else now + timedelta(seconds=EMAIL_SEND_RETRY_DELAY_SECONDS),
+            # An email that can never be sent uses up its attempts at once.
+            send_attempts=OutboundEmail.send_attempts + 1 if retry else EMAIL_SEND_MAX_ATTEMPTS,
+            last_attempt_at=now,
+            last_send_error=error,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
 
-def send_prioritized_emails(db: Session):
+
+def unclaim_emails(db: Session, worker_id: str, email_ids: List[int]) -> None:
+    """Gives back leased emails that were not attempted, without counting an attempt."""
+    if not email_ids:
+        return
+    db.execute(
+        update(OutboundEmail)
+        .where(
+            OutboundEmail.id.in_(email_ids),
+            OutboundEmail.claimed_by == worker_id,
+            OutboundEmail.is_sent == False,
+        )
+        .values(claimed_by=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def select_by_domain(
+    emails: List[OutboundEmail], limit: int, throttle: DomainThrottle
+) -> Tuple[List[OutboundEmail], List[OutboundEmail]]:
+    """
+    Walks score-ordered emails once and takes each one whose domain still has
+    a token, up to `limit`. A domain that runs out is skipped for the rest of
+    the walk, so lower-score emails to other domains go out instead of waiting
+    behind it. Returns the emails to send and the deferred ones.
+    """
+    selected, deferred, throttled = [], [], set()
+    for email in emails:
+        domain = email.recipient_domain
+        if len(selected) < limit and domain not in throttled and throttle.try_acquire(domain):
+            selected.append(email)
+        else:
+            if domain and len(selected) < limit:
+                throttled.add(domain)
+            deferred.append(email)
+    return selected, deferred
+
+
+def mark_sent(db: Session, worker_id: str, email_ids: List[int]) -> int:
+    """
+    Marks emails still leased to `worker_id` as sent and releases them.
+    Returns how many were updated; an email whose lease was lost is skipped.
+    """
+    return _finish(db, worker_id, email_ids, sent=True)
+
+
+def release_emails(
+    db: Session,
+    worker_id: str,
+    email_ids: List[int],
+    error: Optional[str] = None,
+    retry: bool = True,
+) -> int:
     """
-    Fetches and "sends" emails from the queue, prioritizing by highest score.
-    This function will be called periodically by the scheduler.
+    Records a failed attempt and releases the emails; they are claimed again
+    after EMAIL_SEND_RETRY_DELAY_SECONDS, up to EMAIL_SEND_MAX_ATTEMPTS attempts.
+    With retry=False they are counted as failed right away.
     """
-    print("--- EMAIL WORKER: Verifying emails to send. ---")
+    return _finish(db, worker_id, email_ids, sent=False, error=error, retry=retry)
 
-    emails_to_send = db.query(OutboundEmail).filter(
-        OutboundEmail.is_sent == False
-    ).order_by(OutboundEmail.score.desc()).limit(5).all()
+
+def claimable_count(db: Session) -> int:
+    """
+    Emails a worker could claim right now: unsent, with attempts left, and
+    neither leased nor waiting out a retry delay. This is the backlog the
+    send schedule adapts to.
+    """
+    return db.query(OutboundEmail).filter(*_claimable(_utcnow())).count()
+
+
+def queue_stats(db: Session) -> dict:
+    """Unsent emails that can still be sent, how many are leased, and those out of attempts."""
+    unsent = db.query(OutboundEmail).filter(OutboundEmail.is_sent == False)
+    pending = unsent.filter(OutboundEmail.send_attempts < EMAIL_SEND_MAX_ATTEMPTS)
+    return {
+        "unsent": pending.count(),
+        "leased": pending.filter(OutboundEmail.claimed_by.isnot(None)).count(),
+        "failed": unsent.filter(OutboundEmail.send_attempts >= EMAIL_SEND_MAX_ATTEMPTS).count(),
+    }
+
+
+def send_prioritized_emails(
+    db: Session, limit: int = EMAIL_SEND_BATCH_SIZE, worker_id: Optional[str] = None
+) -> int:
+    """
+    Fetches and sends emails from the queue, prioritizing by highest score,
+    through the configured email transport. This function will be called
+    periodically by the sender workers, possibly several at once; each one
+    only sends the emails it leased. Sends are spread across recipient
+    domains by the per-domain throttle: saturated domains are not claimed,
+    and within a claim higher scores go first among the domains that still
+    have tokens. Every email's result is written back: sent, or released for
+    a retry with its error. Returns how many were sent.
+    """
+    worker_id = worker_id or sender_id()
+    print(f"--- EMAIL WORKER {worker_id}: Verifying emails to send. ---")
+
+    claimed = claim_emails(
+        db, worker_id, limit * max(1, EMAIL_DOMAIN_OVERFETCH),
+        exclude_domains=domain_throttle.saturated_domains(),
+    )
+    emails_to_send, deferred = select_by_domain(claimed, limit, domain_throttle)
+    unclaim_emails(db, worker_id, [email.id for email in deferred])
 
     if not emails_to_send:
         print("--- EMAIL WORKER: No companies in the queue. ---")
-        return
+        return 0
 
     for email in emails_to_send:
         print(f"--- EMAIL WORKER: Sending email to {email.company_id}, Variant: {email.variant_name} ---")
-        email.is_sent = True
-        email.send_attempts += 1
 
-    db.commit()
-    print(f"--- EMAIL WORKER: Cycle finished. {len(emails_to_send)} emails sent. ---")
\ No newline at end of file
+    try:
+        results = email_transport.get_transport().send_many([
+            email_transport.OutgoingEmail(email.id, email.recipient, email.email_subject, email.email_body)
+            for email in emails_to_send
+        ])
+    except Exception as e:
+        # Record the attempt, so a batch that breaks the transport is not retried forever.
+        logging.error(f"EMAIL WORKER {worker_id}: Transport failed. Error: {e}", exc_info=True)
+        release_emails(db, worker_id, [email.id for email in emails_to_send], repr(e))
+        return 0
+    delivered = [result.email_id for result in results if result.ok]
+    for result in results:
+        if not result.ok:
+            logging.warning(f"EMAIL WORKER {worker_id}: Email {result.email_id} failed. Error: {result.error}")
+            release_emails(db, worker_id, [result.email_id], result.error, retry=not result.permanent)
+
+    sent = mark_sent(db, worker_id, delivered)
+    if sent < len(delivered):
+        logging.warning(
+            f"EMAIL WORKER {worker_id}: {len(delivered) - sent} leases expired before the send was recorded."
+        )
+    print(f"--- EMAIL WORKER: Cycle finished. {sent} emails sent. ---")
+    return sent
@@ -0,0 +1,67 @@
+import os
+from string import Template
+
+from app.models.schemas import CompanyInput, ScoringOutput
+
+# Leads in these actions, or scoring below the threshold, get a rendered
+# template instead of an LLM-written email. A threshold of 0 disables it.
+TEMPLATE_ACTIONS = frozenset(
+    action.strip()
+    for action in os.getenv("GENERATION_TEMPLATE_ACTIONS", "low_priority_monitoring").split(",")
+    if action.strip()
+)
+TEMPLATE_SCORE_THRESHOLD = int(os.getenv("GENERATION_TEMPLATE_SCORE_THRESHOLD", "0"))
+
+EMAIL_TEMPLATES = {
+    "problem_focused": (
+        Template("$company_name: fewer manual workflows, same team"),
+        Template(
+            "Hi $company_name team,\n\n"
+            "Growing $team_phrase usually means more time spent moving data between tools, "
+            "chasing approvals and running the same processes by hand$tool_phrase.\n\n"
+            "Brim's AI teammates take those workflows over end to end, so your people can focus "
+            "on the work that needs them.\n\n"
+            "Would a 20-minute walkthrough next week be useful?\n\n"
+            "Best,\nThe Brim team"
+        ),
+    ),
+    "roi_focused": (
+        Template("Saving $company_name hours every week"),
+        Template(
+            "Hi $company_name team,\n\n"
+            "Companies like yours$industry_phrase use Brim's AI teammates to automate repetitive "
+            "operations work, typically saving each team several hours a week and cutting the cost "
+            "of scaling $team_phrase.\n\n"
+            "Happy to share the numbers from similar teams. Open to a short call?\n\n"
+            "Best,\nThe Brim team"
+        ),
+    ),
+}
+
+
+def uses_template(scoring: ScoringOutput) -> bool:
+    """True when the lead's tier is low enough to skip the LLM."""
+    return scoring.action in TEMPLATE_ACTIONS or scoring.total_score < TEMPLATE_SCORE_THRESHOLD
+
+
+def render_email(variant_name: str, company_data: CompanyInput) -> dict:
+    """Renders the precompiled template for a variant, in the same shape the LLM returns."""
+    subject, body = EMAIL_TEMPLATES[variant_name]
+    automation_tools = [tool for tool in company_data.tech_stack or [] if tool in ("Zapier", "Make")]
+    params = {
+        "company_name": company_data.company_name,
+        "team_phrase": (
+            f"a {company_data.employee_count}-person team"
+            if company_data.employee_count
+            else "a team"
+        ),
+        "industry_phrase": f" in {company_data.industry}" if company_data.industry else "",
+        "tool_phrase": (
+            f", even with tools like {automation_tools[0]} in place" if automation_tools else ""
+        ),
+    }
+    return {
+        "variant_name": variant_name,
+        "subject": subject.substitute(params),
+        "body": body.substitute(params),
+    }
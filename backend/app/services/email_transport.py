@@ -0,0 +1,426 @@
+import asyncio
+import base64
+import logging
+import os
+import re
+import ssl
+import threading
+from dataclasses import dataclass
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from typing import List, Optional, Sequence, Tuple
+
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "log")
+EMAIL_FROM_ADDRESS = os.getenv("EMAIL_FROM_ADDRESS", "growth@brim.example")
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME") or None
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD") or None
+# none | starttls | tls (implicit TLS, usually port 465)
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", "none")
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+
+SECURITY_MODES = ("none", "starttls", "tls")
+
+
+@dataclass
+class OutgoingEmail:
+    email_id: int
+    recipient: Optional[str]
+    subject: str
+    body: str
+
+
+@dataclass
+class SendResult:
+    email_id: int
+    ok: bool
+    code: Optional[int] = None
+    error: Optional[str] = None
+    # The email itself is unsendable (e.g. no recipient): retrying cannot help.
+    permanent: bool = False
+
+
+class SMTPReplyError(Exception):
+    """The server answered a command with an unexpected reply code."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+LINE_BREAK = re.compile(r"[\r\n]")
+
+
+def single_line(value: Optional[str]) -> str:
+    """Folds CR/LF into spaces so a header value cannot start a new header."""
+    return re.sub(r"\s*[\r\n]+\s*", " ", value or "").strip()
+
+
+def build_message(sender: str, email: OutgoingEmail) -> bytes:
+    message = EmailMessage(policy=SMTP_POLICY)
+    message["From"] = sender
+    message["To"] = email.recipient
+    message["Subject"] = single_line(email.subject)
+    message.set_content(email.body or "")
+    return message.as_bytes()
+
+
+def _dot_stuff(data: bytes) -> bytes:
+    """Escapes leading dots and terminates the DATA section (RFC 5321, 4.5.2)."""
+    data = re.sub(rb"(?m)^\.", b"..", data)
+    if not data.endswith(b"\r\n"):
+        data += b"\r\n"
+    return data + b".\r\n"
+
+
+class SMTPConnection:
+    """
+    One persistent SMTP session over asyncio streams. When the server
+    advertises PIPELINING, MAIL, RCPT and DATA go out in a single write and
+    their replies are read back together, saving two round trips per message.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        security: str = "none",
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        timeout: float = SMTP_TIMEOUT_SECONDS,
+        local_hostname: str = "brim-sender",
+    ):
+        if security not in SECURITY_MODES:
+            raise ValueError(f"Unknown SMTP security '{security}'. Use one of {', '.join(SECURITY_MODES)}.")
+        self.host = host
+        self.port = port
+        self.security = security
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.local_hostname = local_hostname
+        self.extensions = set()
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    @property
+    def pipelining(self) -> bool:
+        return "PIPELINING" in self.extensions
+
+    async def connect(self) -> None:
+        try:
+            await self._open()
+        except BaseException:
+            # Never leave a half-open session that skipped EHLO or AUTH in the pool.
+            await self.close()
+            raise
+
+    async def _open(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=ssl.create_default_context() if self.security == "tls" else None,
+            ),
+            self.timeout,
+        )
+        await self._expect((220,))
+        await self._hello()
+        if self.security == "starttls":
+            await self._command("STARTTLS", (220,))
+            await self._writer.start_tls(ssl.create_default_context())
+            await self._hello()
+        if self.username:
+            token = base64.b64encode(f"\0{self.username}\0{self.password or ''}".encode()).decode()
+            await self._command(f"AUTH PLAIN {token}", (235,))
+
+    async def _hello(self) -> None:
+        code, lines = await self._command(f"EHLO {self.local_hostname}")
+        if code == 250:
+            self.extensions = {line.split()[0].upper() for line in lines[1:] if line.strip()}
+        else:
+            await self._command(f"HELO {self.local_hostname}", (250,))
+            self.extensions = set()
+
+    async def _read_reply(self) -> Tuple[int, List[str]]:
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+            if not line:
+                raise ConnectionError("SMTP server closed the connection.")
+            text = line.decode(errors="replace").rstrip("\r\n")
+            lines.append(text[4:])
+            if len(text) < 4 or text[3] != "-":
+                return int(text[:3]), lines
+
+    async def _expect(self, codes: Tuple[int, ...]) -> Tuple[int, List[str]]:
+        code, lines = await self._read_reply()
+        if code not in codes:
+            raise SMTPReplyError(code, " ".join(lines))
+        return code, lines
+
+    async def _command(self, command: str, codes: Optional[Tuple[int, ...]] = None) -> Tuple[int, List[str]]:
+        self._writer.write(command.encode() + b"\r\n")
+        await self._writer.drain()
+        if codes is None:
+            return await self._read_reply()
+        return await self._expect(codes)
+
+    async def send(self, sender: str, recipient: str, message: bytes) -> int:
+        """Sends one message; raises SMTPReplyError when the server refuses it."""
+        envelope = (
+            (f"MAIL FROM:<{sender}>", (250,)),
+            (f"RCPT TO:<{recipient}>", (250, 251)),
+            ("DATA", (354,)),
+        )
+        replies = []
+        if self.pipelining:
+            self._writer.write("".join(f"{command}\r\n" for command, _ in envelope).encode())
+            await self._writer.drain()
+            for _ in envelope:
+                replies.append(await self._read_reply())
+        else:
+            for command, codes in envelope:
+                replies.append(await self._command(command))
+                if replies[-1][0] not in codes:
+                    break
+
+        for (code, lines), (_, codes) in zip(replies, envelope):
+            if code not in codes:
+                if len(replies) == len(envelope) and replies[-1][0] == 354:
+                    # DATA was accepted after an earlier refusal; end it empty.
+                    self._writer.write(b".\r\n")
+                    await self._read_reply()
+                await self._command("RSET")
+                raise SMTPReplyError(code, " ".join(lines))
+
+        self._writer.write(_dot_stuff(message))
+        await self._writer.drain()
+        code, _ = await self._expect((250,))
+        return code
+
+    async def close(self) -> None:
+        if self._writer is None:
+            return
+        writer, self._writer = self._writer, None
+        try:
+            if not writer.is_closing():
+                writer.write(b"QUIT\r\n")
+                await writer.drain()
+            writer.close()
+            await asyncio.wait_for(writer.wait_closed(), self.timeout)
+        except (OSError, EOFError):
+            pass
+
+
+class EmailTransport:
+    """
+    Delivers a batch of emails and reports a result per email, in order.
+    Called from the sender threads, so send_many() is synchronous.
+    """
+
+    name = "base"
+
+    def start(self) -> None:
+        pass
+
+    def send_many(self, emails: Sequence[OutgoingEmail]) -> List[SendResult]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"transport": self.name}
+
+
+class LogTransport(EmailTransport):
+    """Only logs the emails (the worker prints each one) and reports them as sent."""
+
+    name = "log"
+
+    def send_many(self, emails: Sequence[OutgoingEmail]) -> List[SendResult]:
+        return [SendResult(email.email_id, True) for email in emails]
+
+
+class SMTPTransport(EmailTransport):
+    """
+    Sends through a pool of `pool_size` persistent SMTP connections driven by
+    an event loop in a background thread. Emails from every sender thread are
+    sent concurrently, one per free connection; a connection that drops is
+    reopened and the email retried once on it.
+    """
+
+    name = "smtp"
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        security: str = SMTP_SECURITY,
+        username: Optional[str] = SMTP_USERNAME,
+        password: Optional[str] = SMTP_PASSWORD,
+        pool_size: int = SMTP_POOL_SIZE,
+        timeout: float = SMTP_TIMEOUT_SECONDS,
+        sender: str = EMAIL_FROM_ADDRESS,
+    ):
+        self.connection_args = dict(
+            host=host, port=port, security=security, username=username, password=password, timeout=timeout
+        )
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.sender = sender
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._idle: Optional[asyncio.Queue] = None
+        self._connections: List[SMTPConnection] = []
+        self.connections_opened = 0
+        self.sent = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """Starts the transport loop and opens the pool; connections that fail are retried on use."""
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="smtp-transport", daemon=True)
+            self._thread.start()
+            self._run(self._open_pool())
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _open_pool(self) -> None:
+        self._idle = asyncio.Queue()
+        self._connections = [SMTPConnection(**self.connection_args) for _ in range(self.pool_size)]
+        results = await asyncio.gather(
+            *(connection.connect() for connection in self._connections), return_exceptions=True
+        )
+        failures = [result for result in results if isinstance(result, BaseException)]
+        self.connections_opened += len(results) - len(failures)
+        if failures:
+            logging.warning(
+                f"SMTP POOL: {len(failures)} of {len(results)} connections failed to open. Error: {failures[0]!r}"
+            )
+        for connection in self._connections:
+            self._idle.put_nowait(connection)
+
+    async def _send_one(self, email: OutgoingEmail) -> SendResult:
+        if not email.recipient:
+            return SendResult(email.email_id, False, error="No recipient address.", permanent=True)
+        if LINE_BREAK.search(email.recipient):
+            return SendResult(
+                email.email_id, False, error="Recipient address contains a line break.", permanent=True
+            )
+        try:
+            message = build_message(self.sender, email)
+        except (ValueError, TypeError) as e:
+            return SendResult(email.email_id, False, error=f"Could not build the message: {e!r}", permanent=True)
+        connection = await self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    if not connection.connected:
+                        await connection.connect()
+                        self.connections_opened += 1
+                    code = await connection.send(self.sender, email.recipient, message)
+                    return SendResult(email.email_id, True, code)
+                except SMTPReplyError as e:
+                    return SendResult(email.email_id, False, e.code, str(e))
+                except (OSError, EOFError) as e:
+                    await connection.close()
+                    if attempt:
+                        return SendResult(email.email_id, False, error=repr(e))
+                except Exception as e:
+                    # The session is in an unknown state; reopen it for the next email.
+                    await connection.close()
+                    return SendResult(email.email_id, False, error=repr(e))
+        finally:
+            self._idle.put_nowait(connection)
+
+    async def _send_many(self, emails: Sequence[OutgoingEmail]) -> List[SendResult]:
+        # One email failing must not lose the results of those the relay already accepted.
+        results = await asyncio.gather(*(self._send_one(email) for email in emails), return_exceptions=True)
+        return [
+            SendResult(email.email_id, False, error=repr(result)) if isinstance(result, BaseException) else result
+            for email, result in zip(emails, results)
+        ]
+
+    async def _close_pool(self) -> None:
+        await asyncio.gather(*(connection.close() for connection in self._connections))
+
+    def send_many(self, emails: Sequence[OutgoingEmail]) -> List[SendResult]:
+        self.start()
+        results = self._run(self._send_many(emails))
+        sent = sum(result.ok for result in results)
+        self.sent += sent
+        self.failed += len(results) - sent
+        return results
+
+    def close(self) -> None:
+        with self._start_lock:
+            if self._loop is None:
+                return
+            self._run(self._close_pool())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop, self._thread, self._connections = None, None, []
+
+    def stats(self) -> dict:
+        return {
+            "transport": self.name,
+            "pool_size": self.pool_size,
+            "open_connections": sum(connection.connected for connection in self._connections),
+            "connections_opened": self.connections_opened,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+
+TRANSPORTS = {
+    LogTransport.name: LogTransport,
+    SMTPTransport.name: SMTPTransport,
+}
+
+_transport: Optional[EmailTransport] = None
+_transport_lock = threading.Lock()
+
+
+def create_transport(name: str = None) -> EmailTransport:
+    name = name or EMAIL_TRANSPORT
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown email transport '{name}'. Use one of {', '.join(TRANSPORTS)}.")
+    return TRANSPORTS[name]()
+
+
+def get_transport() -> EmailTransport:
+    """Returns the transport selected by EMAIL_TRANSPORT, creating it on first use."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = create_transport()
+            logging.info(f"Email transport: {_transport.name}")
+        return _transport
+
+
+def set_transport(transport: Optional[EmailTransport]) -> None:
+    """Swaps the active transport (e.g. an SMTPTransport pointed at an SMTPSink). None resets it."""
+    global _transport
+    _transport = transport
+
+
+def close_transport() -> None:
+    global _transport
+    if _transport is not None:
+        transport, _transport = _transport, None
+        transport.close()
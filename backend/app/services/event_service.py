@@ -1,50 +1,104 @@
-﻿from sqlalchemy.orm import Session
+﻿import os
+from typing import Iterable, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
 from app.models.event_model import Event, OutboundEmail
 from app.models.schemas import ScoringOutput, ActivationEventInput, CompanyInput
+from app.services.write_behind import WriteBehindQueue
 
+BULK_INSERT_CHUNK_SIZE = 500
 
-def log_score_calculated_event(db: Session, score_output: ScoringOutput, model: str, company_input: CompanyInput):
-    """Creates and saves a 'score_calculated' event to the database."""
-    event = Event(
-        event_type="score_calculated",
-        company_id=score_output.company_id,
-        event_data={
+# Started by the application lifespan. While it runs, every writer below only
+# enqueues its rows and a background thread group-commits them.
+event_write_queue = WriteBehindQueue(
+    SessionLocal,
+    max_batch_size=int(os.getenv("EVENT_QUEUE_BATCH_SIZE", "500")),
+    max_delay_seconds=float(os.getenv("EVENT_QUEUE_FLUSH_INTERVAL_MS", "50")) / 1000,
+    max_queue_size=int(os.getenv("EVENT_QUEUE_MAX_SIZE", "100000")),
+    name="event-write-queue",
+)
+
+
+def _save_event(db: Session, row: dict) -> Event:
+    """Hands the row to the write-behind queue when it is running, otherwise commits it directly."""
+    if event_write_queue.running:
+        event_write_queue.enqueue(Event, row)
+        return Event(**row)
+
+    event = Event(**row)
+    db.add(event)
+    db.commit()
+    db.refresh(event)
+    return event
+
+
+def _score_event_row(score_output: ScoringOutput, model: str, company_input: CompanyInput) -> dict:
+    return {
+        "event_type": "score_calculated",
+        "company_id": score_output.company_id,
+        "event_data": {
             "model_used": model,
             "score": score_output.total_score,
             "company_name": company_input.company_name
         }
-    )
-    db.add(event)
+    }
+
+
+def log_score_calculated_event(db: Session, score_output: ScoringOutput, model: str, company_input: CompanyInput):
+    """Creates and saves a 'score_calculated' event to the database."""
+    return _save_event(db, _score_event_row(score_output, model, company_input))
+
+
+def log_score_calculated_events(
+    db: Session,
+    scored_companies: Iterable[Tuple[ScoringOutput, CompanyInput]],
+    model: str,
+    chunk_size: int = BULK_INSERT_CHUNK_SIZE,
+) -> int:
+    """
+    Saves many 'score_calculated' events with one multi-row INSERT per chunk
+    and a single commit (or one enqueue when the write-behind queue runs).
+    Rows are not refreshed; returns the number written.
+    """
+    rows = [
+        _score_event_row(score_output, model, company_input)
+        for score_output, company_input in scored_companies
+    ]
+    if event_write_queue.running:
+        event_write_queue.enqueue_many(Event, rows)
+        return len(rows)
+
+    for start in range(0, len(rows), chunk_size):
+        db.execute(insert(Event).values(rows[start:start + chunk_size]))
     db.commit()
-    db.refresh(event)
-    print("commit")
-    return event
+    return len(rows)
+
+
+def email_generated_event_row(company_id: str) -> dict:
+    return {
+        "event_type": "email_generated",
+        "company_id": company_id,
+    }
 
 
 def log_email_generated_event(db: Session, email_record: OutboundEmail):
     """Creates and saves an 'email_generated' event to the database."""
-    event = Event(
-        event_type="email_generated",
-        company_id=email_record.company_id,
-    )
-    db.add(event)
-    db.commit()
-    db.refresh(event)
-    return event
+    return _save_event(db, email_generated_event_row(email_record.company_id))
 
 
 def log_activation_event(db: Session, event_data: ActivationEventInput):
     """Creates and saves an activation event to the database."""
-    new_event = Event(
-        event_type="activation_step_completed",
-        user_id=event_data.user_id,
-        event_data={
-            "step": event_data.step_name,
-            **(event_data.metadata or {})
-        }
+    new_event = _save_event(
+        db,
+        {
+            "event_type": "activation_step_completed",
+            "user_id": event_data.user_id,
+            "event_data": {
+                "step": event_data.step_name,
+                **(event_data.metadata or {})
+            }
+        },
     )
-    db.add(new_event)
-    db.commit()
-    db.refresh(new_event)
     print(f"Activation event registered: {event_data.step_name} for user: {event_data.user_id}")
     return new_event
\ No newline at end of file
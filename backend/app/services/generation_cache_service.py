@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.event_model import GeneratedEmailCache
+from app.models.schemas import SCORING_FIELDS, CompanyInput
+
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "50000"))
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, (list, tuple)):
+        return sorted({_normalize(item) for item in value if item})
+    return value
+
+
+def fingerprint_company(company: CompanyInput, score: int) -> dict:
+    """
+    The company context that goes into a generation prompt, normalized so that
+    casing, whitespace and list order do not change the cache key.
+    """
+    context = {
+        field_name: _normalize(value)
+        for field_name, value in company.dict(include=set(SCORING_FIELDS)).items()
+        if value not in (None, "", [])
+    }
+    context["score"] = score
+    return context
+
+
+def make_cache_key(variant_name: str, company: CompanyInput, score: int) -> str:
+    canonical = json.dumps(
+        {"variant": variant_name, "context": fingerprint_company(company, score)},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def get_cached_email(db: Session, cache_key: str) -> Optional[GeneratedEmailCache]:
+    """Returns the stored subject/body for this key and marks it as recently used."""
+    if not GENERATION_CACHE_ENABLED:
+        return None
+    entry = db.get(GeneratedEmailCache, cache_key)
+    if entry is not None:
+        entry.hits = (entry.hits or 0) + 1
+        entry.last_used_at = func.now()
+        db.commit()
+        db.refresh(entry)
+    return entry
+
+
+def store_email(db: Session, cache_key: str, variant: dict) -> None:
+    """Stores a generated variant and evicts the least recently used entries over the size bound."""
+    store_emails(db, [(cache_key, variant)])
+
+
+def store_emails(db: Session, entries: List[Tuple[str, dict]]) -> None:
+    """Stores many generated variants with a single commit and one eviction pass."""
+    if not GENERATION_CACHE_ENABLED or not entries:
+        return
+    for cache_key, variant in entries:
+        db.merge(
+            GeneratedEmailCache(
+                cache_key=cache_key,
+                variant_name=variant.get("variant_name"),
+                email_subject=variant.get("subject"),
+                email_body=variant.get("body"),
+                hits=0,
+            )
+        )
+    db.commit()
+    evict_over_limit(db)
+
+
+def evict_over_limit(db: Session, max_entries: int = None) -> int:
+    max_entries = GENERATION_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    stale_keys = (
+        db.query(GeneratedEmailCache.cache_key)
+        .order_by(GeneratedEmailCache.last_used_at.desc(), GeneratedEmailCache.created_at.desc())
+        .offset(max_entries)
+        .all()
+    )
+    if not stale_keys:
+        return 0
+    db.query(GeneratedEmailCache).filter(
+        GeneratedEmailCache.cache_key.in_([key for (key,) in stale_keys])
+    ).delete(synchronize_session=False)
+    db.commit()
+    return len(stale_keys)
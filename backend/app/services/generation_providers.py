@@ -0,0 +1,361 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+from google.api_core import exceptions as google_exceptions
+
+GENERATION_PROVIDER = os.getenv("GENERATION_PROVIDER", "gemini")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-1.5-flash")
+GEMINI_CLIENT_POOL_SIZE = int(os.getenv("GEMINI_CLIENT_POOL_SIZE", "4"))
+GEMINI_WARMUP_TIMEOUT_SECONDS = float(os.getenv("GEMINI_WARMUP_TIMEOUT_SECONDS", "10"))
+
+STUB_LATENCY_DISTRIBUTION = os.getenv("STUB_LATENCY_DISTRIBUTION", "lognormal")
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "800"))
+STUB_LATENCY_SPREAD = float(os.getenv("STUB_LATENCY_SPREAD", "0.5"))
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+STUB_RATE_LIMIT_RATE = float(os.getenv("STUB_RATE_LIMIT_RATE", "0"))
+STUB_SEED = int(os.getenv("STUB_SEED", "42"))
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class ProviderError(Exception):
+    """A generation call failed on the provider side."""
+
+
+class ProviderRateLimitError(ProviderError):
+    """The provider rejected the call because of quota or rate limits."""
+
+
+@dataclass
+class Completion:
+    """The model's answer, with the token counts the provider billed when it reports them."""
+
+    text: str
+    prompt_tokens: Optional[int] = None
+    response_tokens: Optional[int] = None
+
+
+def _reported_tokens(usage, field: str) -> Optional[int]:
+    count = getattr(usage, field, None)
+    return count if isinstance(count, int) and count > 0 else None
+
+
+class SDKCompatibilityError(RuntimeError):
+    """The installed google-generativeai no longer has the internals the client pool relies on."""
+
+
+def make_async_client():
+    """
+    Builds a new async Gemini client. The SDK only hands out one shared
+    default client, so this goes through its client manager. That is an
+    internal of google-generativeai, which is pinned in requirements.txt for
+    this reason; test_generation_providers runs this shim against the real SDK.
+    """
+    manager = getattr(genai_client, "_client_manager", None)
+    if manager is None or not hasattr(manager, "make_client"):
+        raise SDKCompatibilityError(
+            "google.generativeai.client._client_manager.make_client is gone; "
+            "update make_async_client() for this SDK version."
+        )
+    return manager.make_client("generative_async")
+
+
+def bind_async_client(model, async_client) -> None:
+    """Makes `model` send its async calls through `async_client` (an SDK internal, see make_async_client())."""
+    if not hasattr(model, "_async_client"):
+        raise SDKCompatibilityError(
+            "GenerativeModel._async_client is gone; update bind_async_client() for this SDK version."
+        )
+    model._async_client = async_client
+
+
+class GenerationProvider:
+    """
+    Turns a prompt into the raw text the model answered with. Implementations
+    raise ProviderRateLimitError when throttled so the limiters can react to
+    it without knowing the provider.
+    """
+
+    name = "base"
+
+    async def start(self) -> None:
+        """Opens and warms connections before the first call. Called at application startup."""
+
+    async def generate(self, prompt_text: str) -> str:
+        raise NotImplementedError
+
+    async def complete(self, prompt_text: str) -> Completion:
+        """Like generate(), plus the token counts when the provider reports them."""
+        return Completion(await self.generate(prompt_text))
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class GeminiProvider(GenerationProvider):
+    """
+    Keeps a pool of `pool_size` models, each with its own async client (and
+    gRPC channel), built once and reused round-robin by every generation path.
+    start() builds and warms the pool; if it was not called, the pool is built
+    on the first call without warm-up.
+    """
+
+    name = "gemini"
+
+    THROTTLING_ERRORS = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+    )
+
+    def __init__(
+        self,
+        model_name: str = GEMINI_MODEL_NAME,
+        api_key: Optional[str] = None,
+        pool_size: int = GEMINI_CLIENT_POOL_SIZE,
+    ):
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            logging.critical("FATAL ERROR: GEMINI_API_KEY environment variable is not defined.")
+            raise RuntimeError(
+                "GEMINI_API_KEY is not set. Set it, or use GENERATION_PROVIDER=stub to run without Gemini."
+            )
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.generation_config = genai.GenerationConfig(response_mime_type="application/json")
+        self.pool_size = max(1, pool_size)
+        self._models = []
+        self._clients = []
+        self._next = 0
+        self.warmed = 0
+
+    def create_model(self):
+        # The SDK shares one default async client; each pooled model gets its own.
+        async_client = make_async_client()
+        model = genai.GenerativeModel(self.model_name, generation_config=self.generation_config)
+        bind_async_client(model, async_client)
+        self._clients.append(async_client)
+        return model
+
+    def _ensure_pool(self) -> None:
+        if not self._models:
+            self._models = [self.create_model() for _ in range(self.pool_size)]
+
+    async def start(self) -> None:
+        self._ensure_pool()
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(model.count_tokens_async("ping"), GEMINI_WARMUP_TIMEOUT_SECONDS)
+                for model in self._models
+            ),
+            return_exceptions=True,
+        )
+        failures = [result for result in results if isinstance(result, BaseException)]
+        self.warmed = len(results) - len(failures)
+        if failures:
+            logging.warning(
+                f"Gemini client pool: {len(failures)} of {len(results)} connections failed to warm up. Error: {failures[0]!r}"
+            )
+        logging.info(f"Gemini client pool: {self.warmed}/{len(results)} connections warmed.")
+
+    def next_model(self):
+        self._ensure_pool()
+        model = self._models[self._next % len(self._models)]
+        self._next += 1
+        return model
+
+    async def generate(self, prompt_text: str) -> str:
+        return (await self.complete(prompt_text)).text
+
+    async def complete(self, prompt_text: str) -> Completion:
+        try:
+            response = await self.next_model().generate_content_async(prompt_text)
+        except self.THROTTLING_ERRORS as e:
+            raise ProviderRateLimitError(str(e)) from e
+        usage = getattr(response, "usage_metadata", None)
+        return Completion(
+            response.text,
+            _reported_tokens(usage, "prompt_token_count"),
+            _reported_tokens(usage, "candidates_token_count"),
+        )
+
+    async def close(self) -> None:
+        clients, self._clients, self._models = self._clients, [], []
+        self.warmed = 0
+        for async_client in clients:
+            try:
+                await async_client.transport.close()
+            except Exception as e:
+                logging.warning(f"Gemini client pool: failed to close a client. Error: {e!r}")
+
+    def stats(self) -> dict:
+        return {
+            "client_pool_size": self.pool_size,
+            "open_clients": len(self._clients),
+            "warmed": self.warmed,
+        }
+
+
+class StubProvider(GenerationProvider):
+    """
+    Offline stand-in for load tests and CI. Answers every prompt with valid
+    emails after a simulated latency, and fails a configurable share of calls
+    with errors or rate limits. Seeded, so a run is reproducible.
+    """
+
+    name = "stub"
+
+    BATCH_ITEM = re.compile(
+        r'- ref: "(?P<ref>[^"]*)"\s*\n\s*Company Name: (?P<name>.*)\n.*\n\s*Variant: (?P<variant>\w+)'
+    )
+    SINGLE_NAME = re.compile(r"Company Name: (?P<name>.*)")
+    SINGLE_VARIANT = re.compile(r'"variant_name": "(?P<variant>\w+)"')
+
+    def __init__(
+        self,
+        latency_ms: float = STUB_LATENCY_MS,
+        distribution: str = STUB_LATENCY_DISTRIBUTION,
+        spread: float = STUB_LATENCY_SPREAD,
+        error_rate: float = STUB_ERROR_RATE,
+        rate_limit_rate: float = STUB_RATE_LIMIT_RATE,
+        seed: int = STUB_SEED,
+        sleep: Callable[[float], "asyncio.Future"] = asyncio.sleep,
+    ):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown latency distribution '{distribution}'. Use one of {', '.join(LATENCY_DISTRIBUTIONS)}."
+            )
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.spread = spread
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._sleep = sleep
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.latencies_ms: List[float] = []
+
+    def sample_latency_ms(self) -> float:
+        """Draws one latency; `latency_ms` is the median and `spread` its relative dispersion."""
+        if self.distribution == "fixed":
+            return self.latency_ms
+        if self.distribution == "uniform":
+            return self._random.uniform(
+                self.latency_ms * (1 - self.spread), self.latency_ms * (1 + self.spread)
+            )
+        if self.distribution == "exponential":
+            return self._random.expovariate(1 / self.latency_ms) if self.latency_ms else 0.0
+        return self._random.lognormvariate(0, self.spread) * self.latency_ms
+
+    def _answer(self, prompt_text: str) -> str:
+        items = list(self.BATCH_ITEM.finditer(prompt_text))
+        if items:
+            return json.dumps([
+                {
+                    "ref": item["ref"],
+                    "variant_name": item["variant"],
+                    **self._email(item["name"].strip(), item["variant"]),
+                }
+                for item in items
+            ])
+
+        name = self.SINGLE_NAME.search(prompt_text)
+        variant = self.SINGLE_VARIANT.search(prompt_text)
+        variant_name = variant["variant"] if variant else "problem_focused"
+        return json.dumps({
+            "variant_name": variant_name,
+            **self._email(name["name"].strip() if name else "there", variant_name),
+        })
+
+    @staticmethod
+    def _email(company_name: str, variant_name: str) -> dict:
+        if variant_name == "roi_focused":
+            subject = f"Give {company_name} back hours every week"
+        else:
+            subject = f"Still running {company_name}'s workflows by hand?"
+        return {
+            "subject": subject,
+            "body": f"Hi {company_name} team,\nBrim's AI teammates take repetitive work off your plate.\nWorth a quick chat?",
+        }
+
+    async def generate(self, prompt_text: str) -> str:
+        self.calls += 1
+        latency_ms = self.sample_latency_ms()
+        roll = self._random.random()
+
+        started_at = time.perf_counter()
+        await self._sleep(latency_ms / 1000)
+        self.latencies_ms.append((time.perf_counter() - started_at) * 1000)
+
+        if roll < self.rate_limit_rate:
+            self.rate_limited += 1
+            raise ProviderRateLimitError("Stub provider: rate limit exceeded.")
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.errors += 1
+            raise ProviderError("Stub provider: simulated failure.")
+        return self._answer(prompt_text)
+
+    def stats(self) -> dict:
+        return {
+            "distribution": self.distribution,
+            "latency_ms": self.latency_ms,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+        }
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    StubProvider.name: StubProvider,
+}
+
+_provider: Optional[GenerationProvider] = None
+
+
+def create_provider(name: str = None) -> GenerationProvider:
+    name = name or GENERATION_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown generation provider '{name}'. Use one of {', '.join(PROVIDERS)}.")
+    return PROVIDERS[name]()
+
+
+def get_provider() -> GenerationProvider:
+    """Returns the provider selected by GENERATION_PROVIDER, creating it on first use."""
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+        logging.info(f"Generation provider: {_provider.name}")
+    return _provider
+
+
+async def start_provider() -> None:
+    await get_provider().start()
+
+
+async def close_provider() -> None:
+    """Closes the active provider's connections; the next call creates a fresh one."""
+    global _provider
+    if _provider is not None:
+        provider, _provider = _provider, None
+        await provider.close()
+
+
+def set_provider(provider: Optional[GenerationProvider]) -> None:
+    """Swaps the active provider (e.g. a StubProvider for load tests). None resets to the default."""
+    global _provider
+    _provider = provider
@@ -0,0 +1,133 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.event_model import GenerationJob
+from app.models.schemas import CompanyInput, ScoringOutput
+from app.services import email_dedup_service, email_generation_service
+
+QUEUED = "queued"
+RUNNING = "running"
+
+# A running job claimed longer ago than this is assumed orphaned by a dead
+# worker. Keep it well above the time a batch can take with its retries.
+GENERATION_JOB_TIMEOUT_SECONDS = float(os.getenv("GENERATION_JOB_TIMEOUT_SECONDS", "600"))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue_generation(
+    db: Session, company_data: CompanyInput, scoring: ScoringOutput
+) -> Optional[GenerationJob]:
+    """
+    Stores an email generation job; workers pick it up by descending total_score.
+    A company that already has an email is not queued again (an unsent email
+    just takes the new score), and a company with a pending job gets that job
+    refreshed instead of a second one. Returns None when nothing was queued.
+    """
+    try:
+        variant_name = email_generation_service.determine_email_variant(company_data, scoring.total_score)
+    except TypeError:
+        variant_name = None
+    key = email_dedup_service.dedup_key(scoring.company_id, variant_name)
+    existing_email = email_dedup_service.find_existing_emails(db, [key]).get(key)
+    if existing_email is not None:
+        email_dedup_service.refresh_score(db, existing_email, scoring.total_score)
+        return None
+
+    values = {
+        "priority": scoring.total_score,
+        "company_data": company_data.dict(),
+        "scoring": scoring.dict(),
+    }
+    job = db.query(GenerationJob).filter(GenerationJob.company_id == scoring.company_id).first()
+    if job is None:
+        job = GenerationJob(company_id=scoring.company_id, status=QUEUED, **values)
+        db.add(job)
+        try:
+            db.commit()
+            return job
+        except IntegrityError:
+            # Another request queued the same company in the meantime.
+            db.rollback()
+            job = db.query(GenerationJob).filter(GenerationJob.company_id == scoring.company_id).one()
+
+    if job.status == QUEUED:
+        for field, value in values.items():
+            setattr(job, field, value)
+        db.commit()
+    return job
+
+
+def claim_jobs(db: Session, limit: int) -> List[GenerationJob]:
+    """
+    Atomically marks up to `limit` of the highest-priority queued jobs as
+    running and returns them. A single UPDATE does the claim, so concurrent
+    workers never receive the same job.
+    """
+    token = uuid.uuid4().hex
+    next_jobs = (
+        select(GenerationJob.id)
+        .where(GenerationJob.status == QUEUED)
+        .order_by(GenerationJob.priority.desc(), GenerationJob.id)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(GenerationJob)
+        .where(GenerationJob.id.in_(next_jobs), GenerationJob.status == QUEUED)
+        .values(status=RUNNING, claim_token=token, claimed_at=_utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return (
+        db.query(GenerationJob)
+        .filter(GenerationJob.claim_token == token)
+        .order_by(GenerationJob.priority.desc(), GenerationJob.id)
+        .all()
+    )
+
+
+def to_leads(jobs: List[GenerationJob]) -> List[Tuple[CompanyInput, ScoringOutput]]:
+    return [(CompanyInput(**job.company_data), ScoringOutput(**job.scoring)) for job in jobs]
+
+
+def complete_jobs(db: Session, job_ids: List[int]) -> None:
+    """Removes finished jobs. Failed generations are kept in the dead-letter table instead."""
+    if not job_ids:
+        return
+    db.query(GenerationJob).filter(GenerationJob.id.in_(job_ids)).delete(synchronize_session=False)
+    db.commit()
+
+
+def requeue_stale_jobs(db: Session, timeout_seconds: float = GENERATION_JOB_TIMEOUT_SECONDS) -> int:
+    """
+    Puts jobs claimed more than `timeout_seconds` ago back in the queue: their
+    worker died (e.g. a restart mid-generation). Jobs that live workers of
+    other processes or replicas are still generating are left alone.
+    """
+    cutoff = _utcnow() - timedelta(seconds=timeout_seconds)
+    requeued = (
+        db.query(GenerationJob)
+        .filter(
+            GenerationJob.status == RUNNING,
+            or_(GenerationJob.claimed_at.is_(None), GenerationJob.claimed_at < cutoff),
+        )
+        .update({"status": QUEUED, "claim_token": None, "claimed_at": None}, synchronize_session=False)
+    )
+    db.commit()
+    return requeued
+
+
+def queue_depth(db: Session) -> dict:
+    counts = dict(
+        db.query(GenerationJob.status, func.count(GenerationJob.id)).group_by(GenerationJob.status).all()
+    )
+    return {QUEUED: counts.get(QUEUED, 0), RUNNING: counts.get(RUNNING, 0)}
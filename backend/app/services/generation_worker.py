@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.services import dead_letter_service, email_generation_service, generation_queue_service
+
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "4"))
+GENERATION_WORKER_POLL_SECONDS = float(os.getenv("GENERATION_WORKER_POLL_SECONDS", "5"))
+
+
+class GenerationWorkerPool:
+    """
+    Async workers that drain the generation_jobs table, highest total_score
+    first. Each worker claims up to `claim_size` jobs, generates them through
+    the batched path and deletes them once their emails (or dead letters)
+    are committed, so a crash never loses a paid generation. Idle workers sleep until notify() is
+    called or `poll_seconds` pass, so jobs enqueued by other processes are
+    still picked up.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        workers: int = GENERATION_WORKERS,
+        claim_size: int = email_generation_service.GEMINI_BATCH_SIZE,
+        poll_seconds: float = GENERATION_WORKER_POLL_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.claim_size = claim_size
+        self.poll_seconds = poll_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.processed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def start(self) -> None:
+        """Requeues jobs orphaned by dead workers and starts the workers on the running loop."""
+        if self.running:
+            return
+        with self.session_factory() as db:
+            requeued = generation_queue_service.requeue_stale_jobs(db)
+        if requeued:
+            logging.info(f"GENERATION WORKERS: Requeued {requeued} orphaned jobs.")
+
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"generation-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancels the workers. Jobs they had claimed are requeued once they time out."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wakes idle workers. Safe to call from request handler threads."""
+        if self._loop is not None and self._wakeup is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run_once(self) -> int:
+        """Claims and processes one batch of jobs. Returns how many were processed."""
+        with self.session_factory() as db:
+            jobs = generation_queue_service.claim_jobs(db, self.claim_size)
+            job_ids = [job.id for job in jobs]
+            leads = generation_queue_service.to_leads(jobs)
+        if not leads:
+            return 0
+
+        try:
+            # Written synchronously, not through the write-behind queue: the jobs
+            # are deleted right after, and only committed rows may replace them.
+            await email_generation_service.generate_and_save_email_batch(
+                self.session_factory, leads, write_behind=False
+            )
+        except asyncio.CancelledError:
+            # Left as 'running'; start() requeues them once they time out.
+            raise
+        except Exception as e:
+            logging.error(
+                f"GENERATION WORKERS: Batch of {len(leads)} jobs failed; moving it to the dead-letter table. Error: {e}",
+                exc_info=True,
+            )
+            with self.session_factory() as db:
+                for company_data, scoring in leads:
+                    dead_letter_service.record_failed_generation(db, company_data, scoring, repr(e), 1)
+
+        with self.session_factory() as db:
+            generation_queue_service.complete_jobs(db, job_ids)
+        self.processed += len(leads)
+        self.batches += 1
+        return len(leads)
+
+    async def _work(self) -> None:
+        while True:
+            # Cleared before claiming, so a notify() that lands mid-batch is not lost.
+            self._wakeup.clear()
+            try:
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"GENERATION WORKERS: Batch failed. Error: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "claim_size": self.claim_size,
+            "processed": self.processed,
+            "batches": self.batches,
+        }
+
+
+generation_worker_pool = GenerationWorkerPool()
@@ -0,0 +1,211 @@
+import csv
+import itertools
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+from fastapi import UploadFile
+
+BATCH_UPLOAD_DIR = os.getenv("BATCH_UPLOAD_DIR", "./batch_uploads")
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "500"))
+
+UPLOAD_READ_SIZE = 1024 * 1024
+PARSER_READ_SIZE = 64 * 1024
+MAX_RECORD_SIZE = 16 * 1024 * 1024
+
+FILE_FORMATS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+_WHITESPACE = " \t\r\n"
+
+CSV_LIST_FIELDS = ("tech_stack", "recent_job_posts", "news_mentions")
+CSV_INT_FIELDS = ("employee_count",)
+CSV_LIST_SEPARATOR = ";"
+
+
+def detect_file_format(filename: Optional[str]) -> Optional[str]:
+    """Maps an uploaded file name to 'json' (a single array) or 'ndjson' (one object per line)."""
+    if not filename:
+        return None
+    return FILE_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+async def spool_upload(upload: UploadFile, destination_dir: Optional[str] = None) -> str:
+    """
+    Copies an upload to disk in fixed-size blocks and returns the file path,
+    so the request never holds the whole file in memory.
+    """
+    destination_dir = destination_dir or BATCH_UPLOAD_DIR
+    os.makedirs(destination_dir, exist_ok=True)
+    suffix = os.path.splitext(upload.filename or "")[1]
+    with tempfile.NamedTemporaryFile(
+        mode="wb", dir=destination_dir, suffix=suffix, delete=False
+    ) as spooled:
+        while True:
+            block = await upload.read(UPLOAD_READ_SIZE)
+            if not block:
+                break
+            spooled.write(block)
+    return spooled.name
+
+
+def validate_upload(path: str, file_format: str) -> None:
+    """
+    Cheap upfront check that the spooled file has the expected shape.
+    Raises ValueError otherwise; records are validated while they are streamed.
+    """
+    with open(path, encoding="utf-8-sig") as f:
+        head = f.read(PARSER_READ_SIZE).lstrip(_WHITESPACE)
+
+    if file_format == "json" and not head.startswith("["):
+        raise ValueError("JSON must be a list of company objects.")
+    if file_format == "ndjson" and head and not head.startswith("{"):
+        raise ValueError("Each NDJSON line must be a company object.")
+
+
+def iter_json_array(fp: TextIO, read_size: int = PARSER_READ_SIZE) -> Iterator[Any]:
+    """
+    Incrementally parses a top-level JSON array, yielding one element at a time.
+    Only the current element and one read block are kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    state = "start"
+
+    def read_more():
+        nonlocal buffer, position, eof
+        buffer = buffer[position:]
+        position = 0
+        chunk = fp.read(read_size)
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            read_more()
+
+        if position >= len(buffer):
+            raise ValueError("Unexpected end of JSON input.")
+
+        char = buffer[position]
+        if state == "start":
+            if char != "[":
+                raise ValueError("JSON must be a list of company objects.")
+            position += 1
+            state = "first_value"
+            continue
+
+        if char == "]" and state in ("first_value", "separator"):
+            return
+
+        if state == "separator":
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' but found {char!r}.")
+            position += 1
+            state = "value"
+            continue
+
+        if char == "]":
+            raise ValueError("Trailing comma in JSON array.")
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                if end < len(buffer) or eof:
+                    break
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(str(e)) from None
+                if len(buffer) - position > MAX_RECORD_SIZE:
+                    raise ValueError(
+                        f"Array element exceeds {MAX_RECORD_SIZE} bytes or is malformed: {e}"
+                    ) from None
+            read_more()
+
+        yield value
+        position = end
+        state = "separator"
+
+
+def iter_ndjson(fp: TextIO) -> Iterator[Any]:
+    """Yields one parsed object per non-blank line."""
+    for line_number, line in enumerate(fp, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}") from None
+
+
+def _csv_int(value: str) -> Any:
+    """Parses '120' or '120.0'; anything else is returned as is for validation to reject."""
+    try:
+        return int(float(value))
+    except (ValueError, OverflowError):
+        return value
+
+
+def iter_csv(fp: TextIO, list_separator: str = CSV_LIST_SEPARATOR) -> Iterator[Dict[str, Any]]:
+    """
+    Yields one company dict per CSV row. List columns hold values joined by
+    `list_separator`; empty cells become None. Never raises for a bad cell:
+    the row is yielded and fails validation on its own, like any other record.
+    """
+    for row in csv.DictReader(fp):
+        record = {}
+        for field_name, value in row.items():
+            # Cells beyond the header are collected under the None key; drop them.
+            if field_name is None:
+                continue
+            value = (value or "").strip()
+            if field_name in CSV_LIST_FIELDS:
+                record[field_name] = [item.strip() for item in value.split(list_separator) if item.strip()]
+            elif not value:
+                record[field_name] = None
+            elif field_name in CSV_INT_FIELDS:
+                record[field_name] = _csv_int(value)
+            else:
+                record[field_name] = value
+        yield record
+
+
+def iter_records(path: str, file_format: str) -> Iterator[Any]:
+    """Streams the records of a spooled upload (or any JSON, NDJSON or CSV company file)."""
+    newline = "" if file_format == "csv" else None
+    with open(path, encoding="utf-8-sig", newline=newline) as f:
+        if file_format == "csv":
+            yield from iter_csv(f)
+        elif file_format == "ndjson":
+            yield from iter_ndjson(f)
+        else:
+            yield from iter_json_array(f)
+
+
+def iter_company_chunks(
+    path: str, file_format: str, chunk_size: int = BATCH_CHUNK_SIZE, skip: int = 0
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Groups streamed records into lists of at most chunk_size, after skipping
+    the first `skip` records (already handled before a checkpoint).
+    """
+    chunk = []
+    for record in itertools.islice(iter_records(path, file_format), skip, None):
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,159 @@
+import json
+import math
+import os
+import textwrap
+from collections import deque
+from typing import Iterable, List, Tuple
+
+from app.models.schemas import CompanyInput, ScoringOutput
+
+# Upper bound, in estimated tokens, for one company's data in a prompt. The
+# list fields are truncated to fit it; 0 disables the budget.
+PROMPT_COMPANY_TOKEN_BUDGET = int(os.getenv("PROMPT_COMPANY_TOKEN_BUDGET", "200"))
+PROMPT_MAX_ITEM_CHARS = int(os.getenv("PROMPT_MAX_ITEM_CHARS", "160"))
+PROMPT_STATS_WINDOW = int(os.getenv("PROMPT_STATS_WINDOW", "1000"))
+
+# Characters per token for English text; close enough for budgeting without a tokenizer.
+CHARS_PER_TOKEN = 4
+
+SCALAR_FIELDS = ("employee_count", "industry", "funding_stage")
+LIST_FIELDS = ("tech_stack", "recent_job_posts", "news_mentions")
+
+VARIANT_PROMPTS = {
+    "problem_focused": "emphasizes the pain of managing workflows and how Brim solves it.",
+    "roi_focused": "highlights how Brim saves time and money.",
+}
+
+# Rendered once at import; only the company block changes between calls.
+PREAMBLE = textwrap.dedent("""\
+    You are a copywriter specialized in sales for a B2B SaaS company called Brim, which offers "AI teammates" to automate workflows.
+    Your target audience is companies with 30-300 employees.
+    """)
+
+SINGLE_TASKS = {
+    variant: textwrap.dedent(f"""\
+        **Your Task:**
+        Generate one concise cold outreach email for this company. The email should be **{variant}**. This means it {description}
+        **Required Output Format:**
+        Respond ONLY with a valid JSON object, with no explanation or additional text:
+        {{"variant_name": "{variant}", "subject": "<Email Subject Here>", "body": "<Email Body Here, using \\n for line breaks>"}}
+        """)
+    for variant, description in VARIANT_PROMPTS.items()
+}
+
+BATCH_TASK = textwrap.dedent("""\
+    **Your Task:**
+    Generate one concise cold outreach email for EACH company above, written in the variant listed for it.
+    **Required Output Format:**
+    Respond ONLY with a valid JSON array, with no explanation or additional text, with one object per company:
+    [{"ref": "<the company's ref>", "variant_name": "<the company's variant>", "subject": "<Email Subject Here>", "body": "<Email Body Here, using \\n for line breaks>"}]
+    """)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _dumps(data: dict) -> str:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def compact_company_data(
+    company_data: CompanyInput, token_budget: int = None
+) -> str:
+    """
+    Serializes the company's relevant, non-empty fields as compact JSON. List
+    items are added round-robin across the list fields (each one capped at
+    PROMPT_MAX_ITEM_CHARS) until the token budget is reached, so a long
+    `news_mentions` list cannot crowd out the tech stack or the job posts.
+    """
+    token_budget = PROMPT_COMPANY_TOKEN_BUDGET if token_budget is None else token_budget
+    data = {
+        field: getattr(company_data, field)
+        for field in SCALAR_FIELDS
+        if getattr(company_data, field) not in (None, "")
+    }
+    queues = {
+        field: deque(
+            item if len(item) <= PROMPT_MAX_ITEM_CHARS else item[: PROMPT_MAX_ITEM_CHARS - 3] + "..."
+            for item in getattr(company_data, field) or []
+        )
+        for field in LIST_FIELDS
+    }
+
+    while any(queues.values()):
+        for field, items in queues.items():
+            if not items:
+                continue
+            candidate = dict(data, **{field: data.get(field, []) + [items.popleft()]})
+            if token_budget and estimate_tokens(_dumps(candidate)) > token_budget:
+                # This field is full; keep trying the shorter items of the others.
+                items.clear()
+                continue
+            data = candidate
+    return _dumps(data)
+
+
+def build_single_prompt(
+    company_data: CompanyInput, scoring: ScoringOutput, chosen_variant: str
+) -> str:
+    return (
+        f"{PREAMBLE}"
+        f"**Target Company Context:**\n"
+        f"- Company Name: {company_data.company_name}\n"
+        f"- Fit/Intent Score: {scoring.total_score}/100\n"
+        f"- Data: {compact_company_data(company_data)}\n"
+        f"{SINGLE_TASKS[chosen_variant]}"
+    )
+
+
+def build_batch_prompt(items: Iterable[Tuple[CompanyInput, ScoringOutput, str]]) -> str:
+    companies = "".join(
+        f'- ref: "{scoring.company_id}"\n'
+        f"  Company Name: {company_data.company_name}\n"
+        f"  Fit/Intent Score: {scoring.total_score}/100\n"
+        f"  Variant: {chosen_variant}\n"
+        f"  Data: {compact_company_data(company_data)}\n"
+        for company_data, scoring, chosen_variant in items
+    )
+    variants = "".join(f"- {variant}: the email {description}\n" for variant, description in VARIANT_PROMPTS.items())
+    return f"{PREAMBLE}**Variants:**\n{variants}**Target Companies:**\n{companies}{BATCH_TASK}"
+
+
+class TokenUsage:
+    """
+    Per-call prompt/response token counts and latency of the generation
+    provider, kept for the last `window` calls plus running totals. Counts
+    are the provider's own when it reports them; `estimated_calls` counts
+    the calls that fell back to estimate_tokens().
+    """
+
+    def __init__(self, window: int = PROMPT_STATS_WINDOW):
+        self.calls = 0
+        self.estimated_calls = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.recent: deque = deque(maxlen=window)
+
+    def record(
+        self, prompt_tokens: int, response_tokens: int, latency_seconds: float, estimated: bool = False
+    ) -> None:
+        self.calls += 1
+        self.estimated_calls += estimated
+        self.prompt_tokens += prompt_tokens
+        self.response_tokens += response_tokens
+        self.recent.append((prompt_tokens, response_tokens, latency_seconds))
+
+    def stats(self) -> dict:
+        recent: List[Tuple[int, int, float]] = list(self.recent)
+        count = len(recent) or 1
+        return {
+            "calls": self.calls,
+            "estimated_calls": self.estimated_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens,
+            "recent_avg_prompt_tokens": round(sum(r[0] for r in recent) / count, 1),
+            "recent_avg_response_tokens": round(sum(r[1] for r in recent) / count, 1),
+            "recent_avg_latency_seconds": round(sum(r[2] for r in recent) / count, 3),
+            "recent_max_prompt_tokens": max((r[0] for r in recent), default=0),
+        }
@@ -0,0 +1,252 @@
+import asyncio
+import heapq
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    Async requests-per-minute limiter. Tokens refill continuously; a burst of
+    up to `burst` requests may go out at once. A rate of 0 disables the limit.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], "asyncio.Future"] = asyncio.sleep,
+    ):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, self.rate_per_second)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated_at = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second
+        )
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        if self.rate_per_second <= 0:
+            return
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await self._sleep((1 - self._tokens) / self.rate_per_second)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps the number of in-flight calls and adapts the cap with AIMD:
+    it grows by about one slot per `limit` healthy calls, and shrinks
+    multiplicatively when the provider throttles us or latency spikes.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_threshold_seconds: float = 10.0,
+        backoff_factor: float = 0.5,
+        latency_backoff_factor: float = 0.9,
+        is_throttled: Callable[[BaseException], bool] = lambda e: False,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.latency_threshold_seconds = latency_threshold_seconds
+        self.backoff_factor = backoff_factor
+        self.latency_backoff_factor = latency_backoff_factor
+        self._is_throttled = is_throttled
+        self._clock = clock
+        self._waiters = deque()
+        self.in_flight = 0
+        self.completed = 0
+        self.throttled = 0
+        self.failed = 0
+        self.latency_ewma_seconds = 0.0
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    async def acquire(self) -> None:
+        while self.in_flight >= self.current_limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        free_slots = self.current_limit - self.in_flight
+        while free_slots > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free_slots -= 1
+
+    def record_success(self, latency_seconds: float) -> None:
+        self.completed += 1
+        self.latency_ewma_seconds = (
+            latency_seconds
+            if self.completed == 1
+            else 0.8 * self.latency_ewma_seconds + 0.2 * latency_seconds
+        )
+        if latency_seconds > self.latency_threshold_seconds:
+            self.limit = max(self.min_limit, self.limit * self.latency_backoff_factor)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._wake_waiters()
+
+    def record_throttled(self) -> None:
+        self.throttled += 1
+        self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one concurrency slot for the duration of a call and feeds its outcome back."""
+        await self.acquire()
+        started_at = self._clock()
+        try:
+            yield
+        except BaseException as e:
+            if self._is_throttled(e):
+                self.record_throttled()
+            else:
+                self.failed += 1
+            raise
+        else:
+            self.record_success(self._clock() - started_at)
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.current_limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "completed": self.completed,
+            "throttled": self.throttled,
+            "failed": self.failed,
+            "latency_ewma_seconds": round(self.latency_ewma_seconds, 3),
+        }
+
+
+class DomainThrottle:
+    """
+    Thread-safe token buckets keyed by recipient domain: each domain refills
+    `rate_per_minute` tokens up to `burst`, unless `overrides` maps it to its
+    own (rate_per_minute, burst). A rate of 0 disables the limit. Domains out
+    of tokens are kept in a heap ordered by when their next token arrives, so
+    listing them never walks every domain seen so far.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        burst: float,
+        overrides: Optional[Dict[str, Tuple[float, float]]] = None,
+        max_tracked_domains: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.overrides = {domain.lower(): limits for domain, limits in (overrides or {}).items()}
+        self.max_tracked_domains = max_tracked_domains
+        self._clock = clock
+        self._lock = threading.Lock()
+        # domain -> [tokens, updated_at]
+        self._buckets: Dict[str, List[float]] = {}
+        self._saturated: List[Tuple[float, str]] = []
+        self._saturated_until: Dict[str, float] = {}
+        self.throttled = 0
+
+    def _limits(self, domain: str) -> Tuple[float, float]:
+        return self.overrides.get(domain, (self.rate_per_minute, self.burst))
+
+    def _bucket(self, domain: str, now: float) -> List[float]:
+        rate, burst = self._limits(domain)
+        bucket = self._buckets.get(domain)
+        if bucket is None:
+            if len(self._buckets) >= self.max_tracked_domains:
+                self._forget_full_buckets(now)
+            bucket = self._buckets[domain] = [burst, now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate / 60.0)
+            bucket[1] = now
+        return bucket
+
+    def _forget_full_buckets(self, now: float) -> None:
+        for domain, (tokens, updated_at) in list(self._buckets.items()):
+            rate, burst = self._limits(domain)
+            if tokens + (now - updated_at) * rate / 60.0 >= burst:
+                del self._buckets[domain]
+
+    def try_acquire(self, domain: Optional[str]) -> bool:
+        """Takes one token for `domain`; False when the domain has to wait."""
+        if not domain:
+            return True
+        domain = domain.lower()
+        rate, _ = self._limits(domain)
+        if rate <= 0:
+            return True
+        with self._lock:
+            now = self._clock()
+            bucket = self._bucket(domain, now)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            ready_at = now + (1 - bucket[0]) * 60.0 / rate
+            if domain not in self._saturated_until or self._saturated_until[domain] <= now:
+                self._saturated_until[domain] = ready_at
+                heapq.heappush(self._saturated, (ready_at, domain))
+            self.throttled += 1
+            return False
+
+    def saturated_domains(self) -> List[str]:
+        """Domains that will not get a token before their refill time."""
+        with self._lock:
+            now = self._clock()
+            while self._saturated and self._saturated[0][0] <= now:
+                ready_at, domain = heapq.heappop(self._saturated)
+                if self._saturated_until.get(domain) == ready_at:
+                    del self._saturated_until[domain]
+            return list(self._saturated_until)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._saturated.clear()
+            self._saturated_until.clear()
+            self.throttled = 0
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_minute": self.rate_per_minute,
+            "burst": self.burst,
+            "tracked_domains": len(self._buckets),
+            "saturated_domains": len(self.saturated_domains()),
+            "throttled": self.throttled,
+        }
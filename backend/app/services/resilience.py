@@ -0,0 +1,128 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast while a dependency is unhealthy. After `failure_threshold`
+    consecutive failures the circuit opens and every call is rejected for
+    `recovery_timeout_seconds`; then a single trial call is let through
+    (half-open), which closes the circuit on success or reopens it on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout_seconds = recovery_timeout_seconds
+        self._clock = clock
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.consecutive_failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.recovery_timeout_seconds:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._trial_in_flight):
+            self.rejected += 1
+            raise CircuitOpenError("Circuit breaker is open; the provider is marked unhealthy.")
+        if state == self.HALF_OPEN:
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """For a call that ended without a result (e.g. cancelled): lets another trial through."""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        self.before_call()
+        try:
+            result = await fn()
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (e.g. on shutdown): no verdict on the dependency, but a
+            # half-open trial must not stay in flight forever.
+            self.release_trial()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+def backoff_delay(
+    attempt: int, base_delay_seconds: float, max_delay_seconds: float, rng: random.Random = random
+) -> float:
+    """Exponential backoff with full jitter: uniform in [0, min(max, base * 2^attempt)]."""
+    return rng.uniform(0, min(max_delay_seconds, base_delay_seconds * 2 ** attempt))
+
+
+async def retry_with_backoff(
+    fn: Callable[[], Awaitable[T]],
+    max_attempts: int,
+    base_delay_seconds: float,
+    max_delay_seconds: float,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    give_up_on: Tuple[Type[BaseException], ...] = (CircuitOpenError,),
+    sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    rng: random.Random = random,
+) -> T:
+    """
+    Awaits `fn` up to `max_attempts` times, sleeping a jittered exponential
+    backoff between attempts. Errors in `give_up_on` are raised immediately.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return await fn()
+        except give_up_on:
+            raise
+        except retry_on:
+            if attempt == max_attempts - 1:
+                raise
+            await sleep(backoff_delay(attempt, base_delay_seconds, max_delay_seconds, rng))
@@ -1,11 +1,22 @@
 ﻿import hashlib
+import os
+import re
+import time
+from fractions import Fraction
+from functools import lru_cache
+from math import gcd
 from sqlalchemy.orm import Session
-from typing import List
-import asyncio
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
 
-from app.models.schemas import CompanyInput, ScoringOutput, ScoringModel
+from app.models.schemas import SCORING_FIELDS, CompanyInput, ScoringOutput, ScoringModel
 from app.database import SessionLocal
-from app.services import event_service, email_generation_service
+from app.services import (
+    batch_job_service,
+    event_service,
+    email_generation_service,
+    ingestion_service,
+)
 
 MODEL_WEIGHTS = {
     "balanced": {"employee_count": 0.2, "industry": 0.3, "tech_stack": 0.5},
@@ -13,129 +24,443 @@ MODEL_WEIGHTS = {
     "conservative": {"employee_count": 0.4, "industry": 0.4, "tech_stack": 0.2},
 }
 
+IDEAL_INDUSTRIES = ["saas", "fintech", "ai", "technology"]
+GOOD_INDUSTRIES = ["e-commerce", "biotech", "education"]
+AUTOMATION_TOOLS = ["zapier", "make", "workato", "hubspot"]
+OPS_ROLES = ["operations", "ops", "automation engineer"]
 
-async def process_batch_scoring(companies: List[CompanyInput]):
+# The documented Fit/Intent blend for the reference ("balanced") model.
+FIT_SHARE = Fraction(6, 10)
+INTENT_SHARE = Fraction(4, 10)
+REFERENCE_MODEL = "balanced"
+
+
+async def process_batch_scoring(
+    job_id: str, chunk_size: int = ingestion_service.BATCH_CHUNK_SIZE
+):
     """
-    Processes a list of companies by creating its own database session.
+    Runs a batch job: streams companies from its spooled upload and scores them
+    chunk by chunk, using its own database session. Progress is checkpointed
+    after every chunk, so a restarted job skips the records it already handled.
+    The job is claimed first, so it never runs in two processes at once.
+
+    Once the job ends, whether completed, stopped by an unreadable upload or by a
+    failing chunk, it is finished and its spool file removed. If this run is
+    interrupted instead (e.g. cancelled on shutdown), the claim is released and
+    the file kept, so the job can be resumed.
     """
     db: Session = SessionLocal()
+    job = None
+    outcome: Optional[Tuple[str, Optional[str]]] = None
+    taken_over = False
+    try:
+        job = batch_job_service.claim_job(db, job_id, batch_job_service.worker_id())
+        if job is None:
+            print(f"--- BATCH JOB: Job {job_id} not found, finished or running elsewhere. ---")
+            return
 
-    print(f"--- BATCH JOB: Starting to process {len(companies)} companies. ---")
+        print(
+            f"--- BATCH JOB {job.id}: Starting to process companies from {job.file_path} "
+            f"(resuming after {job.records_read} records). ---"
+        )
 
-    tasks = []
-    for company_data in companies:
-        try:
-            company_input = CompanyInput(**company_data)
+        chunks = ingestion_service.iter_company_chunks(
+            job.file_path, job.file_format, chunk_size, skip=job.records_read
+        )
+        while True:
+            try:
+                chunk = next(chunks, None)
+            except (OSError, ValueError) as e:
+                print(f"--- BATCH JOB {job.id} ERROR: Stopped reading {job.file_path}. Error: {e} ---")
+                outcome = ("failed", f"Could not read upload: {e}")
+                break
+            if chunk is None:
+                outcome = ("completed", None)
+                break
 
-            score_result = calculate_scores(company_input, model=ScoringModel.BALANCED)
+            started_at = time.perf_counter()
+            try:
+                chunk_processed, chunk_failed = await _process_batch_chunk(db, chunk)
+            except Exception as e:
+                db.rollback()
+                print(
+                    f"--- BATCH JOB {job.id} ERROR: Chunk after record {job.records_read} failed. Error: {e} ---"
+                )
+                outcome = ("failed", f"Chunk after record {job.records_read} failed: {e}")
+                break
 
-            event_service.log_score_calculated_event(
-                db, score_result, "balanced", company_input
+            if not batch_job_service.record_chunk_checkpoint(
+                db,
+                job,
+                records_read=len(chunk),
+                processed=chunk_processed,
+                failed=chunk_failed,
+                elapsed_seconds=time.perf_counter() - started_at,
+            ):
+                print(f"--- BATCH JOB {job.id}: Taken over by another process; stopping. ---")
+                taken_over = True
+                return
+            print(
+                f"--- BATCH JOB {job.id}: Chunk done. {job.processed_count} companies processed, "
+                f"{job.failed_count} failed so far. ---"
             )
+    finally:
+        try:
+            if outcome is not None:
+                status, error = outcome
+                batch_job_service.finish_job(db, job, status, error=error)
+                if os.path.exists(job.file_path):
+                    os.remove(job.file_path)
+                print(f"--- BATCH JOB {job.id}: Finished with status '{status}'. ---")
+            elif job is not None and not taken_over:
+                batch_job_service.release_job(db, job)
+        finally:
+            db.close()
 
-            task = email_generation_service.generate_and_save_email_content(
-                lambda: SessionLocal(), company_input, score_result
-            )
-            tasks.append(task)
 
+async def _process_batch_chunk(db: Session, companies: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Scores one chunk of raw company dicts, logs the events and generates the
+    chunk's emails in batched prompts. Returns the number of processed and failed companies.
+    """
+    company_inputs = []
+    for company_data in companies:
+        try:
+            company_inputs.append(CompanyInput(**company_data))
         except Exception as e:
             print(
                 f"--- BATCH JOB SETUP ERROR: Failed to prepare company. Data: {company_data}. Error: {e} ---"
             )
 
+    score_results = score_batch(
+        companies_to_columns(company_inputs), model=ScoringModel.BALANCED
+    )
+    event_service.log_score_calculated_events(
+        db, zip(score_results, company_inputs), "balanced"
+    )
+
+    scored_companies = list(zip(company_inputs, score_results))
     print(
-        f"--- BATCH JOB: Running {len(tasks)} email generation tasks concurrently... ---"
+        f"--- BATCH JOB: Generating emails for {len(scored_companies)} companies in batched prompts... ---"
+    )
+    await email_generation_service.generate_and_save_email_batch(
+        lambda: SessionLocal(), scored_companies
     )
-    await asyncio.gather(*tasks)
 
-    db.close()
-    print(f"--- BATCH JOB: Finished processing all tasks. ---")
+    return len(scored_companies), len(companies) - len(scored_companies)
 
 
-def calculate_scores(company: CompanyInput, model: ScoringModel) -> ScoringOutput:
+def _integer_weights(*weights: Fraction) -> tuple:
+    """Scales a set of fractional weights to the smallest equivalent integers."""
+    denominator = 1
+    for weight in weights:
+        denominator = denominator * weight.denominator // gcd(denominator, weight.denominator)
+    scaled = [int(weight * denominator) for weight in weights]
+    divisor = 0
+    for value in scaled:
+        divisor = gcd(divisor, value)
+    return tuple(value // (divisor or 1) for value in scaled)
+
+
+class CompiledScorer:
     """
-    Calculates fit and intent scores for a company based on a defined Ideal Customer Profile.
+    The scoring rules of one ScoringModel, compiled once into frozen lookup sets,
+    a prebuilt job-post matcher and integer weight vectors.
+
+    MODEL_WEIGHTS are applied relative to the reference model: "balanced" keeps
+    the documented plain averages and 60/40 Fit/Intent blend, while the other
+    models re-weight the fit signals and shift the blend towards fit or intent.
+    All arithmetic is done on integers so the scalar and columnar paths agree.
     """
-    fit_score_signals = []
-    intent_score_signals = []
-    reasons = {"positive": [], "negative": [], "missing": []}
-
-    # --- Fit Score Signals (How well do they match our ICP?) ---
-
-    # 1. Employee Count (Source: firmographics)
-    if company.employee_count:
-        if 30 <= company.employee_count <= 300:
-            fit_score_signals.append(100)
-            reasons["positive"].append(f"Ideal company size ({company.employee_count} employees).")
-        elif 301 <= company.employee_count <= 500 or 15 <= company.employee_count <= 29:
-            fit_score_signals.append(50)
+
+    def __init__(self, model: ScoringModel):
+        self.model = model
+
+        weights = {k: Fraction(str(v)) for k, v in MODEL_WEIGHTS[model.value].items()}
+        reference = {k: Fraction(str(v)) for k, v in MODEL_WEIGHTS[REFERENCE_MODEL].items()}
+        relative = {k: weights[k] / reference[k] for k in weights}
+
+        self.employee_weight, self.industry_weight = _integer_weights(
+            relative["employee_count"], relative["industry"]
+        )
+        fit_share = FIT_SHARE * (weights["employee_count"] + weights["industry"]) / (
+            reference["employee_count"] + reference["industry"]
+        )
+        intent_share = INTENT_SHARE * relative["tech_stack"]
+        self.fit_share, self.intent_share = _integer_weights(fit_share, intent_share)
+
+        self.fit_weights = np.array([self.employee_weight, self.industry_weight], dtype=np.int64)
+        self.blend_weights = np.array([self.fit_share, self.intent_share], dtype=np.int64)
+
+        self.ideal_industries = frozenset(IDEAL_INDUSTRIES)
+        self.good_industries = frozenset(GOOD_INDUSTRIES)
+        self.automation_tools = tuple(AUTOMATION_TOOLS)
+        self.ops_role_matcher = re.compile("|".join(re.escape(role) for role in OPS_ROLES))
+
+        self.field_names = SCORING_FIELDS
+        total_fields = len(self.field_names)
+        self.confidence_table = tuple(
+            round(provided / total_fields, 2) for provided in range(total_fields + 1)
+        )
+
+    def _employee_signal(self, employee_count: int) -> int:
+        if 30 <= employee_count <= 300:
+            return 100
+        if 301 <= employee_count <= 500 or 15 <= employee_count <= 29:
+            return 50
+        return 0
+
+    def _industry_signal(self, industry: str) -> int:
+        lowered = industry.lower()
+        if lowered in self.ideal_industries:
+            return 100
+        if lowered in self.good_industries:
+            return 60
+        return 0
+
+    def _used_tools(self, tech_stack: List[str]) -> List[str]:
+        lowered_stack = {tool.lower() for tool in tech_stack}
+        return [tool for tool in self.automation_tools if tool in lowered_stack]
+
+    def _is_hiring_ops(self, job_posts: List[str]) -> bool:
+        return any(self.ops_role_matcher.search(post.lower()) for post in job_posts)
+
+    def _combine(self, fit_score: int, intent_score: int) -> int:
+        return (fit_score * self.fit_share + intent_score * self.intent_share) // (
+            self.fit_share + self.intent_share
+        )
+
+    @staticmethod
+    def _action(total_score: int) -> str:
+        if total_score > 80:
+            return "high_priority_outreach"
+        elif total_score > 60:
+            return "medium_priority_outreach"
+        return "low_priority_monitoring"
+
+    def score(self, company: CompanyInput) -> ScoringOutput:
+        """Scores a single company."""
+        reasons = {"positive": [], "negative": [], "missing": []}
+
+        # --- Fit Score Signals (How well do they match our ICP?) ---
+        fit_sum = 0
+        fit_weight = 0
+
+        # 1. Employee Count (Source: firmographics)
+        if company.employee_count:
+            employee_signal = self._employee_signal(company.employee_count)
+            fit_sum += employee_signal * self.employee_weight
+            fit_weight += self.employee_weight
+            if employee_signal == 100:
+                reasons["positive"].append(f"Ideal company size ({company.employee_count} employees).")
+            elif employee_signal == 0:
+                reasons["negative"].append("Company size is outside target range.")
         else:
-            fit_score_signals.append(0)
-            reasons["negative"].append("Company size is outside target range.")
-    else:
-        reasons["missing"].append("employee_count")
-
-    # 2. Industry (Source: firmographics)
-    ideal_industries = ["saas", "fintech", "ai", "technology"]
-    good_industries = ["e-commerce", "biotech", "education"]
-    if company.industry:
-        if company.industry.lower() in ideal_industries:
-            fit_score_signals.append(100)
-            reasons["positive"].append(f"Ideal industry: {company.industry}.")
-        elif company.industry.lower() in good_industries:
-            fit_score_signals.append(60)
-    else:
-        reasons["missing"].append("industry")
-
-    # --- Intent Score Signals (Are they showing buying signals now?) ---
-
-    # 3. Automation Tech Stack (Source: technographics)
-    automation_tools = ["zapier", "make", "workato", "hubspot"]
-    if company.tech_stack:
-        used_tools = [tool for tool in automation_tools if tool in [t.lower() for t in company.tech_stack]]
-        if used_tools:
-            intent_score_signals.append(100)
-            reasons["positive"].append(f"Uses automation tools: {', '.join(used_tools)}.")
+            reasons["missing"].append("employee_count")
+
+        # 2. Industry (Source: firmographics)
+        if company.industry:
+            industry_signal = self._industry_signal(company.industry)
+            if industry_signal:
+                fit_sum += industry_signal * self.industry_weight
+                fit_weight += self.industry_weight
+            if industry_signal == 100:
+                reasons["positive"].append(f"Ideal industry: {company.industry}.")
         else:
-            intent_score_signals.append(20) # Low score but not zero, as they use some tech
-    else:
-        reasons["missing"].append("tech_stack")
-
-    # 4. Hiring for Operations (Source: intent signals)
-    ops_roles = ["operations", "ops", "automation engineer"]
-    if company.recent_job_posts:
-        if any(role in post.lower() for post in company.recent_job_posts for role in ops_roles):
-            intent_score_signals.append(100)
-            reasons["positive"].append("Hiring for operations or automation roles.")
-    else:
-        reasons["missing"].append("recent_job_posts")
-
-    # --- Final Score Calculation ---
-
-    fit_score = int(sum(fit_score_signals) / len(fit_score_signals)) if fit_score_signals else 0
-    intent_score = int(sum(intent_score_signals) / len(intent_score_signals)) if intent_score_signals else 0
-
-    total_score = int((fit_score * 0.6) + (intent_score * 0.4))
-
-    total_fields = len(CompanyInput.__fields__)
-    provided_fields = sum(1 for field_name, value in company.dict().items() if value and field_name not in reasons["missing"])
-    confidence = round(provided_fields / total_fields, 2)
-
-    if total_score > 80:
-        action = "high_priority_outreach"
-    elif total_score > 60:
-        action = "medium_priority_outreach"
-    else:
-        action = "low_priority_monitoring"
-
-    company_id = hashlib.sha1(company.company_name.encode()).hexdigest()[:15]
-
-    return ScoringOutput(
-        company_id=company_id,
-        fit_score=fit_score,
-        intent_score=intent_score,
-        total_score=total_score,
-        confidence=confidence,
-        reasoning=reasons,
-        action=action
-    )
+            reasons["missing"].append("industry")
+
+        # --- Intent Score Signals (Are they showing buying signals now?) ---
+        intent_signals = []
+
+        # 3. Automation Tech Stack (Source: technographics)
+        if company.tech_stack:
+            used_tools = self._used_tools(company.tech_stack)
+            if used_tools:
+                intent_signals.append(100)
+                reasons["positive"].append(f"Uses automation tools: {', '.join(used_tools)}.")
+            else:
+                intent_signals.append(20) # Low score but not zero, as they use some tech
+        else:
+            reasons["missing"].append("tech_stack")
+
+        # 4. Hiring for Operations (Source: intent signals)
+        if company.recent_job_posts:
+            if self._is_hiring_ops(company.recent_job_posts):
+                intent_signals.append(100)
+                reasons["positive"].append("Hiring for operations or automation roles.")
+        else:
+            reasons["missing"].append("recent_job_posts")
+
+        # --- Final Score Calculation ---
+
+        fit_score = fit_sum // fit_weight if fit_weight else 0
+        intent_score = sum(intent_signals) // len(intent_signals) if intent_signals else 0
+        total_score = self._combine(fit_score, intent_score)
+
+        provided_fields = sum(1 for field_name in self.field_names if getattr(company, field_name))
+
+        return ScoringOutput(
+            company_id=hashlib.sha1(company.company_name.encode()).hexdigest()[:15],
+            fit_score=fit_score,
+            intent_score=intent_score,
+            total_score=total_score,
+            confidence=self.confidence_table[provided_fields],
+            reasoning=reasons,
+            action=self._action(total_score),
+        )
+
+    def score_columns(self, columns: Dict[str, List[Any]]) -> List[ScoringOutput]:
+        """
+        Scores many companies at once from a columnar layout ({field_name: [values]}).
+        """
+        names = columns["company_name"]
+        size = len(names)
+        if size == 0:
+            return []
+
+        employee_counts = columns.get("employee_count", [None] * size)
+        industries = columns.get("industry", [None] * size)
+        tech_stacks = columns.get("tech_stack", [None] * size)
+        job_posts = columns.get("recent_job_posts", [None] * size)
+
+        # --- Fit Score Signals ---
+
+        employees = np.array([count or 0 for count in employee_counts], dtype=np.int64)
+        has_employees = employees != 0
+        ideal_size = has_employees & (employees >= 30) & (employees <= 300)
+        partial_size = has_employees & (
+            ((employees >= 301) & (employees <= 500)) | ((employees >= 15) & (employees <= 29))
+        )
+        outside_size = has_employees & ~ideal_size & ~partial_size
+        employee_signal = np.select([ideal_size, partial_size], [100, 50], default=0)
+
+        has_industry = np.array([bool(industry) for industry in industries], dtype=bool)
+        industry_signal = np.array(
+            [self._industry_signal(industry) if industry else 0 for industry in industries],
+            dtype=np.int64,
+        )
+        ideal_industry = industry_signal == 100
+        scored_industry = industry_signal > 0
+
+        fit_signals = np.stack([employee_signal, industry_signal], axis=1)
+        fit_present = np.stack([has_employees, scored_industry], axis=1)
+        fit_sum = (fit_signals * fit_present) @ self.fit_weights
+        fit_weight = fit_present.astype(np.int64) @ self.fit_weights
+
+        # --- Intent Score Signals ---
+
+        has_tech = np.array([bool(stack) for stack in tech_stacks], dtype=bool)
+        used_tools_per_company = [
+            self._used_tools(stack) if stack else [] for stack in tech_stacks
+        ]
+        uses_automation = np.array([bool(tools) for tools in used_tools_per_company], dtype=bool)
+        tech_signal = np.where(uses_automation, 100, 20) * has_tech
+
+        has_job_posts = np.array([bool(posts) for posts in job_posts], dtype=bool)
+        hiring_ops = np.array(
+            [bool(posts) and self._is_hiring_ops(posts) for posts in job_posts], dtype=bool
+        )
+
+        intent_sum = tech_signal + np.where(hiring_ops, 100, 0)
+        intent_count = has_tech.astype(np.int64) + hiring_ops
+
+        # --- Final Score Calculation ---
+
+        fit_scores = np.where(fit_weight > 0, fit_sum // np.maximum(fit_weight, 1), 0)
+        intent_scores = np.where(intent_count > 0, intent_sum // np.maximum(intent_count, 1), 0)
+        total_scores = (
+            np.stack([fit_scores, intent_scores], axis=1) @ self.blend_weights
+        ) // self.blend_weights.sum()
+
+        provided_fields = np.zeros(size, dtype=np.int64)
+        for field_name in self.field_names:
+            values = columns.get(field_name, [None] * size)
+            provided_fields += np.array([bool(value) for value in values], dtype=bool)
+
+        actions = np.select(
+            [total_scores > 80, total_scores > 60],
+            ["high_priority_outreach", "medium_priority_outreach"],
+            default="low_priority_monitoring",
+        )
+
+        results = []
+        for i in range(size):
+            reasons = {"positive": [], "negative": [], "missing": []}
+
+            if not has_employees[i]:
+                reasons["missing"].append("employee_count")
+            elif ideal_size[i]:
+                reasons["positive"].append(f"Ideal company size ({employee_counts[i]} employees).")
+            elif outside_size[i]:
+                reasons["negative"].append("Company size is outside target range.")
+
+            if not has_industry[i]:
+                reasons["missing"].append("industry")
+            elif ideal_industry[i]:
+                reasons["positive"].append(f"Ideal industry: {industries[i]}.")
+
+            if not has_tech[i]:
+                reasons["missing"].append("tech_stack")
+            elif uses_automation[i]:
+                reasons["positive"].append(
+                    f"Uses automation tools: {', '.join(used_tools_per_company[i])}."
+                )
+
+            if not has_job_posts[i]:
+                reasons["missing"].append("recent_job_posts")
+            elif hiring_ops[i]:
+                reasons["positive"].append("Hiring for operations or automation roles.")
+
+            results.append(
+                ScoringOutput(
+                    company_id=hashlib.sha1(names[i].encode()).hexdigest()[:15],
+                    fit_score=int(fit_scores[i]),
+                    intent_score=int(intent_scores[i]),
+                    total_score=int(total_scores[i]),
+                    confidence=self.confidence_table[provided_fields[i]],
+                    reasoning=reasons,
+                    action=str(actions[i]),
+                )
+            )
+
+        return results
+
+
+@lru_cache(maxsize=None)
+def _compile_scorer(model: ScoringModel) -> CompiledScorer:
+    return CompiledScorer(model)
+
+
+def get_compiled_scorer(model: Union[ScoringModel, str]) -> CompiledScorer:
+    """Returns the cached compiled scorer for a scoring model, building it on first use."""
+    return _compile_scorer(ScoringModel(model))
+
+
+def calculate_scores(company: CompanyInput, model: ScoringModel) -> ScoringOutput:
+    """
+    Calculates fit and intent scores for a company based on a defined Ideal Customer Profile.
+    """
+    return get_compiled_scorer(model).score(company)
+
+
+def companies_to_columns(companies: List[CompanyInput]) -> Dict[str, List[Any]]:
+    """
+    Transposes a list of companies into the column layout expected by score_batch.
+    """
+    field_names = list(SCORING_FIELDS)
+    columns = {field_name: [] for field_name in field_names}
+    for company in companies:
+        for field_name in field_names:
+            columns[field_name].append(getattr(company, field_name))
+    return columns
+
+
+def score_batch(columns: Dict[str, List[Any]], model: ScoringModel) -> List[ScoringOutput]:
+    """
+    Scores many companies at once from a columnar layout ({field_name: [values]}).
+
+    Numeric signals, score aggregation, confidence and action are computed with
+    array operations; the results are identical to calling calculate_scores on
+    each company in turn.
+    """
+    return get_compiled_scorer(model).score_columns(columns)
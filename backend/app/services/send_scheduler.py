@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from app.services.email_sending_service import EMAIL_SEND_BATCH_SIZE
+
+EMAIL_SEND_MIN_BATCH_SIZE = int(os.getenv("EMAIL_SEND_MIN_BATCH_SIZE", "5"))
+EMAIL_SEND_MAX_BATCH_SIZE = int(os.getenv("EMAIL_SEND_MAX_BATCH_SIZE", "500"))
+EMAIL_SEND_MIN_INTERVAL_SECONDS = float(os.getenv("EMAIL_SEND_MIN_INTERVAL_SECONDS", "1"))
+EMAIL_SEND_MAX_INTERVAL_SECONDS = float(os.getenv("EMAIL_SEND_MAX_INTERVAL_SECONDS", "60"))
+# Keep well under EMAIL_SEND_LEASE_SECONDS so a batch finishes before its lease expires.
+EMAIL_SEND_TARGET_CYCLE_SECONDS = float(os.getenv("EMAIL_SEND_TARGET_CYCLE_SECONDS", "10"))
+EMAIL_SEND_THROUGHPUT_WINDOW_SECONDS = float(os.getenv("EMAIL_SEND_THROUGHPUT_WINDOW_SECONDS", "300"))
+
+
+class AdaptiveSendSchedule:
+    """
+    Batch size and cycle interval for the sender workers, adapted after every
+    cycle from the queue depth and the measured per-email send latency. While
+    a backlog remains, workers cycle every `min_interval_seconds` and the batch
+    doubles up to what fits in `target_cycle_seconds`; a slow cycle halves it.
+    An empty queue backs the interval off towards `max_interval_seconds`.
+    Shared by all sender workers of a process, so throughput is their total.
+    """
+
+    def __init__(
+        self,
+        initial_batch_size: int = EMAIL_SEND_BATCH_SIZE,
+        min_batch_size: int = EMAIL_SEND_MIN_BATCH_SIZE,
+        max_batch_size: int = EMAIL_SEND_MAX_BATCH_SIZE,
+        min_interval_seconds: float = EMAIL_SEND_MIN_INTERVAL_SECONDS,
+        max_interval_seconds: float = EMAIL_SEND_MAX_INTERVAL_SECONDS,
+        target_cycle_seconds: float = EMAIL_SEND_TARGET_CYCLE_SECONDS,
+        window_seconds: float = EMAIL_SEND_THROUGHPUT_WINDOW_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, max_batch_size)
+        self.batch_size = min(max(initial_batch_size, self.min_batch_size), self.max_batch_size)
+        self.min_interval_seconds = min_interval_seconds
+        self.max_interval_seconds = max(min_interval_seconds, max_interval_seconds)
+        self.interval_seconds = self.max_interval_seconds
+        self.target_cycle_seconds = target_cycle_seconds
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cycles = deque()
+        self.latency_ewma_seconds = 0.0
+        self.backlog = 0
+        self.cycles = 0
+        self.sent = 0
+
+    def record_cycle(self, sent: int, seconds: float, backlog: int) -> None:
+        """Feeds one finished cycle back: emails sent, its duration and the unsent emails left."""
+        with self._lock:
+            now = self._clock()
+            self.cycles += 1
+            self.sent += sent
+            self.backlog = backlog
+            self._cycles.append((now - seconds, now, sent))
+            while self._cycles and self._cycles[0][1] < now - self.window_seconds:
+                self._cycles.popleft()
+
+            if sent:
+                per_email = seconds / sent
+                self.latency_ewma_seconds = (
+                    per_email
+                    if not self.latency_ewma_seconds
+                    else 0.8 * self.latency_ewma_seconds + 0.2 * per_email
+                )
+
+            if seconds > self.target_cycle_seconds:
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            elif backlog and sent >= self.batch_size:
+                fits = (
+                    int(self.target_cycle_seconds / self.latency_ewma_seconds)
+                    if self.latency_ewma_seconds
+                    else self.max_batch_size
+                )
+                self.batch_size = max(
+                    self.min_batch_size, min(self.max_batch_size, self.batch_size * 2, fits)
+                )
+
+            if backlog:
+                self.interval_seconds = self.min_interval_seconds
+            else:
+                self.interval_seconds = min(
+                    self.max_interval_seconds, max(self.min_interval_seconds, self.interval_seconds * 2)
+                )
+
+    def throughput_per_second(self) -> float:
+        with self._lock:
+            if not self._cycles:
+                return 0.0
+            span = self._cycles[-1][1] - self._cycles[0][0]
+            sent = sum(cycle[2] for cycle in self._cycles)
+        return sent / span if span > 0 else 0.0
+
+    def drain_eta_seconds(self) -> Optional[float]:
+        """Seconds to empty the current backlog at the recent throughput; None if nothing is moving."""
+        if not self.backlog:
+            return 0.0
+        throughput = self.throughput_per_second()
+        return self.backlog / throughput if throughput else None
+
+    def stats(self) -> dict:
+        eta = self.drain_eta_seconds()
+        return {
+            "batch_size": self.batch_size,
+            "interval_seconds": self.interval_seconds,
+            "latency_ewma_seconds": round(self.latency_ewma_seconds, 4),
+            "throughput_per_minute": round(self.throughput_per_second() * 60, 1),
+            "backlog": self.backlog,
+            "drain_eta_seconds": round(eta, 1) if eta is not None else None,
+            "cycles": self.cycles,
+            "sent": self.sent,
+        }
+
+
+send_schedule = AdaptiveSendSchedule()
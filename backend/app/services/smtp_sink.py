@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+
+class SMTPSink:
+    """
+    In-process SMTP server that accepts every message and keeps it in memory,
+    so the send path can be tested and benchmarked without outside services.
+    Advertises PIPELINING. Recipients in `reject_domains` get a 550, and each
+    accepted message can be delayed by `latency_ms` to mimic a real relay.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0,
+        reject_domains: Iterable[str] = (),
+        keep_messages: bool = True,
+    ):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.reject_domains = {domain.lower() for domain in reject_domains}
+        self.keep_messages = keep_messages
+        self.messages: List[Tuple[str, List[str], bytes]] = []
+        self.received = 0
+        self.rejected = 0
+        self.connections = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._server = None
+
+    def start(self) -> "SMTPSink":
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="smtp-sink", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self) -> "SMTPSink":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+
+        async def reply(text: str) -> None:
+            writer.write(text.encode() + b"\r\n")
+            await writer.drain()
+
+        sender, recipients = None, []
+        try:
+            await reply("220 brim-sink ESMTP")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                command = line.decode(errors="replace").rstrip("\r\n")
+                verb = command[:4].upper()
+                if verb == "EHLO":
+                    await reply("250-brim-sink\r\n250-PIPELINING\r\n250 8BITMIME")
+                elif verb == "HELO":
+                    await reply("250 brim-sink")
+                elif verb == "MAIL":
+                    sender, recipients = command[10:].strip(" <>"), []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    recipient = command[8:].strip(" <>")
+                    if recipient.rpartition("@")[2].lower() in self.reject_domains:
+                        self.rejected += 1
+                        await reply("550 Mailbox unavailable")
+                    else:
+                        recipients.append(recipient)
+                        await reply("250 OK")
+                elif verb == "DATA":
+                    if sender is None or not recipients:
+                        await reply("503 Need MAIL and RCPT first")
+                        continue
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = await self._read_data(reader)
+                    if self.latency_ms:
+                        await asyncio.sleep(self.latency_ms / 1000)
+                    self.received += 1
+                    if self.keep_messages:
+                        self.messages.append((sender, recipients, data))
+                    sender, recipients = None, []
+                    await reply("250 OK queued")
+                elif verb == "RSET":
+                    sender, recipients = None, []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    return
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_data(reader: asyncio.StreamReader) -> bytes:
+        lines = []
+        while True:
+            line = await reader.readline()
+            if not line or line == b".\r\n":
+                return b"".join(lines)
+            lines.append(line[1:] if line.startswith(b"..") else line)
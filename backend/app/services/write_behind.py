@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+
+class WriteBehindQueue:
+    """
+    Buffers rows from request handlers and group-commits them from a background
+    thread. A flush happens when `max_batch_size` rows are waiting or when the
+    oldest waiting row is `max_delay_seconds` old, whichever comes first.
+    Enqueueing blocks only when `max_queue_size` rows are already waiting.
+    A batch that fails to commit is retried in halves, so only the rows that
+    fail on their own are dropped; those are logged and kept in `rejected`.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_batch_size: int = 500,
+        max_delay_seconds: float = 0.05,
+        max_queue_size: int = 100_000,
+        name: str = "write-behind",
+        insert_statements: Optional[Dict[object, Callable[[], object]]] = None,
+        on_commit: Optional[Callable[[List[Tuple[object, dict]]], None]] = None,
+    ):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_delay_seconds = max_delay_seconds
+        self.max_queue_size = max_queue_size
+        self.name = name
+        # Per-model INSERT builders (e.g. upserts); plain insert(model) otherwise.
+        self.insert_statements = insert_statements or {}
+        # Called from the flusher thread with every batch that was committed.
+        self.on_commit = on_commit
+        # The most recent rows that could not be written, with their error.
+        self.rejected: deque = deque(maxlen=100)
+        self._rows: deque = deque()
+        self._oldest_enqueued_at = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._flush_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def depth(self) -> int:
+        return len(self._rows)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stops the flusher after draining every row still in the queue."""
+        if self._thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def enqueue(self, model, row: dict) -> None:
+        self.enqueue_many(model, [row])
+
+    def enqueue_many(self, model, rows: Iterable[dict]) -> None:
+        with self._condition:
+            for row in rows:
+                while len(self._rows) >= self.max_queue_size and not self._stopping:
+                    self._condition.wait()
+                if not self._rows:
+                    self._oldest_enqueued_at = time.monotonic()
+                self._rows.append((model, row))
+                self.enqueued += 1
+            self._condition.notify_all()
+
+    def _take_batch(self) -> List[Tuple[object, dict]]:
+        batch = []
+        while self._rows and len(batch) < self.max_batch_size:
+            batch.append(self._rows.popleft())
+        self._oldest_enqueued_at = time.monotonic() if self._rows else None
+        self._condition.notify_all()
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    if len(self._rows) >= self.max_batch_size:
+                        break
+                    if self._rows:
+                        wait_for = self._oldest_enqueued_at + self.max_delay_seconds - time.monotonic()
+                        if wait_for <= 0:
+                            break
+                        self._condition.wait(wait_for)
+                    else:
+                        self._condition.wait()
+                if self._stopping and not self._rows:
+                    return
+                batch = self._take_batch()
+            self._write(batch)
+
+    def flush(self) -> None:
+        """Synchronously writes everything currently queued."""
+        while True:
+            with self._condition:
+                batch = self._take_batch()
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch: List[Tuple[object, dict]]) -> None:
+        with self._flush_lock:
+            db = self.session_factory()
+            try:
+                self._write_rows(db, batch)
+            finally:
+                db.close()
+                self.flushes += 1
+
+    def _write_rows(self, db: Session, batch: List[Tuple[object, dict]]) -> None:
+        groups: Dict[Tuple[object, frozenset], List[dict]] = defaultdict(list)
+        for model, row in batch:
+            groups[(model, frozenset(row))].append(row)
+
+        try:
+            for (model, _), rows in groups.items():
+                statement = self.insert_statements.get(model)
+                db.execute(statement() if statement else insert(model), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if len(batch) == 1:
+                self._reject(batch[0], e)
+                return
+            logging.warning(
+                f"WRITE-BEHIND ({self.name}): Failed to commit {len(batch)} rows; retrying them in halves. Error: {e}"
+            )
+            middle = len(batch) // 2
+            self._write_rows(db, batch[:middle])
+            self._write_rows(db, batch[middle:])
+            return
+        self.written += len(batch)
+        self._notify_commit(batch)
+
+    def _reject(self, item: Tuple[object, dict], error: Exception) -> None:
+        model, row = item
+        self.failed += 1
+        self.rejected.append((model, row, repr(error)))
+        logging.error(
+            f"WRITE-BEHIND ({self.name}): Dropped a {getattr(model, '__name__', model)} row. "
+            f"Error: {error}. Row: {repr(row)[:500]}"
+        )
+
+    def _notify_commit(self, batch: List[Tuple[object, dict]]) -> None:
+        if self.on_commit is None:
+            return
+        try:
+            self.on_commit(batch)
+        except Exception as e:
+            logging.error(f"WRITE-BEHIND ({self.name}): on_commit callback failed. Error: {e}", exc_info=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "depth": self.depth(),
+            "max_queue_size": self.max_queue_size,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
@@ -1,11 +1,17 @@
-﻿import pytest
+﻿import os
+
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+# The Gemini calls are mocked in the tests; the provider only needs a key to be built.
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
 from app.main import app
 from app.database import Base, get_db
+from app.services import email_sending_service, score_cache
 
 from app.models import event_model
 
@@ -55,5 +61,8 @@ def client(db_session):
             pass
 
     app.dependency_overrides[get_db] = override_get_db
+    score_cache.score_cache.clear()
+    email_sending_service.domain_throttle.clear()
     yield TestClient(app)
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
+    score_cache.score_cache.clear()
\ No newline at end of file
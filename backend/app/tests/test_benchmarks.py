@@ -0,0 +1,90 @@
+from app.models.schemas import CompanyInput
+from app.services import email_generation_service, email_transport
+from app.services.generation_providers import StubProvider
+from benchmarks import pipeline, run, smtp_send
+from benchmarks.generator import CompanyGenerator
+
+
+def test_generator_is_deterministic_and_produces_valid_companies():
+    first = list(CompanyGenerator(seed=7).generate(50))
+    second = list(CompanyGenerator(seed=7).generate(50))
+
+    assert first == second
+    assert first != list(CompanyGenerator(seed=8).generate(50))
+    assert all(CompanyInput(**company) for company in first)
+    assert len({company["company_name"] for company in first}) == 50
+
+
+def test_generator_follows_seed_distributions():
+    seed_companies = [
+        {"company_name": "A", "employee_count": 100, "industry": "SaaS", "tech_stack": ["Zapier"]},
+        {"company_name": "B", "employee_count": 100, "industry": "SaaS", "tech_stack": ["Zapier"]},
+    ]
+
+    companies = list(CompanyGenerator(seed_companies, seed=1).generate(20))
+
+    assert {company["industry"] for company in companies} == {"SaaS"}
+    assert {tuple(company["tech_stack"]) for company in companies} == {("Zapier",)}
+    assert all(90 <= company["employee_count"] <= 110 for company in companies)
+
+
+def test_compare_flags_only_drops_beyond_tolerance():
+    baseline = {"results": {"1000": {"scalar_scoring": {"rows_per_second": 1000.0},
+                                     "batch_scoring": {"rows_per_second": 1000.0}}}}
+    results = {"results": {"1000": {"scalar_scoring": {"rows_per_second": 900.0},
+                                    "batch_scoring": {"rows_per_second": 700.0},
+                                    "email_variant": {"rows_per_second": 5.0}}}}
+
+    regressions = run.compare(results, baseline, tolerance=0.15)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("batch_scoring @ 1000")
+    assert results["results"]["1000"]["scalar_scoring"]["change"] == -0.1
+
+
+def test_run_size_reports_throughput_for_each_benchmark():
+    results = run.run_size(50, seed=3, selected=["scalar_scoring", "batch_scoring", "event_logging_bulk"])
+
+    assert set(results) == {"scalar_scoring", "batch_scoring", "event_logging_bulk"}
+    assert all(measured["rows"] == 50 for measured in results.values())
+    assert all(measured["rows_per_second"] > 0 for measured in results.values())
+
+
+def test_pipeline_runs_end_to_end_against_the_stub_provider(mocker):
+    async def no_sleep(seconds):
+        pass
+
+    mocker.patch.object(email_generation_service.gemini_rate_limiter, "rate_per_second", 0)
+    provider = StubProvider(latency_ms=5, seed=3, sleep=no_sleep)
+
+    results = pipeline.run_pipeline(20, provider, seed=3, batch_size=5)
+
+    assert results["companies"] == 20
+    assert 0 < results["emails"] <= 20
+    assert set(results["stages"]) == {"score", "generate", "send"}
+    assert results["provider"]["calls"] == provider.calls > 0
+    assert results["provider_latency_ms"]["p99"] >= results["provider_latency_ms"]["p50"]
+    assert results["unsent"] == 0
+
+
+def test_pipeline_send_stage_ends_when_sends_keep_failing(mocker):
+    async def no_sleep(seconds):
+        pass
+
+    class FailingTransport(email_transport.EmailTransport):
+        def send_many(self, emails):
+            return [email_transport.SendResult(email.email_id, False, error="refused") for email in emails]
+
+    mocker.patch.object(email_generation_service.gemini_rate_limiter, "rate_per_second", 0)
+    mocker.patch.object(email_transport, "_transport", FailingTransport())
+
+    results = pipeline.run_pipeline(10, StubProvider(latency_ms=5, seed=3, sleep=no_sleep), seed=3, batch_size=5)
+
+    assert results["unsent"] == results["emails"] > 0
+
+
+def test_smtp_benchmark_sends_every_email_through_each_mode():
+    results = smtp_send.run_benchmark(20, pool_sizes=[1, 4], batch_size=10)
+
+    assert set(results["results"]) == {"connection_per_email", "pool_1", "pool_4"}
+    assert all(measured["emails"] == 20 for measured in results["results"].values())
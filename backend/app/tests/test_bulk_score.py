@@ -0,0 +1,96 @@
+import csv
+import json
+
+import pytest
+
+from app import bulk_score
+from app.models.schemas import CompanyInput, ScoringModel
+from app.services import scoring_service
+
+COMPANIES = [
+    {
+        "company_name": f"Offline Co {i}",
+        "employee_count": 20 + i * 40,
+        "industry": ["SaaS", "Biotech", "Retail"][i % 3],
+        "tech_stack": ["Zapier"] if i % 2 else ["Excel"],
+        "recent_job_posts": ["Head of Operations"] if i % 4 == 0 else [],
+    }
+    for i in range(9)
+]
+
+
+def test_run_scores_ndjson_across_workers(tmp_path):
+    input_path = tmp_path / "companies.ndjson"
+    input_path.write_text(
+        "\n".join(json.dumps(row) for row in COMPANIES + [{"employee_count": 5}])
+    )
+    output_path = tmp_path / "scores.ndjson"
+
+    summary = bulk_score.run(
+        str(input_path),
+        model=ScoringModel.AGGRESSIVE,
+        output_path=str(output_path),
+        workers=2,
+        chunk_size=4,
+    )
+
+    assert summary["scored"] == 9
+    assert summary["failed"] == 1
+    assert summary["rows_per_second"] > 0
+
+    written = [json.loads(line) for line in output_path.read_text().splitlines()]
+    expected = [
+        scoring_service.calculate_scores(CompanyInput(**row), ScoringModel.AGGRESSIVE)
+        for row in COMPANIES
+    ]
+    assert [row["total_score"] for row in written] == [e.total_score for e in expected]
+    assert written[0]["company_name"] == "Offline Co 0"
+
+
+def test_run_reads_csv_and_writes_csv(tmp_path):
+    input_path = tmp_path / "companies.csv"
+    with open(input_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["company_name", "employee_count", "industry", "tech_stack", "recent_job_posts"])
+        writer.writerow(["Csv Fit Inc.", "150", "SaaS", "Zapier; Salesforce", "Head of Operations"])
+        writer.writerow(["Csv Empty LLC", "", "", "", ""])
+    output_path = tmp_path / "scores.csv"
+
+    summary = bulk_score.run(str(input_path), output_path=str(output_path), workers=1)
+
+    assert summary["scored"] == 2
+    with open(output_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["total_score"] == "100"
+    assert json.loads(rows[1]["reasoning"])["missing"] == [
+        "employee_count",
+        "industry",
+        "tech_stack",
+        "recent_job_posts",
+    ]
+
+
+def test_run_counts_bad_csv_rows_as_failed_and_keeps_going(tmp_path):
+    input_path = tmp_path / "companies.csv"
+    with open(input_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["company_name", "employee_count", "industry"])
+        writer.writerow(["Before Inc.", "120.0", "SaaS"])
+        writer.writerow(["Bad Count Inc.", "about 50", "SaaS"])
+        writer.writerow(["Extra Cells Inc.", "80", "SaaS", "unexpected", "cells"])
+        writer.writerow(["After Inc.", "1e3", "Retail"])
+    output_path = tmp_path / "scores.ndjson"
+
+    summary = bulk_score.run(str(input_path), output_path=str(output_path), workers=1)
+
+    assert (summary["scored"], summary["failed"]) == (3, 1)
+    written = [json.loads(line)["company_name"] for line in output_path.read_text().splitlines()]
+    assert written == ["Before Inc.", "Extra Cells Inc.", "After Inc."]
+
+
+def test_run_requires_a_destination(tmp_path):
+    input_path = tmp_path / "companies.json"
+    input_path.write_text(json.dumps(COMPANIES))
+
+    with pytest.raises(ValueError):
+        bulk_score.run(str(input_path))
@@ -0,0 +1,121 @@
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import Base
+from app.models.event_model import OutboundEmail
+from app.models.schemas import CompanyInput, ScoringOutput
+from app.services import email_generation_service, email_sender_worker, email_sending_service
+from app.services.email_sender_worker import EmailSenderPool
+from app.services.send_scheduler import AdaptiveSendSchedule
+from app.services.write_behind import WriteBehindQueue
+
+HOT_LEAD = ScoringOutput(
+    company_id="hot_lead",
+    fit_score=95,
+    intent_score=95,
+    total_score=95,
+    confidence=0.9,
+    reasoning={},
+    action="high_priority_outreach",
+)
+EMAIL = {"variant_name": "problem_focused", "subject": "Hi", "body": "Body"}
+
+
+def _schedule(interval_seconds: float) -> AdaptiveSendSchedule:
+    return AdaptiveSendSchedule(
+        initial_batch_size=8,
+        min_batch_size=5,
+        min_interval_seconds=interval_seconds,
+        max_interval_seconds=interval_seconds,
+    )
+
+
+def test_run_once_sends_an_adaptive_batch_and_records_the_backlog(db_session: Session, mocker):
+    for i in range(12):
+        db_session.add(OutboundEmail(company_id=f"adaptive_{i}", score=50, is_sent=False, send_attempts=0))
+    db_session.commit()
+
+    @contextmanager
+    def sessions():
+        yield db_session
+
+    schedule = _schedule(1)
+    schedule.batch_size = 7
+    record_cycle = mocker.spy(schedule, "record_cycle")
+    send = mocker.spy(email_sending_service, "send_prioritized_emails")
+    pool = EmailSenderPool(session_factory=sessions, workers=1, schedule=schedule)
+
+    assert pool.run_once() == 7
+
+    assert send.call_args.kwargs["limit"] == 7
+    assert db_session.query(OutboundEmail).filter_by(is_sent=True).count() == 7
+    sent, _, backlog = record_cycle.call_args.args
+    assert (sent, backlog) == (7, 5)
+    assert (schedule.backlog, schedule.cycles, schedule.sent) == (5, 1, 7)
+    assert schedule.interval_seconds == 1
+
+
+def test_backlog_leaves_out_leased_and_retrying_emails(db_session: Session, mocker):
+    db_session.add_all([
+        OutboundEmail(company_id="claimable", score=50, is_sent=False, send_attempts=0),
+        OutboundEmail(company_id="leased", score=90, is_sent=False, send_attempts=0),
+        OutboundEmail(company_id="retrying", score=80, is_sent=False, send_attempts=0),
+    ])
+    db_session.commit()
+    email_sending_service.claim_emails(db_session, "other-worker", 2)
+    email_sending_service.release_emails(
+        db_session, "other-worker",
+        [db_session.query(OutboundEmail).filter_by(company_id="retrying").one().id], "timeout",
+    )
+
+    @contextmanager
+    def sessions():
+        yield db_session
+
+    schedule = _schedule(1)
+    schedule.batch_size = 1
+    record_cycle = mocker.spy(schedule, "record_cycle")
+    pool = EmailSenderPool(session_factory=sessions, workers=1, schedule=schedule)
+
+    assert pool.run_once() == 1
+
+    # Two emails are unsent, but one is leased and one waits out its retry delay.
+    assert email_sending_service.queue_stats(db_session)["unsent"] == 2
+    sent, _, backlog = record_cycle.call_args.args
+    assert (sent, backlog) == (1, 0)
+
+
+def test_committed_email_wakes_an_idle_sender_before_the_fallback_poll(tmp_path, mocker):
+    engine = create_engine(f"sqlite:///{tmp_path / 'wake.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    sessions = sessionmaker(bind=engine)
+    # A one-hour fallback poll: only a notify() can get the email out in time.
+    pool = EmailSenderPool(session_factory=sessions, workers=1, schedule=_schedule(3600))
+    mocker.patch.object(email_sender_worker, "email_sender_pool", pool)
+    queue = WriteBehindQueue(
+        sessions, max_delay_seconds=0.01, on_commit=email_generation_service._wake_email_senders
+    )
+    sent = threading.Event()
+    run_once = pool.run_once
+    mocker.patch.object(pool, "run_once", side_effect=lambda worker: run_once(worker) and sent.set())
+
+    pool.start()
+    queue.start()
+    try:
+        mocker.patch.object(email_generation_service, "generated_email_queue", queue)
+        with sessions() as db:
+            email_generation_service.save_generated_emails(
+                db, [(CompanyInput(company_name="Hot Lead"), HOT_LEAD, EMAIL)]
+            )
+        assert sent.wait(5)
+    finally:
+        queue.stop()
+        pool.stop()
+
+    with sessions() as check:
+        assert check.query(OutboundEmail).filter_by(company_id="hot_lead").one().is_sent is True
+    assert pool.wakeups == 1
+    engine.dispose()
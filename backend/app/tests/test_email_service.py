@@ -1,11 +1,33 @@
 ﻿import pytest
+import asyncio
 import json
-from unittest.mock import AsyncMock, MagicMock
-from sqlalchemy.orm import Session
-
-from app.services import email_generation_service, email_sending_service, event_service
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+from google.api_core import exceptions as google_exceptions
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.services import (
+    email_generation_service,
+    email_sending_service,
+    email_templates,
+    event_service,
+    generation_cache_service,
+    dead_letter_service,
+    email_dedup_service,
+    generation_providers,
+)
 from app.models.schemas import CompanyInput, ScoringOutput, ActivationEventInput
-from app.models.event_model import OutboundEmail, Event
+from app.database import Base, add_missing_columns
+from app.models.event_model import OutboundEmail, Event, GeneratedEmailCache, GenerationDeadLetter
+from app.services.generation_providers import Completion
+from app.services.rate_limiting import DomainThrottle
+from app.services.resilience import CircuitBreaker
+from app.services.write_behind import WriteBehindQueue
 
 MOCK_GEMINI_RESPONSE = {
     "variant_name": "problem_focused",
@@ -30,7 +52,7 @@ async def test_generate_and_save_email_content(db_session: Session, mocker):
     )
 
     mock_api_call = mocker.patch(
-        "app.services.email_generation_service.genai.GenerativeModel.generate_content_async",
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
         new_callable=AsyncMock,
     )
     mock_api_call.return_value.text = json.dumps(MOCK_GEMINI_RESPONSE)
@@ -54,6 +76,615 @@ async def test_generate_and_save_email_content(db_session: Session, mocker):
     mock_log_event.assert_called_once()
 
 
+
+@pytest.mark.asyncio
+async def test_generation_cache_reuses_stored_email(db_session: Session, mocker):
+    company_data = CompanyInput(
+        company_name="CacheCorp",
+        employee_count=120,
+        industry="SaaS",
+        tech_stack=["Zapier", "Slack"],
+    )
+    same_company_reformatted = CompanyInput(
+        company_name="  cachecorp ",
+        employee_count=120,
+        industry="saas",
+        tech_stack=["slack", "Zapier"],
+    )
+    scoring_data = ScoringOutput(
+        company_id="cache_company_1",
+        total_score=85,
+        fit_score=80,
+        intent_score=90,
+        confidence=0.9,
+        reasoning={},
+        action="high_priority_outreach",
+    )
+    mock_api_call = mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+    )
+    mock_api_call.return_value.text = json.dumps(MOCK_GEMINI_RESPONSE)
+
+    # ACT
+    for company, company_id in ((company_data, "cache_company_1"), (same_company_reformatted, "cache_company_2")):
+        await email_generation_service.generate_and_save_email_content(
+            db_provider=lambda: db_session,
+            company_data=company,
+            scoring=scoring_data.copy(update={"company_id": company_id}),
+        )
+
+    # ASSERT
+    mock_api_call.assert_awaited_once()
+    saved_emails = (
+        db_session.query(OutboundEmail).filter(OutboundEmail.company_id.like("cache_company_%")).all()
+    )
+    assert len(saved_emails) == 2
+    assert {email.email_subject for email in saved_emails} == {"Mocked Subject for TestCorp"}
+    entry = db_session.query(GeneratedEmailCache).one()
+    assert entry.hits == 1
+
+
+def test_generation_cache_evicts_least_recently_used(db_session: Session):
+    for i in range(3):
+        generation_cache_service.store_email(
+            db_session, f"key-{i}", {"variant_name": "roi_focused", "subject": f"S{i}", "body": "B"}
+        )
+    db_session.query(GeneratedEmailCache).filter_by(cache_key="key-0").update(
+        {"last_used_at": datetime(2030, 1, 1)}
+    )
+    db_session.commit()
+
+    # ACT
+    evicted = generation_cache_service.evict_over_limit(db_session, max_entries=2)
+
+    # ASSERT
+    assert evicted == 1
+    remaining = {entry.cache_key for entry in db_session.query(GeneratedEmailCache).all()}
+    assert "key-0" in remaining
+    assert len(remaining) == 2
+
+
+
+@pytest.fixture
+def no_rate_limit(mocker):
+    mocker.patch.object(email_generation_service.gemini_rate_limiter, "rate_per_second", 0)
+
+
+def _batch_scoring(company_id: str) -> ScoringOutput:
+    return ScoringOutput(
+        company_id=company_id,
+        total_score=80,
+        fit_score=80,
+        intent_score=80,
+        confidence=0.9,
+        reasoning={},
+        action="high_priority_outreach",
+    )
+
+
+@pytest.mark.asyncio
+async def test_generate_email_batch_falls_back_for_invalid_items(db_session: Session, mocker, no_rate_limit):
+    scored_companies = [
+        (
+            CompanyInput(company_name=f"Batch Corp {i}", employee_count=100, tech_stack=["Zapier"]),
+            _batch_scoring(f"batch_{i}"),
+        )
+        for i in range(3)
+    ]
+    batch_response = [
+        {"ref": "batch_0", "variant_name": "problem_focused", "subject": "S0", "body": "B0"},
+        {"ref": "batch_1", "variant_name": "problem_focused", "subject": "S1"},
+        {"ref": "batch_2", "variant_name": "problem_focused", "subject": "S2", "body": "B2"},
+    ]
+    mock_api_call = mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+        side_effect=[
+            MagicMock(text=json.dumps(batch_response)),
+            MagicMock(text=json.dumps(MOCK_GEMINI_RESPONSE)),
+        ],
+    )
+
+    # ACT
+    summary = await email_generation_service.generate_and_save_email_batch(
+        lambda: db_session, scored_companies, batch_size=3
+    )
+
+    # ASSERT
+    assert mock_api_call.await_count == 2
+    assert "Batch Corp 0" in mock_api_call.await_args_list[0].args[0]
+    assert "Batch Corp 2" in mock_api_call.await_args_list[0].args[0]
+    assert "Batch Corp 1" in mock_api_call.await_args_list[1].args[0]
+    assert summary == {"duplicates": 0, "templated": 0, "cached": 0, "batched": 2, "fallback": 1, "dead_lettered": 0, "skipped": 0}
+    subjects = {
+        email.company_id: email.email_subject
+        for email in db_session.query(OutboundEmail).filter(OutboundEmail.company_id.like("batch_%"))
+    }
+    assert subjects == {"batch_0": "S0", "batch_1": "Mocked Subject for TestCorp", "batch_2": "S2"}
+
+
+@pytest.mark.asyncio
+async def test_generate_email_batch_falls_back_when_response_is_malformed(db_session: Session, mocker, no_rate_limit):
+    scored_companies = [
+        (
+            CompanyInput(company_name=f"Broken Corp {i}", employee_count=100, tech_stack=["Zapier"]),
+            _batch_scoring(f"broken_{i}"),
+        )
+        for i in range(2)
+    ]
+    mock_api_call = mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+        side_effect=[
+            MagicMock(text="not json"),
+            MagicMock(text=json.dumps(MOCK_GEMINI_RESPONSE)),
+            MagicMock(text=json.dumps(MOCK_GEMINI_RESPONSE)),
+        ],
+    )
+
+    # ACT
+    summary = await email_generation_service.generate_and_save_email_batch(
+        lambda: db_session, scored_companies, batch_size=5
+    )
+
+    # ASSERT
+    assert mock_api_call.await_count == 3
+    assert summary["fallback"] == 2
+    assert db_session.query(OutboundEmail).filter(OutboundEmail.company_id.like("broken_%")).count() == 2
+
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_batch_is_retried_then_dead_lettered_not_split(
+    db_session: Session, mocker, fresh_circuit_breaker
+):
+    scored_companies = [
+        (
+            CompanyInput(company_name=f"Throttled Corp {i}", employee_count=100, tech_stack=["Zapier"]),
+            _batch_scoring(f"throttled_{i}"),
+        )
+        for i in range(4)
+    ]
+    mock_api_call = mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+        side_effect=google_exceptions.ResourceExhausted("quota"),
+    )
+
+    # ACT
+    summary = await email_generation_service.generate_and_save_email_batch(
+        lambda: db_session, scored_companies, batch_size=4
+    )
+
+    # ASSERT
+    assert mock_api_call.await_count == email_generation_service.GENERATION_MAX_ATTEMPTS
+    assert (summary["batched"], summary["fallback"], summary["dead_lettered"]) == (0, 0, 4)
+    dead_letters = db_session.query(GenerationDeadLetter).filter(
+        GenerationDeadLetter.company_id.like("throttled_%")
+    ).all()
+    assert len(dead_letters) == 4
+    assert all("ProviderRateLimitError" in dead_letter.error for dead_letter in dead_letters)
+
+
+@pytest.mark.asyncio
+async def test_low_priority_leads_use_the_template_fast_path(db_session: Session, mocker):
+    company_data = CompanyInput(
+        company_name="QuietCorp", employee_count=40, industry="Retail", tech_stack=["Zapier"]
+    )
+    scoring_data = ScoringOutput(
+        company_id="template_company_1",
+        total_score=30,
+        fit_score=30,
+        intent_score=30,
+        confidence=0.5,
+        reasoning={},
+        action="low_priority_monitoring",
+    )
+    mock_api_call = mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+    )
+    mock_log_event = mocker.patch("app.services.event_service.log_email_generated_event")
+
+    # ACT
+    await email_generation_service.generate_and_save_email_content(
+        db_provider=lambda: db_session, company_data=company_data, scoring=scoring_data
+    )
+
+    # ASSERT
+    mock_api_call.assert_not_awaited()
+    mock_log_event.assert_called_once()
+    saved_email = db_session.query(OutboundEmail).filter_by(company_id="template_company_1").one()
+    assert saved_email.variant_name == "problem_focused"
+    assert saved_email.email_subject.startswith("QuietCorp")
+    assert "a 40-person team" in saved_email.email_body
+    assert "Zapier" in saved_email.email_body
+
+
+def test_render_email_fills_every_variant_without_optional_fields():
+    company_data = CompanyInput(company_name="BareCorp")
+
+    for variant_name in email_templates.EMAIL_TEMPLATES:
+        email = email_templates.render_email(variant_name, company_data)
+
+        assert email["variant_name"] == variant_name
+        assert "BareCorp" in email["subject"]
+        assert "$" not in email["body"]
+
+
+def test_uses_template_by_action_or_score_threshold(mocker):
+    scoring_data = ScoringOutput(
+        company_id="tier",
+        total_score=55,
+        fit_score=55,
+        intent_score=55,
+        confidence=0.5,
+        reasoning={},
+        action="medium_priority_outreach",
+    )
+
+    assert not email_templates.uses_template(scoring_data)
+    mocker.patch.object(email_templates, "TEMPLATE_SCORE_THRESHOLD", 60)
+    assert email_templates.uses_template(scoring_data)
+    mocker.patch.object(email_templates, "TEMPLATE_SCORE_THRESHOLD", 0)
+    mocker.patch.object(email_templates, "TEMPLATE_ACTIONS", {"medium_priority_outreach"})
+    assert email_templates.uses_template(scoring_data)
+
+
+
+class _TrackingSessions:
+    """db_provider that counts how many sessions are open at any time."""
+
+    def __init__(self, db_session):
+        self.db_session = db_session
+        self.open = 0
+        self.opened = 0
+
+    @contextmanager
+    def __call__(self):
+        self.open += 1
+        self.opened += 1
+        try:
+            yield self.db_session
+        finally:
+            self.open -= 1
+
+
+@pytest.mark.asyncio
+async def test_generation_holds_no_session_during_the_provider_call(db_session: Session, mocker):
+    sessions = _TrackingSessions(db_session)
+    open_during_call = []
+
+    class RecordingProvider(generation_providers.GenerationProvider):
+        async def generate(self, prompt_text):
+            open_during_call.append(sessions.open)
+            return json.dumps(MOCK_GEMINI_RESPONSE)
+
+    mocker.patch.object(generation_providers, "_provider", RecordingProvider())
+    mocker.patch.object(email_generation_service.gemini_rate_limiter, "rate_per_second", 0)
+
+    # ACT
+    await email_generation_service.generate_and_save_email_content(
+        db_provider=sessions,
+        company_data=CompanyInput(company_name="PoolCorp", employee_count=100),
+        scoring=_batch_scoring("pool_company_1"),
+    )
+
+    # ASSERT
+    assert open_during_call == [0]
+    assert sessions.opened == 2
+    assert db_session.query(OutboundEmail).filter_by(company_id="pool_company_1").count() == 1
+
+
+def test_generated_emails_are_bulk_inserted_through_the_queue():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    queue = WriteBehindQueue(sessionmaker(bind=engine), max_batch_size=100, max_delay_seconds=60)
+    generated = [
+        (CompanyInput(company_name=f"Queued {i}"), _batch_scoring(f"queued_{i}"), dict(MOCK_GEMINI_RESPONSE, subject=f"S{i}"))
+        for i in range(4)
+    ]
+    db = MagicMock()
+
+    queue.start()
+    try:
+        with patch.object(email_generation_service, "generated_email_queue", queue):
+            saved = email_generation_service.save_generated_emails(db, generated)
+    finally:
+        queue.stop()
+
+    assert saved == 4
+    db.add_all.assert_not_called()
+    assert queue.written == 8
+    assert queue.flushes == 1
+    with sessionmaker(bind=engine)() as check:
+        assert check.query(OutboundEmail).filter_by(is_sent=False).count() == 4
+        assert check.query(Event).filter_by(event_type="email_generated").count() == 4
+    engine.dispose()
+
+
+
+@pytest.mark.asyncio
+async def test_repeat_generation_refreshes_the_queued_email_without_calling_the_llm(db_session: Session, mocker, no_rate_limit):
+    mock_api_call = mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+        return_value=MagicMock(text=json.dumps(MOCK_GEMINI_RESPONSE)),
+    )
+    company = CompanyInput(company_name="DedupCorp", employee_count=100)
+
+    # ACT
+    for score in (80, 92):
+        await email_generation_service.generate_and_save_email_content(
+            db_provider=lambda: db_session,
+            company_data=company,
+            scoring=_batch_scoring("dedup_company_1").copy(update={"total_score": score}),
+        )
+
+    # ASSERT
+    mock_api_call.assert_awaited_once()
+    emails = db_session.query(OutboundEmail).filter_by(company_id="dedup_company_1").all()
+    assert [(email.dedup_key, email.score) for email in emails] == [("dedup_company_1", 92)]
+
+
+@pytest.mark.asyncio
+async def test_batch_generation_skips_sent_and_repeated_companies(db_session: Session, mocker, no_rate_limit):
+    db_session.add(OutboundEmail(
+        company_id="dedup_sent", dedup_key="dedup_sent", score=50, email_subject="S",
+        email_body="B", variant_name="problem_focused", is_sent=True,
+    ))
+    db_session.commit()
+    provider = mocker.patch.object(
+        generation_providers, "_provider", mocker.Mock(complete=AsyncMock(return_value=Completion("[]")))
+    )
+    company = CompanyInput(company_name="DedupCorp", employee_count=100)
+
+    # ACT
+    summary = await email_generation_service.generate_and_save_email_batch(
+        lambda: db_session,
+        [(company, _batch_scoring("dedup_sent")), (company, _batch_scoring("dedup_sent"))],
+    )
+
+    # ASSERT
+    provider.complete.assert_not_awaited()
+    assert summary["duplicates"] == 2
+    sent = db_session.query(OutboundEmail).filter_by(company_id="dedup_sent").one()
+    assert sent.score == 50
+
+
+def test_dedup_key_can_be_scoped_per_variant(mocker):
+    assert email_dedup_service.dedup_key("c1", "roi_focused") == "c1"
+    mocker.patch.object(email_dedup_service, "EMAIL_DEDUP_PER_VARIANT", True)
+    assert email_dedup_service.dedup_key("c1", "roi_focused") == "c1:roi_focused"
+
+
+def test_upsert_statement_follows_the_database_dialect():
+    statement = email_dedup_service.upsert_statement("postgresql")
+
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert "ON CONFLICT (dedup_key) DO UPDATE" in sql
+    assert "WHERE outbound_emails.is_sent = false" in sql
+    assert not email_dedup_service.upsert_supported("mssql")
+    with pytest.raises(NotImplementedError):
+        email_dedup_service.upsert_statement("mssql")
+
+
+def test_old_database_gets_the_new_outbound_email_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE outbound_emails (id INTEGER PRIMARY KEY, company_id VARCHAR NOT NULL, "
+            "score INTEGER, email_subject TEXT, email_body TEXT, variant_name VARCHAR, is_sent BOOLEAN, "
+            "send_attempts INTEGER, created_at DATETIME, last_attempt_at DATETIME)"
+        ))
+        connection.execute(text(
+            "INSERT INTO outbound_emails (company_id, score, is_sent, send_attempts) "
+            "VALUES ('old', 90, 0, 0), ('old', 80, 0, 0), ('other', 70, 1, 1)"
+        ))
+
+    added = add_missing_columns(engine, Base.metadata)
+    Base.metadata.create_all(bind=engine)
+
+    assert {"outbound_emails.dedup_key", "outbound_emails.claimed_by", "outbound_emails.recipient_domain"} <= set(added)
+    assert add_missing_columns(engine, Base.metadata) == []
+    assert email_dedup_service.backfill_dedup_keys(engine) == 2
+    with sessionmaker(bind=engine)() as db:
+        keys = [email.dedup_key for email in db.query(OutboundEmail).order_by(OutboundEmail.id)]
+        claimed = email_sending_service.claim_emails(db, "upgraded", 5)
+    assert keys == ["old", None, "other"]
+    assert [email.score for email in claimed] == [90, 80]
+
+
+@pytest.mark.parametrize("write_behind", [True, False])
+def test_queued_and_direct_saves_refresh_unsent_rows_and_keep_sent_ones(write_behind):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([
+            OutboundEmail(company_id="unsent", dedup_key="unsent", score=10, email_subject="old",
+                          email_body="old", variant_name="problem_focused", is_sent=False),
+            OutboundEmail(company_id="sent", dedup_key="sent", score=10, email_subject="old",
+                          email_body="old", variant_name="problem_focused", is_sent=True),
+        ])
+        db.commit()
+    queue = WriteBehindQueue(
+        sessionmaker(bind=engine), max_batch_size=100, max_delay_seconds=60,
+        insert_statements={OutboundEmail: email_dedup_service.upsert_statement},
+    )
+    generated = [
+        (CompanyInput(company_name=company_id), _batch_scoring(company_id), dict(MOCK_GEMINI_RESPONSE, subject="new"))
+        for company_id in ("unsent", "sent")
+    ]
+
+    queue.start()
+    try:
+        with patch.object(email_generation_service, "generated_email_queue", queue), \
+                sessionmaker(bind=engine)() as db:
+            saved = email_generation_service.save_generated_emails(db, generated, write_behind)
+    finally:
+        queue.stop()
+
+    with sessionmaker(bind=engine)() as check:
+        rows = {email.company_id: (email.score, email.email_subject) for email in check.query(OutboundEmail)}
+        events = [event.company_id for event in check.query(Event).filter_by(event_type="email_generated")]
+    assert rows == {"unsent": (80, "new"), "sent": (10, "old")}
+    # Both paths skip the sent email, event included.
+    assert saved == 1
+    assert events == ["unsent"]
+    engine.dispose()
+
+
+@pytest.fixture
+def fresh_circuit_breaker(mocker):
+    breaker = CircuitBreaker(failure_threshold=5, recovery_timeout_seconds=60)
+    mocker.patch.object(email_generation_service, "generation_circuit_breaker", breaker)
+    mocker.patch.object(email_generation_service, "GENERATION_RETRY_BASE_DELAY_SECONDS", 0)
+    mocker.patch.object(email_generation_service.gemini_rate_limiter, "rate_per_second", 0)
+    return breaker
+
+
+@pytest.mark.asyncio
+async def test_cancelled_generation_frees_the_half_open_trial(mocker, fresh_circuit_breaker):
+    provider = MagicMock()
+    provider.complete = AsyncMock(side_effect=asyncio.CancelledError())
+    mocker.patch.object(email_generation_service.generation_providers, "get_provider", return_value=provider)
+    fresh_circuit_breaker._state = CircuitBreaker.HALF_OPEN
+
+    with pytest.raises(asyncio.CancelledError):
+        await email_generation_service._generate_with_limits("prompt")
+
+    fresh_circuit_breaker.before_call()
+    assert fresh_circuit_breaker.rejected == 0
+
+
+@pytest.mark.asyncio
+async def test_exhausted_generation_is_retried_then_dead_lettered(db_session: Session, mocker, fresh_circuit_breaker):
+    mock_api_call = mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+    )
+    mock_api_call.return_value.text = "not json"
+
+    # ACT
+    await email_generation_service.generate_and_save_email_content(
+        db_provider=lambda: db_session,
+        company_data=CompanyInput(company_name="FlakyCorp", employee_count=100),
+        scoring=_batch_scoring("dead_letter_1"),
+    )
+
+    # ASSERT
+    assert mock_api_call.await_count == email_generation_service.GENERATION_MAX_ATTEMPTS
+    assert db_session.query(OutboundEmail).filter_by(company_id="dead_letter_1").count() == 0
+    dead_letter = db_session.query(GenerationDeadLetter).filter_by(company_id="dead_letter_1").one()
+    assert dead_letter.attempts == email_generation_service.GENERATION_MAX_ATTEMPTS
+    assert dead_letter.company_data["company_name"] == "FlakyCorp"
+    assert "JSONDecodeError" in dead_letter.error
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_without_calling_the_provider(db_session: Session, mocker, fresh_circuit_breaker):
+    mock_api_call = mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+        side_effect=google_exceptions.ServiceUnavailable("down"),
+    )
+    for i in range(2):
+        await email_generation_service.generate_and_save_email_content(
+            db_provider=lambda: db_session,
+            company_data=CompanyInput(company_name=f"Outage Corp {i}", employee_count=100),
+            scoring=_batch_scoring(f"outage_{i}"),
+        )
+    calls_before_open = mock_api_call.await_count
+
+    # ACT
+    await email_generation_service.generate_and_save_email_content(
+        db_provider=lambda: db_session,
+        company_data=CompanyInput(company_name="Late Corp", employee_count=100),
+        scoring=_batch_scoring("outage_late"),
+    )
+
+    # ASSERT
+    assert calls_before_open == 5
+    assert fresh_circuit_breaker.state == CircuitBreaker.OPEN
+    assert mock_api_call.await_count == calls_before_open
+    late = db_session.query(GenerationDeadLetter).filter_by(company_id="outage_late").one()
+    assert late.attempts == 1
+    assert "CircuitOpenError" in late.error
+
+
+@pytest.mark.asyncio
+async def test_replay_dead_letters_regenerates_them_in_bulk(db_session: Session, mocker, fresh_circuit_breaker):
+    for i in range(3):
+        dead_letter_service.record_failed_generation(
+            db_session,
+            CompanyInput(company_name=f"Replay Corp {i}", employee_count=100, tech_stack=["Zapier"]),
+            _batch_scoring(f"replay_{i}"),
+            "TimeoutError()",
+            3,
+        )
+    mock_api_call = mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+    )
+    mock_api_call.return_value.text = json.dumps([
+        {"ref": f"replay_{i}", "variant_name": "problem_focused", "subject": f"S{i}", "body": "B"}
+        for i in range(3)
+    ])
+
+    # ACT
+    replayed = await email_generation_service.replay_dead_letters(lambda: db_session, limit=10)
+
+    # ASSERT
+    assert replayed == 3
+    mock_api_call.assert_awaited_once()
+    assert dead_letter_service.count_dead_letters(db_session) == 0
+    assert db_session.query(OutboundEmail).filter(OutboundEmail.company_id.like("replay_%")).count() == 3
+
+
+@pytest.mark.asyncio
+async def test_replay_keeps_dead_letters_until_it_completes(db_session: Session, mocker):
+    dead_letter_service.record_failed_generation(
+        db_session, CompanyInput(company_name="Crash Corp", employee_count=100), _batch_scoring("crash"), "E", 3
+    )
+    mocker.patch(
+        "app.services.email_generation_service.generate_and_save_email_batch",
+        new_callable=AsyncMock,
+        side_effect=RuntimeError("worker died"),
+    )
+
+    with pytest.raises(RuntimeError):
+        await email_generation_service.replay_dead_letters(lambda: db_session, limit=10)
+
+    assert dead_letter_service.count_dead_letters(db_session) == 1
+    # Held by the failed replay until its lease expires, then replayed again.
+    assert dead_letter_service.lease_dead_letters(db_session, 10) == ([], [])
+    mocker.patch.object(
+        dead_letter_service,
+        "_utcnow",
+        return_value=datetime.utcnow() + timedelta(seconds=dead_letter_service.GENERATION_REPLAY_LEASE_SECONDS + 1),
+    )
+    _, leads = dead_letter_service.lease_dead_letters(db_session, 10)
+    assert [scoring.company_id for _, scoring in leads] == ["crash"]
+
+
+@pytest.mark.asyncio
+async def test_leads_without_a_variant_are_dead_lettered(db_session: Session, mocker):
+    mocker.patch(
+        "app.services.email_generation_service.determine_email_variant",
+        side_effect=TypeError("'>=' not supported"),
+    )
+
+    summary = await email_generation_service.generate_and_save_email_batch(
+        lambda: db_session, [(CompanyInput(company_name="Odd Corp"), _batch_scoring("odd"))]
+    )
+
+    assert summary["skipped"] == 1
+    dead_letter = db_session.query(GenerationDeadLetter).filter_by(company_id="odd").one()
+    assert "TypeError" in dead_letter.error
+
+
 def test_send_prioritized_emails_sends_in_order(db_session: Session):
     db_session.add(
         OutboundEmail(company_id="C001", score=70, is_sent=False, send_attempts=0)
@@ -107,6 +738,88 @@ def test_send_emails_when_queue_is_empty(db_session: Session):
         )
 
 
+def test_claimed_emails_are_leased_to_one_worker_at_a_time(db_session: Session):
+    for i in range(4):
+        db_session.add(OutboundEmail(company_id=f"lease_{i}", score=90 - i, is_sent=False, send_attempts=0))
+    db_session.commit()
+
+    first = email_sending_service.claim_emails(db_session, "worker-a", 3)
+    second = email_sending_service.claim_emails(db_session, "worker-b", 3)
+
+    assert [email.company_id for email in first] == ["lease_0", "lease_1", "lease_2"]
+    assert [email.company_id for email in second] == ["lease_3"]
+    assert email_sending_service.queue_stats(db_session) == {"unsent": 4, "leased": 4, "failed": 0}
+
+
+def test_expired_leases_are_reclaimed_and_the_old_holder_cannot_mark_them_sent(db_session: Session):
+    db_session.add(OutboundEmail(company_id="lease_expired", score=80, is_sent=False, send_attempts=0))
+    db_session.commit()
+    stale = email_sending_service.claim_emails(db_session, "worker-a", 1, lease_seconds=-1)
+
+    reclaimed = email_sending_service.claim_emails(db_session, "worker-b", 1)
+
+    assert [email.id for email in reclaimed] == [stale[0].id]
+    assert email_sending_service.mark_sent(db_session, "worker-a", [stale[0].id]) == 0
+    assert email_sending_service.mark_sent(db_session, "worker-b", [stale[0].id]) == 1
+    email = db_session.query(OutboundEmail).filter_by(company_id="lease_expired").one()
+    assert (email.is_sent, email.send_attempts, email.claimed_by) == (True, 1, None)
+    assert email.last_attempt_at is not None
+
+
+def test_send_spreads_across_domains_in_score_order(db_session: Session, mocker):
+    throttle = DomainThrottle(rate_per_minute=60, burst=2)
+    mocker.patch.object(email_sending_service, "domain_throttle", throttle)
+    for i in range(4):
+        db_session.add(OutboundEmail(
+            company_id=f"big_{i}", recipient=f"lead{i}@big.com", recipient_domain="big.com",
+            score=90 - i, is_sent=False, send_attempts=0,
+        ))
+    db_session.add(OutboundEmail(
+        company_id="small", recipient="lead@small.com", recipient_domain="small.com",
+        score=50, is_sent=False, send_attempts=0,
+    ))
+    db_session.commit()
+
+    sent = email_sending_service.send_prioritized_emails(db_session, limit=4, worker_id="domain-worker")
+
+    assert sent == 3
+    sent_ids = {email.company_id for email in db_session.query(OutboundEmail).filter_by(is_sent=True)}
+    assert sent_ids == {"big_0", "big_1", "small"}
+    deferred = db_session.query(OutboundEmail).filter_by(company_id="big_2").one()
+    assert (deferred.claimed_by, deferred.send_attempts) == (None, 0)
+    assert throttle.saturated_domains() == ["big.com"]
+    # Saturated domains are left in the queue instead of being claimed again.
+    assert email_sending_service.claim_emails(
+        db_session, "domain-worker", 5, exclude_domains=throttle.saturated_domains()
+    ) == []
+
+
+def test_parallel_sender_workers_never_send_an_email_twice(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'send.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    sessions = sessionmaker(bind=engine)
+    with sessions() as db:
+        db.add_all(
+            OutboundEmail(company_id=f"parallel_{i}", score=i % 100, is_sent=False, send_attempts=0)
+            for i in range(120)
+        )
+        db.commit()
+
+    def drain(worker):
+        with sessions() as db:
+            while email_sending_service.send_prioritized_emails(
+                db, limit=7, worker_id=f"worker-{worker}"
+            ):
+                pass
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(drain, range(4)))
+
+    with sessions() as check:
+        attempts = [email.send_attempts for email in check.query(OutboundEmail)]
+    assert attempts == [1] * 120
+    engine.dispose()
+
 @pytest.fixture
 def mock_db_session():
     return MagicMock()
@@ -143,6 +856,45 @@ def test_log_score_calculated_event(mock_db_session):
     assert added_event.event_data["company_name"] == "Test Corp"
 
 
+def test_log_score_calculated_events_bulk_inserts_in_chunks(db_session: Session, mocker):
+    scored_companies = [
+        (
+            ScoringOutput(
+                company_id=f"bulk-{i}",
+                fit_score=50,
+                intent_score=50,
+                total_score=50 + i,
+                confidence=0.5,
+                reasoning={},
+                action="low_priority_monitoring",
+            ),
+            CompanyInput(company_name=f"Bulk Corp {i}"),
+        )
+        for i in range(5)
+    ]
+    execute_spy = mocker.spy(db_session, "execute")
+    commit_spy = mocker.spy(db_session, "commit")
+
+    # ACT
+    written = event_service.log_score_calculated_events(
+        db_session, scored_companies, "balanced", chunk_size=2
+    )
+
+    # ASSERT
+    assert written == 5
+    assert execute_spy.call_count == 3
+    assert commit_spy.call_count == 1
+    events = (
+        db_session.query(Event)
+        .filter(Event.company_id.like("bulk-%"))
+        .order_by(Event.company_id)
+        .all()
+    )
+    assert [event.event_data["score"] for event in events] == [50, 51, 52, 53, 54]
+    assert events[0].event_data["company_name"] == "Bulk Corp 0"
+    assert events[0].timestamp is not None
+
+
 def test_log_email_generated_event(mock_db_session):
     email_record = OutboundEmail(company_id="comp-456")
 
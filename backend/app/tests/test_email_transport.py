@@ -0,0 +1,128 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models.event_model import OutboundEmail
+from app.models.schemas import CompanyInput
+from app.services import email_sending_service, email_transport
+from app.services.email_transport import OutgoingEmail, SMTPTransport
+from app.services.smtp_sink import SMTPSink
+
+
+@pytest.fixture
+def sink():
+    with SMTPSink(reject_domains=["bounce.example"]) as running_sink:
+        yield running_sink
+
+
+@pytest.fixture
+def transport(sink):
+    smtp = SMTPTransport(host=sink.host, port=sink.port, pool_size=3, timeout=5)
+    yield smtp
+    smtp.close()
+
+
+def test_pooled_transport_reuses_connections_and_pipelines(sink, transport):
+    emails = [
+        OutgoingEmail(i, f"lead{i}@acme.example", f"Subject {i}", ".leading dot\nsecond line")
+        for i in range(30)
+    ]
+
+    results = transport.send_many(emails)
+
+    assert [result.email_id for result in results] == list(range(30))
+    assert all(result.ok and result.code == 250 for result in results)
+    assert sink.received == 30
+    assert sink.connections == 3
+    assert all(connection.pipelining for connection in transport._connections)
+    sender, recipients, data = sink.messages[0]
+    assert sender == email_transport.EMAIL_FROM_ADDRESS
+    assert recipients[0].endswith("@acme.example")
+    assert b"\r\n.leading dot\r\n" in data
+
+
+def test_refused_recipients_fail_alone_and_dropped_connections_reopen(sink, transport):
+    transport.start()
+    transport._run(transport._close_pool())
+
+    results = transport.send_many([
+        OutgoingEmail(1, "someone@bounce.example", "S", "B"),
+        OutgoingEmail(2, "someone@acme.example", "S", "B"),
+        OutgoingEmail(3, None, "S", "B"),
+    ])
+
+    assert [(result.ok, result.code) for result in results] == [(False, 550), (True, 250), (False, None)]
+    assert sink.received == 1
+    assert sink.connections > 3
+    assert transport.stats()["failed"] == 2
+
+
+def test_header_injection_fails_alone_and_keeps_the_batch_results(sink, transport):
+    results = transport.send_many([
+        OutgoingEmail(1, "cto@acme.example", "Hello\r\nBcc: victim@evil.example", "B"),
+        OutgoingEmail(2, "cto@acme.example\r\nRCPT TO:<victim@evil.example>", "S", "B"),
+        OutgoingEmail(3, "ceo@acme.example", "Plain", "B"),
+    ])
+
+    assert [(result.email_id, result.ok) for result in results] == [(1, True), (2, False), (3, True)]
+    assert "line break" in results[1].error
+    assert sink.received == 2
+    assert all(recipients == [f"{name}@acme.example"] for name, (_, recipients, _) in zip(["cto", "ceo"], sink.messages))
+    assert b"Subject: Hello Bcc: victim@evil.example\r\n" in sink.messages[0][2]
+    assert not any(b"\r\nBcc:" in data for _, _, data in sink.messages)
+
+
+def test_send_results_are_written_back_per_email(db_session: Session, sink, transport, mocker):
+    mocker.patch.object(email_transport, "_transport", transport)
+    db_session.add_all([
+        OutboundEmail(company_id="smtp_ok", recipient="cto@acme.example", score=90, is_sent=False, send_attempts=0),
+        OutboundEmail(company_id="smtp_bounce", recipient="cto@bounce.example", score=80, is_sent=False, send_attempts=0),
+    ])
+    db_session.commit()
+
+    sent = email_sending_service.send_prioritized_emails(db_session, worker_id="smtp-worker")
+
+    assert sent == 1
+    delivered = db_session.query(OutboundEmail).filter_by(company_id="smtp_ok").one()
+    bounced = db_session.query(OutboundEmail).filter_by(company_id="smtp_bounce").one()
+    assert (delivered.is_sent, delivered.send_attempts, delivered.last_send_error) == (True, 1, None)
+    assert (bounced.is_sent, bounced.send_attempts, bounced.claimed_by) == (False, 1, None)
+    assert bounced.last_send_error.startswith("550")
+    assert bounced.last_attempt_at is not None
+    # Not claimable again until the retry delay has passed.
+    assert email_sending_service.claim_emails(db_session, "smtp-worker", 5) == []
+
+
+def test_emails_without_a_recipient_fail_once_and_are_not_retried(db_session: Session, transport, mocker):
+    mocker.patch.object(email_transport, "_transport", transport)
+    mocker.patch.object(email_sending_service, "EMAIL_SEND_RETRY_DELAY_SECONDS", 0)
+    db_session.add(OutboundEmail(company_id="no_recipient", recipient=None, score=90, is_sent=False, send_attempts=0))
+    db_session.commit()
+
+    assert email_sending_service.send_prioritized_emails(db_session, worker_id="smtp-worker") == 0
+
+    email = db_session.query(OutboundEmail).filter_by(company_id="no_recipient").one()
+    assert (email.is_sent, email.last_send_error) == (False, "No recipient address.")
+    assert email.send_attempts == email_sending_service.EMAIL_SEND_MAX_ATTEMPTS
+    assert email_sending_service.claim_emails(db_session, "smtp-worker", 5) == []
+    assert email_sending_service.queue_stats(db_session)["failed"] == 1
+
+
+def test_recipient_for_prefers_contact_then_domain():
+    assert email_sending_service.recipient_for(
+        CompanyInput(company_name="Acme", contact_email="ceo@acme.io", domain="acme.com")
+    ) == "ceo@acme.io"
+    assert email_sending_service.recipient_for(CompanyInput(company_name="Acme", domain="acme.com")) == "hello@acme.com"
+    assert email_sending_service.recipient_for(
+        CompanyInput(company_name="Acme", contact_email="ceo@acme.io\r\nBcc: x@evil.example", domain="acme.com")
+    ) == "hello@acme.com"
+    # No usable address: the company name is not turned into a made-up domain.
+    assert email_sending_service.recipient_for(CompanyInput(company_name="Acme Labs, Inc.")) is None
+    assert email_sending_service.recipient_for(
+        CompanyInput(company_name="Acme", contact_email="ceo@acme.io\nx", domain="acme.com\r\n.evil")
+    ) is None
+
+
+def test_recipient_domain_is_lowercased_and_optional():
+    assert email_sending_service.recipient_domain("CTO@Acme.IO") == "acme.io"
+    assert email_sending_service.recipient_domain(None) is None
+    assert email_sending_service.recipient_domain("no-domain@") is None
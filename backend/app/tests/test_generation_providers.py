@@ -0,0 +1,212 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import google.ai.generativelanguage as glm
+import pytest
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import client as genai_client
+
+from app.models.schemas import CompanyInput, ScoringOutput
+from app.services import email_generation_service, generation_providers
+from app.services.generation_providers import (
+    GeminiProvider,
+    ProviderError,
+    ProviderRateLimitError,
+    SDKCompatibilityError,
+    StubProvider,
+)
+from app.services.prompt_builder import TokenUsage
+
+
+async def _no_sleep(seconds):
+    pass
+
+
+def _stub(**kwargs):
+    return StubProvider(sleep=_no_sleep, **kwargs)
+
+
+def test_stub_latencies_are_deterministic_per_seed():
+    def sample(seed):
+        provider = _stub(latency_ms=100, seed=seed)
+        return [provider.sample_latency_ms() for _ in range(5)]
+
+    assert sample(1) == sample(1)
+    assert sample(1) != sample(2)
+    assert _stub(latency_ms=100, distribution="fixed").sample_latency_ms() == 100
+    uniform = _stub(latency_ms=100, distribution="uniform", spread=0.2)
+    assert all(80 <= uniform.sample_latency_ms() <= 120 for _ in range(100))
+
+
+def test_stub_rejects_unknown_distribution():
+    with pytest.raises(ValueError):
+        StubProvider(distribution="bimodal")
+
+
+@pytest.mark.asyncio
+async def test_stub_simulates_errors_and_rate_limits_at_configured_rates():
+    provider = _stub(error_rate=0.2, rate_limit_rate=0.1, seed=7)
+    outcomes = {"ok": 0, "error": 0, "rate_limited": 0}
+
+    for _ in range(1000):
+        try:
+            await provider.generate('"variant_name": "roi_focused"')
+            outcomes["ok"] += 1
+        except ProviderRateLimitError:
+            outcomes["rate_limited"] += 1
+        except ProviderError:
+            outcomes["error"] += 1
+
+    assert provider.stats()["calls"] == 1000
+    assert outcomes["rate_limited"] == provider.rate_limited
+    assert 60 <= outcomes["rate_limited"] <= 140
+    assert 150 <= outcomes["error"] <= 250
+
+
+@pytest.mark.asyncio
+async def test_stub_answers_single_and_batched_prompts(db_session, mocker):
+    mocker.patch.object(email_generation_service.gemini_rate_limiter, "rate_per_second", 0)
+    mocker.patch.object(generation_providers, "_provider", _stub())
+    scored_companies = [
+        (
+            CompanyInput(company_name=f"Stub Corp {i}", employee_count=200),
+            ScoringOutput(
+                company_id=f"stub_{i}",
+                fit_score=80,
+                intent_score=80,
+                total_score=80,
+                confidence=0.9,
+                reasoning={},
+                action="high_priority_outreach",
+            ),
+        )
+        for i in range(3)
+    ]
+
+    summary = await email_generation_service.generate_and_save_email_batch(
+        lambda: db_session, scored_companies, batch_size=2
+    )
+    single = json.loads(await generation_providers.get_provider().generate(
+        'Company Name: Solo Corp\n "variant_name": "roi_focused"'
+    ))
+
+    assert summary == {"duplicates": 0, "templated": 0, "cached": 0, "batched": 3, "fallback": 0, "dead_lettered": 0, "skipped": 0}
+    assert generation_providers.get_provider().calls == 3
+    assert single["variant_name"] == "roi_focused"
+    assert "Solo Corp" in single["subject"]
+
+
+@pytest.mark.asyncio
+async def test_gemini_throttling_is_reported_as_provider_rate_limit(mocker):
+    mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+        side_effect=google_exceptions.ResourceExhausted("quota"),
+    )
+
+    with pytest.raises(ProviderRateLimitError):
+        await GeminiProvider(api_key="test-key").generate("prompt")
+
+
+@pytest.mark.asyncio
+async def test_reported_token_counts_replace_the_estimate(mocker):
+    usage = MagicMock(prompt_token_count=321, candidates_token_count=54)
+    mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        new_callable=AsyncMock,
+        side_effect=[MagicMock(text="{}", usage_metadata=usage), MagicMock(text="{}", usage_metadata=None)],
+    )
+    mocker.patch.object(generation_providers, "_provider", GeminiProvider(api_key="test-key"))
+    mocker.patch.object(email_generation_service.gemini_rate_limiter, "rate_per_second", 0)
+    token_usage = mocker.patch.object(email_generation_service, "generation_token_usage", TokenUsage())
+
+    await email_generation_service._generate_with_limits("prompt " * 100)
+    await email_generation_service._generate_with_limits("prompt " * 100)
+
+    assert [call[:2] for call in token_usage.recent] == [(321, 54), (175, 1)]
+    assert token_usage.stats()["estimated_calls"] == 1
+
+
+def test_gemini_requires_an_api_key(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+
+    with pytest.raises(RuntimeError, match="GEMINI_API_KEY"):
+        GeminiProvider()
+
+
+def test_create_provider_rejects_unknown_names():
+    assert isinstance(generation_providers.create_provider("stub"), StubProvider)
+    with pytest.raises(ValueError):
+        generation_providers.create_provider("openai")
+
+
+@pytest.mark.asyncio
+async def test_gemini_pool_shim_matches_the_installed_sdk():
+    # No mocks: fails as soon as a google-generativeai upgrade moves the internals.
+    provider = GeminiProvider(api_key="test-key", pool_size=2)
+    models = [provider.next_model(), provider.next_model()]
+
+    clients = [model._async_client for model in models]
+    assert all(isinstance(c, glm.GenerativeServiceAsyncClient) for c in clients)
+    assert clients[0] is not clients[1]
+    assert clients[0] is not genai_client.get_default_generative_async_client()
+    await provider.close()
+
+
+def test_gemini_pool_shim_fails_loudly_when_the_sdk_changes(mocker):
+    provider = GeminiProvider(api_key="test-key")
+    mocker.patch.object(generation_providers.genai_client, "_client_manager", None)
+
+    with pytest.raises(SDKCompatibilityError, match="make_client"):
+        provider.create_model()
+    with pytest.raises(SDKCompatibilityError, match="_async_client"):
+        generation_providers.bind_async_client(object(), MagicMock())
+
+
+@pytest.fixture
+def fake_clients(mocker):
+    clients = []
+
+    def make_client(name):
+        async_client = mocker.MagicMock()
+        async_client.transport.close = AsyncMock()
+        clients.append(async_client)
+        return async_client
+
+    mocker.patch.object(generation_providers.genai_client._client_manager, "make_client", side_effect=make_client)
+    return clients
+
+
+@pytest.mark.asyncio
+async def test_gemini_pool_is_warmed_once_and_shared_round_robin(mocker, fake_clients):
+    mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.count_tokens_async",
+        new_callable=AsyncMock,
+        side_effect=[MagicMock(), google_exceptions.ServiceUnavailable("cold")],
+    )
+    generate = mocker.patch(
+        "app.services.generation_providers.genai.GenerativeModel.generate_content_async",
+        autospec=True,
+        return_value=MagicMock(text="{}"),
+    )
+    provider = GeminiProvider(api_key="test-key", pool_size=2)
+
+    await provider.start()
+    for _ in range(4):
+        await provider.generate("prompt")
+
+    assert len(fake_clients) == 2
+    assert provider.stats() == {"client_pool_size": 2, "open_clients": 2, "warmed": 1}
+    used = [call.args[0]._async_client for call in generate.await_args_list]
+    assert used == [fake_clients[0], fake_clients[1], fake_clients[0], fake_clients[1]]
+
+
+@pytest.mark.asyncio
+async def test_gemini_pool_closes_every_client(mocker, fake_clients):
+    provider = GeminiProvider(api_key="test-key", pool_size=3)
+    provider.next_model()
+
+    await provider.close()
+
+    assert all(c.transport.close.await_count == 1 for c in fake_clients)
+    assert provider.stats()["open_clients"] == 0
@@ -0,0 +1,155 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models.event_model import GenerationDeadLetter, GenerationJob, OutboundEmail
+from app.models.schemas import CompanyInput, ScoringOutput
+from app.services import email_generation_service, generation_queue_service
+from app.services.generation_worker import GenerationWorkerPool
+
+
+def _enqueue(db: Session, name: str, score: int) -> Optional[GenerationJob]:
+    return generation_queue_service.enqueue_generation(
+        db,
+        CompanyInput(company_name=name, employee_count=100),
+        ScoringOutput(
+            company_id=f"id-{name}",
+            fit_score=score,
+            intent_score=score,
+            total_score=score,
+            confidence=1.0,
+            reasoning={},
+            action="high_priority_outreach",
+        ),
+    )
+
+
+def test_claim_jobs_returns_highest_scores_first_and_never_twice(db_session: Session):
+    for name, score in [("Low", 20), ("Top", 95), ("Mid", 60), ("High", 80)]:
+        _enqueue(db_session, name, score)
+
+    first = generation_queue_service.claim_jobs(db_session, 2)
+    second = generation_queue_service.claim_jobs(db_session, 5)
+
+    assert [job.company_id for job in first] == ["id-Top", "id-High"]
+    assert [job.company_id for job in second] == ["id-Mid", "id-Low"]
+    assert generation_queue_service.claim_jobs(db_session, 5) == []
+    assert generation_queue_service.queue_depth(db_session) == {"queued": 0, "running": 4}
+
+
+def test_only_timed_out_running_jobs_are_requeued(db_session: Session):
+    _enqueue(db_session, "Orphan", 50)
+    _enqueue(db_session, "Live", 40)
+    [orphan, live] = generation_queue_service.claim_jobs(db_session, 2)
+    orphan.claimed_at = datetime.utcnow() - timedelta(
+        seconds=generation_queue_service.GENERATION_JOB_TIMEOUT_SECONDS + 1
+    )
+    db_session.commit()
+
+    assert generation_queue_service.requeue_stale_jobs(db_session) == 1
+    assert db_session.get(GenerationJob, live.id).status == "running"
+    assert [job.company_id for job in generation_queue_service.claim_jobs(db_session, 1)] == ["id-Orphan"]
+
+
+def test_enqueue_refreshes_a_pending_job_instead_of_adding_another(db_session: Session):
+    first = _enqueue(db_session, "Repeat", 40)
+    second = _enqueue(db_session, "Repeat", 90)
+
+    assert second.id == first.id
+    assert db_session.query(GenerationJob).filter_by(company_id="id-Repeat").one().priority == 90
+
+
+def test_enqueue_skips_companies_that_already_have_an_email(db_session: Session):
+    db_session.add(OutboundEmail(
+        company_id="id-Emailed", dedup_key="id-Emailed", score=30, email_subject="S",
+        email_body="B", variant_name="problem_focused", is_sent=False,
+    ))
+    db_session.commit()
+
+    assert _enqueue(db_session, "Emailed", 75) is None
+    assert db_session.query(GenerationJob).filter_by(company_id="id-Emailed").count() == 0
+    assert db_session.query(OutboundEmail).filter_by(company_id="id-Emailed").one().score == 75
+
+
+@pytest.mark.asyncio
+async def test_worker_generates_claimed_jobs_in_priority_order_and_removes_them(db_session: Session, mocker):
+    for name, score in [("A", 10), ("B", 90), ("C", 50)]:
+        _enqueue(db_session, name, score)
+    generate = mocker.patch(
+        "app.services.generation_worker.email_generation_service.generate_and_save_email_batch",
+        new_callable=AsyncMock,
+    )
+    pool = GenerationWorkerPool(lambda: db_session, workers=1, claim_size=2)
+
+    assert await pool.run_once() == 2
+    assert await pool.run_once() == 1
+    assert await pool.run_once() == 0
+
+    batches = [[scoring.company_id for _, scoring in call.args[1]] for call in generate.await_args_list]
+    assert batches == [["id-B", "id-C"], ["id-A"]]
+    assert db_session.query(GenerationJob).count() == 0
+    assert pool.stats()["processed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_worker_commits_emails_before_removing_their_jobs(db_session: Session, mocker):
+    generation_queue_service.enqueue_generation(
+        db_session,
+        CompanyInput(company_name="Durable", employee_count=100),
+        ScoringOutput(
+            company_id="id-Durable", fit_score=20, intent_score=20, total_score=20,
+            confidence=1.0, reasoning={}, action="low_priority_monitoring",
+        ),
+    )
+    # A running write-behind queue must be bypassed: its rows would die with the process.
+    queue = mocker.patch.object(email_generation_service, "generated_email_queue")
+    queue.running = True
+    pool = GenerationWorkerPool(lambda: db_session, workers=1)
+
+    assert await pool.run_once() == 1
+
+    queue.enqueue_many.assert_not_called()
+    assert db_session.query(OutboundEmail).filter_by(company_id="id-Durable").count() == 1
+    assert db_session.query(GenerationJob).count() == 0
+
+
+@pytest.mark.asyncio
+async def test_worker_dead_letters_a_batch_that_raises(db_session: Session, mocker):
+    _enqueue(db_session, "Broken", 70)
+    mocker.patch(
+        "app.services.generation_worker.email_generation_service.generate_and_save_email_batch",
+        new_callable=AsyncMock,
+        side_effect=RuntimeError("boom"),
+    )
+    pool = GenerationWorkerPool(lambda: db_session, workers=1)
+
+    assert await pool.run_once() == 1
+    assert db_session.query(GenerationJob).count() == 0
+    assert db_session.query(GenerationDeadLetter).filter_by(company_id="id-Broken").count() == 1
+
+
+@pytest.mark.asyncio
+async def test_notify_wakes_idle_workers(db_session: Session, mocker):
+    generate = mocker.patch(
+        "app.services.generation_worker.email_generation_service.generate_and_save_email_batch",
+        new_callable=AsyncMock,
+    )
+    pool = GenerationWorkerPool(lambda: db_session, workers=2, poll_seconds=60)
+    pool.start()
+    try:
+        await asyncio.sleep(0.01)
+        _enqueue(db_session, "Late", 40)
+        pool.notify()
+        for _ in range(100):
+            if generate.await_count:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await pool.stop()
+
+    generate.assert_awaited_once()
+    assert not pool.running
@@ -0,0 +1,57 @@
+import io
+import json
+
+import pytest
+
+from app.services import ingestion_service
+
+COMPANIES = [
+    {"company_name": f"Streamed Co {i}", "employee_count": i, "tech_stack": ["Zapier"]}
+    for i in range(1, 8)
+]
+
+
+def test_iter_json_array_across_read_boundaries():
+    payload = "  " + json.dumps(COMPANIES, indent=2) + "\n"
+
+    records = list(ingestion_service.iter_json_array(io.StringIO(payload), read_size=7))
+
+    assert records == COMPANIES
+
+
+def test_iter_json_array_handles_empty_list():
+    assert list(ingestion_service.iter_json_array(io.StringIO(" [ ] "))) == []
+
+
+@pytest.mark.parametrize(
+    "payload",
+    ['{"company_name": "Not a list"}', '[{"company_name": "A"},]', '[{"company_name": "A"}', "[1 2]"],
+)
+def test_iter_json_array_rejects_malformed_input(payload):
+    with pytest.raises(ValueError):
+        list(ingestion_service.iter_json_array(io.StringIO(payload), read_size=4))
+
+
+def test_iter_ndjson_skips_blank_lines_and_reports_bad_line():
+    lines = "\n".join(json.dumps(company) for company in COMPANIES[:2])
+
+    assert list(ingestion_service.iter_ndjson(io.StringIO(lines + "\n\n"))) == COMPANIES[:2]
+
+    with pytest.raises(ValueError, match="line 3"):
+        list(ingestion_service.iter_ndjson(io.StringIO(lines + "\n{broken\n")))
+
+
+def test_iter_company_chunks_uses_fixed_chunk_size(tmp_path):
+    path = tmp_path / "companies.ndjson"
+    path.write_text("\n".join(json.dumps(company) for company in COMPANIES))
+
+    chunks = list(ingestion_service.iter_company_chunks(str(path), "ndjson", chunk_size=3))
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [record for chunk in chunks for record in chunk] == COMPANIES
+
+
+def test_detect_file_format():
+    assert ingestion_service.detect_file_format("leads.JSON") == "json"
+    assert ingestion_service.detect_file_format("leads.jsonl") == "ndjson"
+    assert ingestion_service.detect_file_format("leads.csv") is None
@@ -1,16 +1,24 @@
-﻿from fastapi.testclient import TestClient
+﻿import json
+import os
+
+from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from app.models.event_model import Event
+from app.models.event_model import Event, BatchJob, GenerationJob
 from app.models.schemas import ScoringOutput, CompanyInput
-from app.services import email_generation_service
+from app.services import (
+    dead_letter_service,
+    email_generation_service,
+    generation_queue_service,
+    scoring_service,
+)
 
 
-def test_score_company_endpoint_and_background_task(client: TestClient, mocker):
+def test_score_company_endpoint_and_background_task(client: TestClient, db_session: Session, mocker):
     """
     Tests that the /api/score-company endpoint in main.py:
     1. Returns a successful response.
-    2. Correctly schedules the email generation background task.
+    2. Queues the email generation job with the lead's score as its priority.
     """
 
     mock_input_data = {"company_name": "API Test Corp", "employee_count": 50}
@@ -29,19 +37,20 @@ def test_score_company_endpoint_and_background_task(client: TestClient, mocker):
     )
     mocker.patch("app.main.event_service.log_score_calculated_event")
 
-    mock_add_task = mocker.patch("fastapi.BackgroundTasks.add_task")
+    mock_notify = mocker.patch("app.main.generation_worker.generation_worker_pool.notify")
 
     response = client.post("/api/score-company", json=mock_input_data)
 
     assert response.status_code == 200
     assert response.json()["company_id"] == "test_id_123"
 
-    mock_add_task.assert_called_once()
+    mock_notify.assert_called_once()
 
-    args, _ = mock_add_task.call_args
-    assert args[0] == email_generation_service.generate_and_save_email_content
-    assert args[2].company_name == "API Test Corp"
-    assert args[3].total_score == 76
+    job = db_session.query(GenerationJob).filter_by(company_id="test_id_123").one()
+    assert job.status == "queued"
+    assert job.priority == 76
+    assert job.company_data["company_name"] == "API Test Corp"
+    assert job.scoring["total_score"] == 76
 
 
 def test_score_company_correctly_logs_event(client: TestClient, mocker):
@@ -69,8 +78,6 @@ def test_score_company_correctly_logs_event(client: TestClient, mocker):
         "app.main.event_service.log_score_calculated_event"
     )
 
-    mocker.patch("fastapi.BackgroundTasks.add_task")
-
     response = client.post("/api/score-company", json=mock_input_data)
 
     assert response.status_code == 200
@@ -83,6 +90,38 @@ def test_score_company_correctly_logs_event(client: TestClient, mocker):
     assert args[3].company_name == "Event Logger Inc."
 
 
+def test_score_company_serves_repeated_payloads_from_cache(client: TestClient, mocker):
+    """
+    Tests that an unchanged payload is scored, logged and sent to email
+    generation only once.
+    """
+
+    mock_input_data = {"company_name": "Repeat Sync Corp", "employee_count": 120}
+
+    calculate_spy = mocker.spy(scoring_service, "calculate_scores")
+    mock_log_event_func = mocker.patch(
+        "app.main.event_service.log_score_calculated_event"
+    )
+    mock_enqueue = mocker.spy(generation_queue_service, "enqueue_generation")
+
+    first = client.post("/api/score-company", json=mock_input_data)
+    second = client.post("/api/score-company", json=mock_input_data)
+    other_model = client.post(
+        "/api/score-company?model=aggressive", json=mock_input_data
+    )
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert other_model.status_code == 200
+    assert calculate_spy.call_count == 2
+    assert mock_log_event_func.call_count == 2
+    assert mock_enqueue.call_count == 2
+
+    metrics = client.get("/api/metrics").json()
+    assert metrics["score_cache"]["hits"] == 1
+    assert metrics["score_cache"]["misses"] == 2
+
+
 def test_score_company_bad_input(client: TestClient):
     """
     Tests the API response to malformed input (missing required field).
@@ -91,6 +130,91 @@ def test_score_company_bad_input(client: TestClient):
     assert response.status_code == 422
 
 
+def test_batch_score_spools_upload_for_background_processing(
+    client: TestClient, db_session: Session, mocker, tmp_path
+):
+    """
+    Tests that /api/leads/batch-score writes the upload to disk and registers
+    a batch job for it instead of parsing the companies in the request.
+    """
+
+    mocker.patch("app.main.ingestion_service.BATCH_UPLOAD_DIR", str(tmp_path))
+    mock_add_task = mocker.patch("fastapi.BackgroundTasks.add_task")
+    companies = [{"company_name": "Batch Co", "employee_count": 40}]
+
+    response = client.post(
+        "/api/leads/batch-score",
+        files={"file": ("leads.json", json.dumps(companies), "application/json")},
+    )
+
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    args, _ = mock_add_task.call_args
+    assert args[0] == scoring_service.process_batch_scoring
+    assert args[1] == job_id
+
+    status = client.get(f"/api/leads/batch-score/{job_id}")
+    assert status.status_code == 200
+    assert status.json()["status"] == "queued"
+    assert status.json()["processed"] == 0
+
+    job = db_session.query(BatchJob).filter_by(id=job_id).one()
+    assert os.path.dirname(job.file_path) == str(tmp_path)
+    assert job.file_format == "json"
+    with open(job.file_path) as f:
+        assert json.load(f) == companies
+
+
+def test_batch_score_status_unknown_job(client: TestClient):
+    response = client.get("/api/leads/batch-score/does-not-exist")
+    assert response.status_code == 404
+
+
+def test_batch_score_rejects_non_array_json(client: TestClient, mocker, tmp_path):
+    mocker.patch("app.main.ingestion_service.BATCH_UPLOAD_DIR", str(tmp_path))
+
+    response = client.post(
+        "/api/leads/batch-score",
+        files={"file": ("leads.json", '{"company_name": "X"}', "application/json")},
+    )
+
+    assert response.status_code == 400
+    assert os.listdir(tmp_path) == []
+
+
+
+def test_replay_dead_letters_endpoint_schedules_a_bulk_replay(client: TestClient, db_session: Session, mocker):
+    """
+    Tests that the replay endpoint reports the dead-letter backlog and schedules the replay task.
+    """
+
+    dead_letter_service.record_failed_generation(
+        db_session,
+        CompanyInput(company_name="Dead Corp"),
+        ScoringOutput(
+            company_id="dead_1",
+            fit_score=80,
+            intent_score=80,
+            total_score=80,
+            confidence=1.0,
+            reasoning={},
+            action="high_priority_outreach",
+        ),
+        "TimeoutError()",
+        3,
+    )
+    mock_add_task = mocker.patch("fastapi.BackgroundTasks.add_task")
+
+    assert client.get("/api/generation/dead-letters").json() == {"pending": 1}
+    response = client.post("/api/generation/dead-letters/replay?limit=50")
+
+    assert response.status_code == 202
+    assert response.json()["pending"] == 1
+    mock_add_task.assert_called_once()
+    assert mock_add_task.call_args.args[0] == email_generation_service.replay_dead_letters
+    assert mock_add_task.call_args.args[2] == 50
+
+
 def test_get_analytics_kpi_endpoints(client: TestClient, mocker):
     """
     Tests the analytics KPI endpoints to ensure they run without error.
@@ -0,0 +1,67 @@
+from app.models.schemas import CompanyInput, ScoringOutput
+from app.services import prompt_builder
+from app.services.generation_providers import StubProvider
+
+
+def _scoring(company_id: str = "prompt_1") -> ScoringOutput:
+    return ScoringOutput(
+        company_id=company_id,
+        fit_score=70,
+        intent_score=70,
+        total_score=70,
+        confidence=0.9,
+        reasoning={},
+        action="high_priority_outreach",
+    )
+
+
+def test_compact_company_data_drops_empty_fields():
+    data = prompt_builder.compact_company_data(
+        CompanyInput(company_name="Acme", employee_count=50, tech_stack=["Zapier"])
+    )
+
+    assert data == '{"employee_count":50,"tech_stack":["Zapier"]}'
+
+
+def test_long_lists_are_truncated_to_the_token_budget_round_robin():
+    company = CompanyInput(
+        company_name="Acme",
+        tech_stack=["Zapier", "Slack"],
+        news_mentions=[f"Acme in the news, story number {i}" for i in range(200)],
+        recent_job_posts=["x" * 1000],
+    )
+
+    data = prompt_builder.compact_company_data(company, token_budget=120)
+
+    assert prompt_builder.estimate_tokens(data) <= 120
+    assert '"tech_stack":["Zapier","Slack"]' in data
+    assert "x" * (prompt_builder.PROMPT_MAX_ITEM_CHARS - 3) + '..."' in data
+    assert "story number 0" in data and "story number 199" not in data
+
+
+def test_prompts_share_the_static_preamble_and_stay_parsable_by_the_stub():
+    company = CompanyInput(company_name="Solo Corp", employee_count=80)
+
+    single = prompt_builder.build_single_prompt(company, _scoring(), "roi_focused")
+    batch = prompt_builder.build_batch_prompt(
+        [(company, _scoring("a"), "roi_focused"), (company, _scoring("b"), "problem_focused")]
+    )
+
+    assert single.startswith(prompt_builder.PREAMBLE) and batch.startswith(prompt_builder.PREAMBLE)
+    stub = StubProvider()
+    assert '"variant_name": "roi_focused"' in stub._answer(single)
+    assert [item["ref"] for item in stub.BATCH_ITEM.finditer(batch)] == ["a", "b"]
+
+
+def test_token_usage_reports_totals_and_recent_averages():
+    usage = prompt_builder.TokenUsage(window=2)
+    for prompt_tokens in (100, 200, 300):
+        usage.record(prompt_tokens, 50, 0.5)
+
+    stats = usage.stats()
+
+    assert stats["calls"] == 3
+    assert stats["prompt_tokens"] == 600
+    assert stats["recent_avg_prompt_tokens"] == 250
+    assert stats["recent_max_prompt_tokens"] == 300
+    assert stats["recent_avg_latency_seconds"] == 0.5
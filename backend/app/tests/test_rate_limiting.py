@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from app.services.rate_limiting import AdaptiveConcurrencyLimiter, DomainThrottle, TokenBucket
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ThrottledError(Exception):
+    pass
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_spaces_requests_at_the_configured_rate():
+    fake_time = FakeTime()
+    bucket = TokenBucket(rate_per_minute=120, burst=2, clock=fake_time.clock, sleep=fake_time.sleep)
+
+    for _ in range(4):
+        await bucket.acquire()
+
+    assert fake_time.now == pytest.approx(1.0)
+    assert fake_time.sleeps == [pytest.approx(0.5), pytest.approx(0.5)]
+
+
+@pytest.mark.asyncio
+async def test_limiter_caps_in_flight_calls():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(call() for _ in range(10)))
+
+    assert peak == 2
+    assert limiter.completed == 10
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_backs_off_on_throttling_and_ramps_up_when_healthy():
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=8,
+        min_limit=1,
+        max_limit=10,
+        is_throttled=lambda e: isinstance(e, ThrottledError),
+    )
+
+    with pytest.raises(ThrottledError):
+        async with limiter.slot():
+            raise ThrottledError()
+    assert limiter.current_limit == 4
+
+    for _ in range(20):
+        async with limiter.slot():
+            pass
+    assert limiter.current_limit > 4
+    assert limiter.stats()["throttled"] == 1
+
+
+def test_limiter_shrinks_on_latency_spikes():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10, latency_threshold_seconds=2.0)
+
+    limiter.record_success(latency_seconds=5.0)
+
+    assert limiter.current_limit == 9
+
+
+def test_domain_throttle_keeps_a_bucket_per_domain():
+    fake = FakeTime()
+    throttle = DomainThrottle(rate_per_minute=60, burst=2, overrides={"Gmail.com": (120, 3)}, clock=fake.clock)
+
+    assert [throttle.try_acquire("acme.com") for _ in range(3)] == [True, True, False]
+    assert [throttle.try_acquire("gmail.com") for _ in range(4)] == [True, True, True, False]
+    assert throttle.try_acquire(None) is True
+    assert sorted(throttle.saturated_domains()) == ["acme.com", "gmail.com"]
+
+    fake.now += 0.5
+    assert throttle.saturated_domains() == ["acme.com"]
+    assert throttle.try_acquire("gmail.com") is True
+
+    fake.now += 0.5
+    assert throttle.saturated_domains() == []
+    assert throttle.try_acquire("acme.com") is True
+    assert throttle.stats()["throttled"] == 2
+
+
+def test_domain_throttle_with_zero_rate_is_unlimited():
+    throttle = DomainThrottle(rate_per_minute=0, burst=1)
+
+    assert all(throttle.try_acquire("acme.com") for _ in range(100))
+    assert throttle.saturated_domains() == []
+
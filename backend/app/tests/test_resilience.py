@@ -0,0 +1,134 @@
+import asyncio
+import random
+
+import pytest
+
+from app.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    backoff_delay,
+    retry_with_backoff,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyCall:
+    def __init__(self, failures, error=RuntimeError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("boom")
+        return "ok"
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_threshold_and_recovers_through_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout_seconds=10, clock=clock)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await breaker.call(FlakyCall(failures=1))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.rejected == 1
+
+    clock.now = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["times_opened"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_half_open_trial_reopens_the_circuit():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout_seconds=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 5
+
+    with pytest.raises(RuntimeError):
+        await breaker.call(FlakyCall(failures=1))
+
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now = 9
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.asyncio
+async def test_cancelled_half_open_trial_lets_the_next_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout_seconds=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 5
+    started = asyncio.Event()
+
+    async def hang():
+        started.set()
+        await asyncio.sleep(60)
+
+    trial = asyncio.create_task(breaker.call(hang))
+    await started.wait()
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert await breaker.call(FlakyCall(failures=0)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_retry_with_backoff_retries_until_success_with_growing_jittered_delays():
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+
+    call = FlakyCall(failures=3)
+    result = await retry_with_backoff(
+        call, max_attempts=5, base_delay_seconds=1, max_delay_seconds=3, sleep=sleep, rng=random.Random(1)
+    )
+
+    assert result == "ok"
+    assert call.calls == 4
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= cap for delay, cap in zip(sleeps, [1, 2, 3]))
+
+
+@pytest.mark.asyncio
+async def test_retry_with_backoff_gives_up_after_max_attempts_and_on_open_circuit():
+    async def sleep(seconds):
+        pass
+
+    exhausted = FlakyCall(failures=10)
+    with pytest.raises(RuntimeError):
+        await retry_with_backoff(exhausted, max_attempts=3, base_delay_seconds=1, max_delay_seconds=1, sleep=sleep)
+    assert exhausted.calls == 3
+
+    rejected = FlakyCall(failures=10, error=CircuitOpenError)
+    with pytest.raises(CircuitOpenError):
+        await retry_with_backoff(rejected, max_attempts=3, base_delay_seconds=1, max_delay_seconds=1, sleep=sleep)
+    assert rejected.calls == 1
+
+
+def test_backoff_delay_is_capped():
+    rng = random.Random(3)
+
+    assert all(backoff_delay(10, 1, 5, rng) <= 5 for _ in range(100))
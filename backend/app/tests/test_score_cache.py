@@ -0,0 +1,68 @@
+from app.models.schemas import CompanyInput, ScoringOutput, ScoringModel
+from app.services.score_cache import ScoreCache, make_cache_key
+
+
+def _score(company_id: str) -> ScoringOutput:
+    return ScoringOutput(
+        company_id=company_id,
+        fit_score=50,
+        intent_score=50,
+        total_score=50,
+        confidence=0.5,
+        reasoning={},
+        action="low_priority_monitoring",
+    )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_key_is_canonical_and_model_specific():
+    company = CompanyInput(company_name="Keyed Inc.", employee_count=50, industry="AI")
+    same_company = CompanyInput(industry="AI", employee_count=50, company_name="Keyed Inc.")
+    changed_company = CompanyInput(company_name="Keyed Inc.", employee_count=51, industry="AI")
+
+    key = make_cache_key(company, ScoringModel.BALANCED)
+
+    assert key == make_cache_key(same_company, ScoringModel.BALANCED)
+    assert key != make_cache_key(changed_company, ScoringModel.BALANCED)
+    assert key != make_cache_key(company, ScoringModel.AGGRESSIVE)
+    # Where the email goes does not change the score.
+    assert key == make_cache_key(company.copy(update={"contact_email": "ceo@keyed.io"}), ScoringModel.BALANCED)
+
+
+def test_cache_evicts_least_recently_used_entry():
+    cache = ScoreCache(max_size=2, ttl_seconds=60)
+    cache.set("a", _score("a"))
+    cache.set("b", _score("b"))
+
+    assert cache.get("a").company_id == "a"
+    cache.set("c", _score("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = ScoreCache(max_size=10, ttl_seconds=30, clock=clock)
+    cache.set("a", _score("a"))
+
+    clock.now = 29
+    assert cache.get("a") is not None
+
+    clock.now = 30
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+    assert stats["size"] == 0
@@ -1,6 +1,17 @@
-﻿from app.services import scoring_service
+﻿import asyncio
+import json
+import os
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services import batch_job_service, scoring_service
+from app.models.event_model import Event
 from app.models.schemas import CompanyInput, ScoringModel
 
+MOCK_COMPANIES_PATH = Path(__file__).resolve().parents[2] / "data" / "mock_companies.json"
+
 
 def test_calculates_high_score_for_ideal_company():
     """
@@ -56,4 +67,236 @@ def test_handles_missing_data_gracefully():
 
     assert result.confidence < 0.3
     assert "employee_count" in result.reasoning["missing"]
-    assert "industry" in result.reasoning["missing"]
\ No newline at end of file
+    assert "industry" in result.reasoning["missing"]
+
+
+def test_recipient_fields_do_not_count_towards_confidence():
+    company = CompanyInput(
+        company_name="Complete Co",
+        employee_count=120,
+        industry="SaaS",
+        funding_stage="Series A",
+        tech_stack=["Zapier"],
+        recent_job_posts=["Head of Operations"],
+        news_mentions=["Raised a Series A"],
+        contact_email="ceo@complete.co",
+    )
+
+    result = scoring_service.calculate_scores(company, ScoringModel.BALANCED)
+    [batch_result] = scoring_service.score_batch(
+        scoring_service.companies_to_columns([company]), ScoringModel.BALANCED
+    )
+
+    assert result.confidence == 1.0
+    assert batch_result.confidence == 1.0
+    assert "domain" not in result.reasoning["missing"]
+
+
+def test_score_batch_matches_scalar_scoring():
+    """
+    Tests that the columnar batch scorer returns exactly what calculate_scores returns.
+    """
+
+    with open(MOCK_COMPANIES_PATH, encoding="utf-8-sig") as f:
+        companies = [CompanyInput(**company) for company in json.load(f)]
+    companies += [
+        CompanyInput(company_name="Missing Data Corp"),
+        CompanyInput(company_name="Zero Staff", employee_count=0, industry="Retail"),
+        CompanyInput(
+            company_name="Tiny Ops",
+            employee_count=20,
+            industry="E-Commerce",
+            tech_stack=["MAKE", "Workato"],
+            recent_job_posts=["DevOps Engineer"],
+        ),
+        CompanyInput(company_name="Huge Corp", employee_count=-5, tech_stack=["Excel"]),
+    ]
+
+    columns = scoring_service.companies_to_columns(companies)
+
+    for model in ScoringModel:
+        assert scoring_service.score_batch(columns, model) == [
+            scoring_service.calculate_scores(company, model) for company in companies
+        ]
+
+
+def test_model_weights_shift_the_total_score():
+    """
+    Tests that the scoring model weights change how fit and intent are blended.
+    """
+
+    fit_only = CompanyInput(company_name="Fit Only Inc.", employee_count=150, industry="SaaS")
+
+    conservative = scoring_service.calculate_scores(fit_only, ScoringModel.CONSERVATIVE)
+    balanced = scoring_service.calculate_scores(fit_only, ScoringModel.BALANCED)
+    aggressive = scoring_service.calculate_scores(fit_only, ScoringModel.AGGRESSIVE)
+
+    assert balanced.total_score == 60
+    assert conservative.total_score > balanced.total_score > aggressive.total_score
+
+
+def test_compiled_scorer_is_cached_per_model():
+    scorer = scoring_service.get_compiled_scorer(ScoringModel.AGGRESSIVE)
+
+    assert scoring_service.get_compiled_scorer("aggressive") is scorer
+    assert scoring_service.get_compiled_scorer(ScoringModel.BALANCED) is not scorer
+
+
+def test_score_batch_handles_empty_input():
+    columns = scoring_service.companies_to_columns([])
+
+    assert scoring_service.score_batch(columns, ScoringModel.BALANCED) == []
+
+
+def _spool_rows(tmp_path, rows):
+    upload_path = tmp_path / "upload.ndjson"
+    upload_path.write_text("\n".join(json.dumps(row) for row in rows))
+    return str(upload_path)
+
+
+@pytest.fixture
+def batch_mocks(db_session, mocker):
+    mocker.patch("app.services.scoring_service.SessionLocal", lambda: db_session)
+    return {
+        "log_events": mocker.spy(
+            scoring_service.event_service, "log_score_calculated_events"
+        ),
+        "generate": mocker.patch(
+            "app.services.scoring_service.email_generation_service.generate_and_save_email_batch",
+            new_callable=AsyncMock,
+        ),
+        "chunk_spy": mocker.spy(scoring_service, "_process_batch_chunk"),
+    }
+
+
+@pytest.mark.asyncio
+async def test_process_batch_scoring_streams_file_in_chunks(tmp_path, db_session, batch_mocks):
+    """
+    Tests that the batch job reads the spooled file chunk by chunk, skips
+    invalid rows, records its progress and removes the file when it is done.
+    """
+
+    rows = [{"company_name": f"Chunked {i}", "employee_count": 100} for i in range(5)]
+    rows.insert(2, {"employee_count": 10})
+    upload_path = _spool_rows(tmp_path, rows)
+    job = batch_job_service.create_batch_job(db_session, "upload.ndjson", upload_path, "ndjson")
+
+    await scoring_service.process_batch_scoring(job.id, chunk_size=2)
+
+    chunk_calls = batch_mocks["chunk_spy"].call_args_list
+    assert [len(call.args[1]) for call in chunk_calls] == [2, 2, 2]
+    assert batch_mocks["log_events"].call_count == 3
+    assert db_session.query(Event).filter_by(event_type="score_calculated").count() == 5
+    assert batch_mocks["generate"].await_count == 3
+    assert sum(len(call.args[1]) for call in batch_mocks["generate"].await_args_list) == 5
+    assert not os.path.exists(upload_path)
+
+    status = batch_job_service.to_status(batch_job_service.get_batch_job(db_session, job.id))
+    assert status["status"] == "completed"
+    assert status["records_read"] == 6
+    assert status["processed"] == 5
+    assert status["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_batch_scoring_resumes_after_checkpoint(tmp_path, db_session, batch_mocks):
+    """
+    Tests that a job interrupted after its first chunk only scores the rest of the file.
+    """
+
+    rows = [{"company_name": f"Resumed {i}", "employee_count": 100} for i in range(5)]
+    upload_path = _spool_rows(tmp_path, rows)
+    job = batch_job_service.create_batch_job(db_session, "upload.ndjson", upload_path, "ndjson")
+    batch_job_service.mark_job_running(db_session, job)
+    batch_job_service.record_chunk_checkpoint(
+        db_session, job, records_read=2, processed=2, failed=0, elapsed_seconds=1.0
+    )
+
+    await scoring_service.process_batch_scoring(job.id, chunk_size=2)
+
+    scored_names = [
+        event.event_data["company_name"]
+        for event in db_session.query(Event).filter_by(event_type="score_calculated")
+    ]
+    assert scored_names == ["Resumed 2", "Resumed 3", "Resumed 4"]
+
+    job = batch_job_service.get_batch_job(db_session, job.id)
+    assert job.status == "completed"
+    assert job.records_read == 5
+    assert job.processed_count == 5
+
+
+def test_batch_job_is_claimed_by_one_process_until_its_heartbeat_expires(tmp_path, db_session):
+    job = batch_job_service.create_batch_job(db_session, "u.ndjson", _spool_rows(tmp_path, []), "ndjson")
+
+    assert batch_job_service.claim_job(db_session, job.id, "host:1") is not None
+    assert batch_job_service.claim_job(db_session, job.id, "host:2") is None
+    assert batch_job_service.get_resumable_jobs(db_session) == []
+
+    # host:1 stopped sending heartbeats: host:2 takes over and host:1 can no longer checkpoint.
+    job = batch_job_service.get_batch_job(db_session, job.id)
+    stale = batch_job_service.claim_job(db_session, job.id, "host:2", lease_seconds=-1)
+    assert stale.claimed_by == "host:2"
+    job.claimed_by = "host:1"
+    assert not batch_job_service.record_chunk_checkpoint(
+        db_session, job, records_read=1, processed=1, failed=0, elapsed_seconds=0.1
+    )
+
+
+@pytest.mark.asyncio
+async def test_cancelled_batch_job_releases_its_claim_and_keeps_its_file(tmp_path, db_session, batch_mocks):
+    upload_path = _spool_rows(tmp_path, [{"company_name": "Slow Inc", "employee_count": 100}])
+    job_id = batch_job_service.create_batch_job(db_session, "upload.ndjson", upload_path, "ndjson").id
+    started = asyncio.Event()
+
+    async def hang(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(60)
+
+    batch_mocks["generate"].side_effect = hang
+    task = asyncio.create_task(scoring_service.process_batch_scoring(job_id))
+    await started.wait()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    job = batch_job_service.get_batch_job(db_session, job_id)
+    assert (job.status, job.claimed_by) == ("running", None)
+    assert os.path.exists(upload_path)
+    assert [j.id for j in batch_job_service.get_resumable_jobs(db_session)] == [job_id]
+
+
+@pytest.mark.asyncio
+async def test_failing_chunk_fails_the_job_and_removes_its_file(tmp_path, db_session, batch_mocks):
+    """
+    Tests that an error while scoring or generating a chunk, even a ValueError,
+    is reported as a chunk failure rather than an unreadable upload.
+    """
+
+    upload_path = _spool_rows(tmp_path, [{"company_name": "Broken Inc", "employee_count": 100}])
+    job_id = batch_job_service.create_batch_job(db_session, "upload.ndjson", upload_path, "ndjson").id
+    batch_mocks["generate"].side_effect = ValueError("bad prompt")
+
+    await scoring_service.process_batch_scoring(job_id)
+
+    job = batch_job_service.get_batch_job(db_session, job_id)
+    assert job.status == "failed"
+    assert job.error == "Chunk after record 0 failed: bad prompt"
+    assert not os.path.exists(upload_path)
+    assert batch_job_service.get_resumable_jobs(db_session) == []
+
+
+@pytest.mark.asyncio
+async def test_unreadable_upload_fails_the_job_after_the_good_chunks(tmp_path, db_session, batch_mocks):
+    upload_path = tmp_path / "upload.ndjson"
+    upload_path.write_text(
+        json.dumps({"company_name": "Good Inc", "employee_count": 100}) + "\n{not json\n"
+    )
+    job_id = batch_job_service.create_batch_job(db_session, "upload.ndjson", str(upload_path), "ndjson").id
+
+    await scoring_service.process_batch_scoring(job_id, chunk_size=1)
+
+    job = batch_job_service.get_batch_job(db_session, job_id)
+    assert job.status == "failed"
+    assert job.error.startswith("Could not read upload: Invalid JSON on line 2")
+    assert job.processed_count == 1
+    assert not upload_path.exists()
@@ -0,0 +1,67 @@
+from app.services.send_scheduler import AdaptiveSendSchedule
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _schedule(clock) -> AdaptiveSendSchedule:
+    return AdaptiveSendSchedule(
+        initial_batch_size=5,
+        min_batch_size=5,
+        max_batch_size=100,
+        min_interval_seconds=1,
+        max_interval_seconds=60,
+        target_cycle_seconds=10,
+        window_seconds=300,
+        clock=clock,
+    )
+
+
+def test_backlog_grows_the_batch_up_to_the_target_cycle_time():
+    clock = FakeClock()
+    schedule = _schedule(clock)
+
+    for _ in range(6):
+        clock.now += 1
+        schedule.record_cycle(sent=schedule.batch_size, seconds=schedule.batch_size * 0.25, backlog=1000)
+
+    # 0.25s per email fits 40 emails in a 10s cycle.
+    assert schedule.batch_size == 40
+    assert schedule.interval_seconds == 1
+
+
+def test_slow_cycles_halve_the_batch_and_an_empty_queue_backs_off():
+    clock = FakeClock()
+    schedule = _schedule(clock)
+    schedule.batch_size = 80
+
+    schedule.record_cycle(sent=80, seconds=20, backlog=10)
+    assert schedule.batch_size == 40
+
+    for expected in (2, 4, 8):
+        schedule.interval_seconds = expected / 2
+        schedule.record_cycle(sent=0, seconds=0.01, backlog=0)
+        assert schedule.interval_seconds == expected
+    schedule.interval_seconds = 50
+    schedule.record_cycle(sent=0, seconds=0.01, backlog=0)
+    assert schedule.interval_seconds == 60
+
+
+def test_reports_throughput_and_drain_eta():
+    clock = FakeClock()
+    schedule = _schedule(clock)
+
+    for _ in range(3):
+        clock.now += 10
+        schedule.record_cycle(sent=20, seconds=10, backlog=600)
+
+    stats = schedule.stats()
+    assert stats["throughput_per_minute"] == 120
+    assert stats["drain_eta_seconds"] == 300
+    assert stats["sent"] == 60
+
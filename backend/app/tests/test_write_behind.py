@@ -0,0 +1,109 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.event_model import Event
+from app.models.schemas import ActivationEventInput
+from app.services import event_service
+from app.services.write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def test_queue_group_commits_when_batch_size_is_reached(session_factory):
+    queue = WriteBehindQueue(session_factory, max_batch_size=3, max_delay_seconds=60)
+    queue.start()
+    try:
+        queue.enqueue_many(
+            Event, [{"event_type": "score_calculated", "company_id": f"c{i}"} for i in range(3)]
+        )
+        _wait_for(lambda: queue.written == 3)
+    finally:
+        queue.stop()
+
+    assert queue.flushes == 1
+    with session_factory() as db:
+        assert db.query(Event).count() == 3
+
+
+def test_queue_flushes_after_delay_and_mixes_row_shapes(session_factory):
+    queue = WriteBehindQueue(session_factory, max_batch_size=100, max_delay_seconds=0.02)
+    queue.start()
+    try:
+        queue.enqueue(Event, {"event_type": "email_generated", "company_id": "c1"})
+        queue.enqueue(Event, {"event_type": "activation_step_completed", "user_id": "u1"})
+        _wait_for(lambda: queue.written == 2)
+    finally:
+        queue.stop()
+
+    assert queue.depth() == 0
+    with session_factory() as db:
+        assert db.query(Event).filter_by(user_id="u1").one().event_type == "activation_step_completed"
+
+
+def test_stop_drains_pending_rows(session_factory):
+    queue = WriteBehindQueue(session_factory, max_batch_size=1000, max_delay_seconds=60)
+    queue.start()
+    queue.enqueue_many(Event, [{"event_type": "score_calculated"} for _ in range(10)])
+
+    queue.stop()
+
+    assert not queue.running
+    assert queue.stats()["written"] == 10
+    with session_factory() as db:
+        assert db.query(Event).count() == 10
+
+
+def test_failed_batch_is_retried_in_halves_and_only_bad_rows_are_dropped(session_factory):
+    committed = []
+    queue = WriteBehindQueue(session_factory, on_commit=committed.extend)
+    rows = [{"id": i, "event_type": "score_calculated", "company_id": f"c{i}"} for i in range(1, 9)]
+    # Duplicate primary keys: each one fails on its own, and fails the batch it is in.
+    rows[2] = {"id": 1, "event_type": "score_calculated", "company_id": "duplicate"}
+    rows[6] = {"id": 2, "event_type": "score_calculated", "company_id": "duplicate"}
+    queue.enqueue_many(Event, rows)
+
+    queue.flush()
+
+    assert (queue.written, queue.failed) == (6, 2)
+    assert [row["id"] for _, row in committed] == [1, 2, 4, 5, 6, 8]
+    assert [row["company_id"] for _, row, _ in queue.rejected] == ["duplicate", "duplicate"]
+    assert all("IntegrityError" in error for _, _, error in queue.rejected)
+    with session_factory() as db:
+        assert db.query(Event).count() == 6
+
+
+def test_event_writers_enqueue_while_queue_runs(session_factory, mocker):
+    queue = WriteBehindQueue(session_factory, max_batch_size=1000, max_delay_seconds=60)
+    mocker.patch.object(event_service, "event_write_queue", queue)
+    request_db = mocker.MagicMock()
+    queue.start()
+
+    event_service.log_activation_event(
+        request_db, ActivationEventInput(user_id="u-9", step_name="file_upload")
+    )
+
+    request_db.commit.assert_not_called()
+    assert queue.depth() == 1
+    queue.stop()
+    with session_factory() as db:
+        assert db.query(Event).filter_by(user_id="u-9").one().event_data == {"step": "file_upload"}
@@ -0,0 +1,93 @@
+"""
+Synthetic company generator for benchmarks.
+
+Every field is drawn from the empirical distributions in data/mock_companies.json
+(field presence, list lengths and value frequencies), so generated workloads
+exercise the same scoring branches as real leads, at any scale.
+"""
+import json
+import random
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+MOCK_COMPANIES_PATH = Path(__file__).resolve().parents[1] / "data" / "mock_companies.json"
+
+NAME_PREFIXES = ["Acme", "Blue", "Quantum", "Nimbus", "Vertex", "Atlas", "Nova", "Pixel", "Summit", "Helix"]
+NAME_SUFFIXES = ["Labs", "Systems", "Corp", "Solutions", "AI", "Analytics", "Works", "Health", "Pay", "Cloud"]
+
+
+class _Distribution:
+    """Weighted sampler over the values observed in the seed data."""
+
+    def __init__(self, values: List[Any]):
+        counts = Counter(json.dumps(value) for value in values)
+        self.values = [json.loads(value) for value in counts]
+        self.weights = list(counts.values())
+
+    def sample(self, rng: random.Random) -> Any:
+        return rng.choices(self.values, weights=self.weights)[0]
+
+    def sample_distinct(self, rng: random.Random, k: int) -> List[Any]:
+        pool = list(zip(self.values, self.weights))
+        chosen = []
+        while pool and len(chosen) < k:
+            index = rng.choices(range(len(pool)), weights=[w for _, w in pool])[0]
+            chosen.append(pool.pop(index)[0])
+        return chosen
+
+
+class CompanyGenerator:
+    def __init__(self, seed_companies: Optional[List[Dict[str, Any]]] = None, seed: int = 42):
+        if seed_companies is None:
+            with open(MOCK_COMPANIES_PATH, encoding="utf-8-sig") as f:
+                seed_companies = json.load(f)
+
+        self.seed = seed
+        self.employee_counts = [c.get("employee_count") for c in seed_companies]
+        self.industries = _Distribution([c.get("industry") for c in seed_companies])
+        self.funding_stages = _Distribution([c.get("funding_stage") for c in seed_companies])
+        self.tech_stack_sizes = _Distribution([len(c.get("tech_stack") or []) for c in seed_companies])
+        self.tools = _Distribution([t for c in seed_companies for t in c.get("tech_stack") or []])
+        self.job_post_counts = _Distribution([len(c.get("recent_job_posts") or []) for c in seed_companies])
+        self.job_titles = _Distribution([t for c in seed_companies for t in c.get("recent_job_posts") or []])
+        self.news_counts = _Distribution([len(c.get("news_mentions") or []) for c in seed_companies])
+        self.news_templates = [
+            "{name} raises new funding round",
+            "{name} expands into new markets",
+            "{name} launches a new product line",
+        ]
+
+    def _employee_count(self, rng: random.Random) -> Optional[int]:
+        base = rng.choice(self.employee_counts)
+        if base is None:
+            return None
+        return max(1, int(base * rng.uniform(0.9, 1.1)))
+
+    def generate(self, count: int) -> Iterator[Dict[str, Any]]:
+        """Yields `count` companies; the same seed always yields the same companies."""
+        rng = random.Random(self.seed)
+        for i in range(count):
+            name = f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)} {i}"
+            yield {
+                "company_name": name,
+                "employee_count": self._employee_count(rng),
+                "industry": self.industries.sample(rng),
+                "funding_stage": self.funding_stages.sample(rng),
+                "tech_stack": self.tools.sample_distinct(rng, self.tech_stack_sizes.sample(rng)),
+                "recent_job_posts": self.job_titles.sample_distinct(rng, self.job_post_counts.sample(rng)),
+                "news_mentions": [
+                    rng.choice(self.news_templates).format(name=name)
+                    for _ in range(self.news_counts.sample(rng))
+                ],
+            }
+
+    def generate_chunks(self, count: int, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+        chunk = []
+        for company in self.generate(count):
+            chunk.append(company)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
@@ -0,0 +1,162 @@
+"""
+Score -> generate -> send pipeline load test.
+
+Runs the whole lead pipeline offline against the stub generation provider,
+with a configurable latency distribution, error rate and rate-limit rate, and
+reports per-stage throughput and the provider call latency percentiles.
+
+    python -m benchmarks.pipeline --companies 2000 --latency-ms 800
+    python -m benchmarks.pipeline --companies 2000 --distribution exponential --rate-limit-rate 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from app.models.event_model import OutboundEmail
+from app.models.schemas import CompanyInput, ScoringModel
+from app.services import (
+    email_generation_service,
+    email_sending_service,
+    event_service,
+    generation_providers,
+    scoring_service,
+)
+from app.services.rate_limiting import TokenBucket
+from benchmarks.generator import CompanyGenerator
+from benchmarks.run import BENCHMARK_DIR, _session_factory
+
+DEFAULT_OUTPUT = BENCHMARK_DIR / "results" / "pipeline.json"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _generate(session_factory, scored_companies, batch_size: int) -> None:
+    if batch_size > 1:
+        await email_generation_service.generate_and_save_email_batch(
+            session_factory, scored_companies, batch_size=batch_size
+        )
+        return
+
+    async def generate_one(company, score):
+        try:
+            await email_generation_service.generate_and_save_email_content(session_factory, company, score)
+        except TypeError:
+            # Companies without employee_count/funding_stage raise in the current variant rules.
+            pass
+
+    await asyncio.gather(*(generate_one(company, score) for company, score in scored_companies))
+
+
+def run_pipeline(
+    companies: int,
+    provider: generation_providers.StubProvider,
+    seed: int = 42,
+    batch_size: int = 1,
+) -> dict:
+    """Runs every stage once over `companies` generated leads and returns the measurements."""
+    session_factory = _session_factory()
+    stages = {}
+    inputs = [CompanyInput(**company) for company in CompanyGenerator(seed=seed).generate(companies)]
+
+    generation_providers.set_provider(provider)
+    try:
+        started_at = time.perf_counter()
+        scores = scoring_service.score_batch(
+            scoring_service.companies_to_columns(inputs), ScoringModel.BALANCED
+        )
+        with session_factory() as db:
+            event_service.log_score_calculated_events(db, zip(scores, inputs), "balanced")
+        stages["score"] = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        asyncio.run(_generate(session_factory, list(zip(inputs, scores)), batch_size))
+        stages["generate"] = time.perf_counter() - started_at
+    finally:
+        generation_providers.set_provider(None)
+
+    started_at = time.perf_counter()
+    with session_factory() as db, contextlib.redirect_stdout(io.StringIO()):
+        generated = db.query(OutboundEmail).count()
+        # Stop once a pass sends nothing: failed sends wait out their retry delay.
+        while email_sending_service.send_prioritized_emails(db):
+            pass
+        unsent = db.query(OutboundEmail).filter(OutboundEmail.is_sent == False).count()
+    stages["send"] = time.perf_counter() - started_at
+
+    latencies = provider.latencies_ms
+    return {
+        "companies": companies,
+        "emails": generated,
+        "unsent": unsent,
+        "batch_size": batch_size,
+        "provider": provider.stats(),
+        "stages": {
+            name: {
+                "seconds": round(seconds, 4),
+                "rows_per_second": round((companies if name == "score" else generated) / seconds, 1)
+                if seconds else 0.0,
+            }
+            for name, seconds in stages.items()
+        },
+        "end_to_end_seconds": round(sum(stages.values()), 4),
+        "provider_latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "max": round(max(latencies, default=0.0), 1),
+        },
+        "concurrency": email_generation_service.gemini_concurrency_limiter.stats(),
+        "tokens": email_generation_service.generation_token_usage.stats(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the score -> generate -> send pipeline offline.")
+    parser.add_argument("--companies", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=1, help="Companies per prompt (1 = single-company calls).")
+    parser.add_argument("--latency-ms", type=float, default=generation_providers.STUB_LATENCY_MS, help="Median provider latency.")
+    parser.add_argument("--distribution", choices=generation_providers.LATENCY_DISTRIBUTIONS, default=generation_providers.STUB_LATENCY_DISTRIBUTION)
+    parser.add_argument("--spread", type=float, default=generation_providers.STUB_LATENCY_SPREAD, help="Relative latency dispersion.")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=None, help="Override the requests-per-minute budget (0 = unlimited).")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    # Failed calls are counted in the provider stats; keep their tracebacks out of the output.
+    logging.disable(logging.CRITICAL)
+    if args.rpm is not None:
+        email_generation_service.gemini_rate_limiter = TokenBucket(args.rpm)
+
+    provider = generation_providers.StubProvider(
+        latency_ms=args.latency_ms,
+        distribution=args.distribution,
+        spread=args.spread,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+    results = run_pipeline(args.companies, provider, seed=args.seed, batch_size=args.batch_size)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2))
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
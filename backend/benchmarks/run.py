@@ -0,0 +1,212 @@
+"""
+Scoring benchmark suite.
+
+Measures scalar scoring, batch scoring, email variant selection and event
+logging throughput on synthetic companies, stores the results as JSON and
+compares them against a saved baseline.
+
+    python -m benchmarks.run --sizes 1000,100000
+    python -m benchmarks.run --sizes 1000 --save-baseline
+    python -m benchmarks.run --sizes 1000000 --skip event_logging_single
+
+Exits with status 1 when any benchmark is slower than the baseline by more
+than --tolerance.
+"""
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.schemas import CompanyInput, ScoringModel
+from app.services import email_generation_service, event_service, scoring_service
+from benchmarks.generator import CompanyGenerator
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = BENCHMARK_DIR / "results" / "latest.json"
+DEFAULT_BASELINE = BENCHMARK_DIR / "results" / "baseline.json"
+DEFAULT_SIZES = "1000,100000"
+CHUNK_SIZE = 10_000
+# Per-row commits are slow by design; cap them so large sizes stay practical.
+SINGLE_EVENT_LIMIT = 2_000
+WARMUP_SIZE = 200
+
+
+def _timed(fn: Callable[[], None]) -> float:
+    started_at = time.perf_counter()
+    fn()
+    return time.perf_counter() - started_at
+
+
+def bench_scalar_scoring(companies: List[CompanyInput], session_factory) -> float:
+    return _timed(
+        lambda: [scoring_service.calculate_scores(c, ScoringModel.BALANCED) for c in companies]
+    )
+
+
+def bench_batch_scoring(companies: List[CompanyInput], session_factory) -> float:
+    columns = scoring_service.companies_to_columns(companies)
+    return _timed(lambda: scoring_service.score_batch(columns, ScoringModel.BALANCED))
+
+
+def bench_email_variant(companies: List[CompanyInput], session_factory) -> float:
+    def run():
+        for company in companies:
+            try:
+                email_generation_service.determine_email_variant(company, 70)
+            except TypeError:
+                # Companies without employee_count/funding_stage raise in the current rules.
+                pass
+
+    return _timed(run)
+
+
+def _session_factory():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def bench_event_logging_bulk(companies: List[CompanyInput], session_factory) -> float:
+    scored = list(zip(scoring_service.score_batch(
+        scoring_service.companies_to_columns(companies), ScoringModel.BALANCED
+    ), companies))
+    with session_factory() as db:
+        return _timed(lambda: event_service.log_score_calculated_events(db, scored, "balanced"))
+
+
+def bench_event_logging_single(companies: List[CompanyInput], session_factory) -> float:
+    scored = [
+        (scoring_service.calculate_scores(c, ScoringModel.BALANCED), c) for c in companies
+    ]
+    with session_factory() as db:
+        return _timed(
+            lambda: [
+                event_service.log_score_calculated_event(db, score, "balanced", company)
+                for score, company in scored
+            ]
+        )
+
+
+BENCHMARKS = {
+    "scalar_scoring": bench_scalar_scoring,
+    "batch_scoring": bench_batch_scoring,
+    "email_variant": bench_email_variant,
+    "event_logging_bulk": bench_event_logging_bulk,
+    "event_logging_single": bench_event_logging_single,
+}
+ROW_LIMITS = {"event_logging_single": SINGLE_EVENT_LIMIT}
+
+
+def run_size(size: int, seed: int, selected: List[str]) -> Dict[str, dict]:
+    """Runs the selected benchmarks over `size` generated companies, chunk by chunk."""
+    generator = CompanyGenerator(seed=seed)
+    session_factory = _session_factory()
+
+    # Untimed pass so compiled scorers, SQL statement caches and imports are warm.
+    warmup = [CompanyInput(**company) for company in generator.generate(WARMUP_SIZE)]
+    for name in selected:
+        BENCHMARKS[name](warmup, _session_factory())
+
+    seconds = {name: 0.0 for name in selected}
+    rows = {name: 0 for name in selected}
+
+    for chunk in generator.generate_chunks(size, CHUNK_SIZE):
+        companies = [CompanyInput(**company) for company in chunk]
+        for name in selected:
+            sample = companies[: max(0, ROW_LIMITS.get(name, size) - rows[name])]
+            if not sample:
+                continue
+            seconds[name] += BENCHMARKS[name](sample, session_factory)
+            rows[name] += len(sample)
+
+    return {
+        name: {
+            "rows": rows[name],
+            "seconds": round(seconds[name], 4),
+            "rows_per_second": round(rows[name] / seconds[name], 1) if seconds[name] else 0.0,
+        }
+        for name in selected
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Lists every benchmark whose throughput dropped more than `tolerance` below the baseline."""
+    regressions = []
+    for size, benchmarks in results["results"].items():
+        for name, measured in benchmarks.items():
+            reference = baseline.get("results", {}).get(size, {}).get(name)
+            if not reference or not reference.get("rows_per_second"):
+                continue
+            ratio = measured["rows_per_second"] / reference["rows_per_second"]
+            measured["baseline_rows_per_second"] = reference["rows_per_second"]
+            measured["change"] = round(ratio - 1, 4)
+            if ratio < 1 - tolerance:
+                regressions.append(
+                    f"{name} @ {size}: {measured['rows_per_second']} rows/s vs "
+                    f"baseline {reference['rows_per_second']} rows/s ({ratio - 1:+.1%})"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the scoring benchmark suite.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated company counts, e.g. 1000,100000,1000000.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip", default="", help="Comma-separated benchmarks to skip.")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed throughput drop before flagging (0.15 = 15%%).")
+    args = parser.parse_args(argv)
+
+    # The services log every decision at INFO; keep the output (and its cost) out of the measurements.
+    logging.disable(logging.INFO)
+
+    skipped = {name.strip() for name in args.skip.split(",") if name.strip()}
+    selected = [name for name in BENCHMARKS if name not in skipped]
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "results": {},
+    }
+    for size in sizes:
+        print(f"--- BENCHMARK: {size} companies ---", file=sys.stderr)
+        results["results"][str(size)] = run_size(size, args.seed, selected)
+        for name, measured in results["results"][str(size)].items():
+            print(f"    {name:<22} {measured['rows_per_second']:>12,.0f} rows/s", file=sys.stderr)
+
+    regressions = []
+    if args.baseline.exists() and not args.save_baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    results["regressions"] = regressions
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"--- BENCHMARK: Baseline saved to {args.baseline} ---", file=sys.stderr)
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
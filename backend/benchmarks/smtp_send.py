@@ -0,0 +1,90 @@
+"""
+SMTP send throughput benchmark.
+
+Sends synthetic emails to the in-process SMTP sink and compares one new
+connection per email (smtplib, sequential) with the pooled, pipelined
+transport at several pool sizes.
+
+    python -m benchmarks.smtp_send --emails 2000 --pool-sizes 1,4,16
+    python -m benchmarks.smtp_send --emails 2000 --latency-ms 20
+"""
+import argparse
+import json
+import smtplib
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from app.services.email_transport import EMAIL_FROM_ADDRESS, OutgoingEmail, SMTPTransport, build_message
+from app.services.smtp_sink import SMTPSink
+from benchmarks.run import BENCHMARK_DIR
+
+DEFAULT_OUTPUT = BENCHMARK_DIR / "results" / "smtp_send.json"
+
+
+def _emails(count: int) -> List[OutgoingEmail]:
+    return [
+        OutgoingEmail(i, f"lead{i}@company{i % 50}.example", f"Subject {i}", "Hi there,\nWorth a quick chat?")
+        for i in range(count)
+    ]
+
+
+def _measure(sent: int, seconds: float) -> dict:
+    return {
+        "emails": sent,
+        "seconds": round(seconds, 4),
+        "emails_per_second": round(sent / seconds, 1) if seconds else 0.0,
+    }
+
+
+def connection_per_email(sink: SMTPSink, emails: List[OutgoingEmail]) -> dict:
+    started_at = time.perf_counter()
+    for email in emails:
+        with smtplib.SMTP(sink.host, sink.port) as client:
+            client.sendmail(EMAIL_FROM_ADDRESS, [email.recipient], build_message(EMAIL_FROM_ADDRESS, email))
+    return _measure(len(emails), time.perf_counter() - started_at)
+
+
+def pooled(sink: SMTPSink, emails: List[OutgoingEmail], pool_size: int, batch_size: int) -> dict:
+    transport = SMTPTransport(host=sink.host, port=sink.port, pool_size=pool_size)
+    transport.start()
+    try:
+        started_at = time.perf_counter()
+        sent = 0
+        for i in range(0, len(emails), batch_size):
+            sent += sum(result.ok for result in transport.send_many(emails[i:i + batch_size]))
+        return _measure(sent, time.perf_counter() - started_at)
+    finally:
+        transport.close()
+
+
+def run_benchmark(emails: int, pool_sizes: List[int], batch_size: int = 100, latency_ms: float = 0) -> dict:
+    messages = _emails(emails)
+    with SMTPSink(latency_ms=latency_ms, keep_messages=False) as sink:
+        results = {"connection_per_email": connection_per_email(sink, messages)}
+        for pool_size in pool_sizes:
+            results[f"pool_{pool_size}"] = pooled(sink, messages, pool_size, batch_size)
+    return {"emails": emails, "batch_size": batch_size, "latency_ms": latency_ms, "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark SMTP sending against the in-process sink.")
+    parser.add_argument("--emails", type=int, default=1000)
+    parser.add_argument("--pool-sizes", default="1,4,16", help="Comma-separated connection pool sizes.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Emails handed to the transport per call.")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated relay latency per message.")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    pool_sizes = [int(size) for size in args.pool_sizes.split(",") if size.strip()]
+    results = run_benchmark(args.emails, pool_sizes, args.batch_size, args.latency_ms)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2))
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())